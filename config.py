@@ -15,6 +15,9 @@ EXTRINSIC_CALIB_SQUARE_SIZE = 0.25 # Meters (size of each square in the calibrat
 EXTRINSIC_CALIB_PATTERN_W = 7 # Number of inner corners along the width (X direction in image)
 EXTRINSIC_CALIB_PATTERN_H = 5 # Number of inner corners along the height (Y direction in image)
 
+# Surround cameras mounted on the vehicle (order defines LUT / atlas camera indices)
+CAMERAS = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+
 CALIB_PAD_CENTER = { # Meters from the car center to the center of the calibration pad in the real world
     "Cam_Front": (3.5, 0), 
     "Cam_Back": (-3.5, 0),
@@ -31,11 +34,56 @@ BEV_HEIGHT = 1000
 X_RANGE = (-5.0, 5.0)  # Meters (from bottom to top of image)
 Y_RANGE = (-5.0, 5.0)  # Meters (from right to left of image)
 
+# Multi-resolution LUT pyramid: stitching_bev.py / stitching_bowl.py also write their LUTs at these
+# output widths (same ground area, luts/level_<width>/). Renderers pick the smallest level at least
+# RENDER_OUTPUT_WIDTH wide (None = BEV_WIDTH), so small displays do not pay full-resolution cost
+LUT_PYRAMID_LEVELS = (250, 500, 1000, 2000)
+RENDER_OUTPUT_WIDTH = None
+
 # Car Dimensions (For UI Overlay and masking)
 CAR_LENGTH = 4.8  # Meters
 CAR_WIDTH = 1.9   # Meters
 DRAW_CAR_MASK = False # Whether to draw the car mask bounding box over the final BEV map
 
+# Lens vignetting correction: pipeline/calibration/calibrate_vignetting.py estimates a radial shading
+# profile from the calibration images; the stitching scripts fold its inverse (at most
+# VIGNETTING_MAX_GAIN) into the LUT weights. The corrected weights are no longer exactly 1, so the
+# "regions" compositor scales its exclusive regions instead of copying them: re-run autotune.py
+# after toggling this flag and re-stitching
+VIGNETTING_CORRECTION = False
+VIGNETTING_MAX_GAIN = 2.0
+
+# Photometric gain compensation (pipeline/compositor/gain_comp.py): stitching_bev.py stores a fixed
+# subsample of overlap source pixels per camera pair; render_bev.py reads only those, solves one gain
+# per camera GAIN_COMP_RATE times per second and folds the gains into the LUT weights
+GAIN_COMPENSATION = False
+GAIN_SAMPLES_PER_PAIR = 1024
+GAIN_COMP_RATE = 2.0     # Hz
+GAIN_SMOOTHING = 0.5     # Fraction of the way to each new solution (damps flicker)
+GAIN_TOLERANCE = 0.005   # Smallest gain change that rebuilds the compositor tables
+
+# Parking guidelines (pipeline/compositor/overlay.py): reversing tracks of the rear bumper corners,
+# pre-rendered as sprites every GUIDELINE_STEER_STEP degrees of road-wheel angle. The render scripts
+# simulate a steering sweep and draw the sprite of the current angle's bin
+DRAW_GUIDELINES = False
+CAR_WHEELBASE = 2.8      # Meters
+CAR_REAR_OVERHANG = 1.0  # Meters from the rear bumper to the rear axle
+GUIDELINE_LENGTH = 3.0   # Meters behind the rear bumper, with a cross bar every meter
+GUIDELINE_MAX_STEER = 35.0  # Degrees
+GUIDELINE_STEER_STEP = 2.5  # Degrees per pre-rendered sprite
+
+# Zoomed ROI views (pipeline/bev_2d/render_zoom.py): ground rectangles (x_min, x_max, y_min, y_max) in
+# meters rendered on demand at ZOOM_PIXELS_PER_METER, each LUT built only for its rectangle and cached
+# by (rectangle, density, calibration hash) in an LRU bounded by ZOOM_CACHE_MB
+ZOOM_PIXELS_PER_METER = 300
+ZOOM_ROIS = {
+    "front_left_wheel": (0.6, 2.6, 0.2, 2.2),
+    "front_right_wheel": (0.6, 2.6, -2.2, -0.2),
+    "rear_left_wheel": (-2.6, -0.6, 0.2, 2.2),
+    "rear_right_wheel": (-2.6, -0.6, -2.2, -0.2),
+}
+ZOOM_CACHE_MB = 256
+
 # 3D Bowl Specific Parameters
 BOWL_MAX_RADIUS = 4.8  # Tightly clip the 3D mesh to the valid camera coverage area
 BOWL_NUM_RINGS = 40    # Mesh fidelity: How many concentric circles make up the bowl
@@ -44,6 +92,120 @@ BOWL_FLAT_RECT_X = 2.5 # Meters from origin: Defines width of the central rectan
 BOWL_FLAT_RECT_Y = 2.5 # Meters from origin: Defines length of the central rectangular "flat ground" zone
 BOWL_FLAT_MARGIN = 1.5 # Meters of additional flat radial padding extending outward from the central rectangle before sweeping upward
 BOWL_STEEPNESS = 0.5   # Exponent/Multiplier for how fast the edges curve upwards
+BOWL_ALPHA_CLIP_RADIUS = 4.9  # Meters: bowl texels (and free-view hits) beyond this radius are transparent
+
+# CPU free-view 3D bowl (pipeline/bowl_3d/render_bowl_view.py): display pixels ray-cast against the bowl
+# and compiled into view-dependent LUTs. The pose orbits target: azimuth counter-clockwise from the front
+# of the car and elevation above the ground in degrees, distance in meters, horizontal fov in degrees
+FREE_VIEW_SIZE = (1280, 720)
+FREE_VIEW_POSE = {"azimuth": 200, "elevation": 35, "distance": 8.0, "target": (0.5, 0.0, 0.0), "fov": 60}
+
+# Free-view preset tour (pipeline/bowl_3d/render_bowl_tour.py): the head unit cycles through these poses and
+# animates between them. Each move is sampled at FREE_VIEW_TRANSITION_STEPS cached key poses, frames in
+# between crossfade the two nearest ones. Compiled views live in an LRU cache bounded by FREE_VIEW_CACHE_MB
+FREE_VIEW_PRESETS = {
+    "rear": {"azimuth": 180, "elevation": 35, "distance": 8.0, "target": (0.5, 0.0, 0.0), "fov": 60},
+    "front_left": {"azimuth": 40, "elevation": 30, "distance": 8.0, "target": (0.5, 0.0, 0.0), "fov": 60},
+    "top": {"azimuth": 180, "elevation": 70, "distance": 9.0, "target": (0.0, 0.0, 0.0), "fov": 60},
+    "right": {"azimuth": 270, "elevation": 30, "distance": 7.0, "target": (0.0, 0.0, 0.0), "fov": 60},
+}
+FREE_VIEW_TRANSITION_STEPS = 6   # Key poses compiled per preset-to-preset move
+FREE_VIEW_TRANSITION_FRAMES = 30 # Displayed frames per move
+FREE_VIEW_HOLD_FRAMES = 15       # Frames each preset is held before moving on
+FREE_VIEW_CACHE_MB = None        # View cache budget; None holds every key pose of the tour (~100 MB per float 1280x720 view)
 
 # Projection Mask Tuning
 MASK_RADIUS_SCALE = 1.05  # > 1.0 reduces masking on edges, letting camera see wider
+
+# 360° Cylindrical Panorama (pipeline/panorama/): a strip unrolled from a vertical cylinder around the
+# car centre, front in the middle and rear at both edges; the height follows from the aspect ratio
+PANORAMA_WIDTH = 2048          # Pixels for the full 360°
+PANORAMA_RADIUS = 5.0          # Meters from the car centre to the cylinder wall
+PANORAMA_Z_RANGE = (0.0, 3.0)  # Meters of wall covered, from the ground up
+
+# Reduced-resolution input (render_bev.py / render_bowl.py): decode camera frames at 1/N scale
+# (1, 2, 4 or 8 via cv2.IMREAD_REDUCED_COLOR_N) and rescale the LUTs to match at load time
+INPUT_SCALE = 1
+
+# Real-Time Compositor (render_bev.py / render_bowl.py)
+# "float": float32 remap maps and weights (reference path)
+# "fixed": CV_16SC2 fixed-point maps with Q8 integer weights, within +/-1 LSB of "float"
+# "sparse": packed per-camera LUTs covering only pixels with weight > 0 (lut_*_sparse.npz)
+# "regions": remap-copy exclusive single-camera regions, blend only the overlap bands
+# "tiled": horizontal tiles composited in parallel on a thread pool (see COMPOSITOR_TILES below)
+# "gather": np.take of nearest source pixels, no cv2.remap (approximate)
+# "nearest": nearest-neighbour integer remap + Q8 weights (approximate)
+# "topk": one LUT holding only the top-K cameras per pixel, K remaps per frame for any camera count
+# "incremental": recomposite only tiles whose camera source footprint changed (static scenes)
+# "async": per-camera partial recomposite as each unsynchronized camera delivers a frame
+# "yuv": cameras deliver NV12 / YUYV, remapped natively (luma full-res, chroma half-res LUT)
+# "numba": single-pass Numba kernel fusing remap, weighting and accumulation (needs numba)
+# "auto": backend picked by pipeline/compositor/autotune.py (luts/autotune.json), else "float"
+COMPOSITOR_MODE = "float"
+
+# Tile-parallel compositor ("tiled" mode)
+COMPOSITOR_TILES = 16           # Horizontal tiles the canvas is split into
+COMPOSITOR_WORKERS = 4          # Thread pool size (OpenCV / NumPy release the GIL)
+COMPOSITOR_CPU_AFFINITY = None  # e.g. [0, 1, 2, 3] to pin workers round-robin (Linux only)
+
+# Top-K camera-per-pixel LUTs ("topk" mode and the top-K GPU assets)
+TOPK_CAMERAS = 2  # Cameras kept per output pixel; per-frame cost stays flat as CAMERAS grows
+
+# Dirty-tile incremental compositor ("incremental" mode, for a parked vehicle / sentry mode)
+INCREMENTAL_TILE_SIZE = 50   # Output tile edge in pixels
+INCREMENTAL_DOWNSAMPLE = 8   # Camera frames are differenced at 1/8 resolution (INTER_AREA)
+INCREMENTAL_THRESHOLD = 8    # Grey levels a downsampled cell must move to mark its tiles dirty
+
+# Per-camera asynchronous compositor ("async" mode): render_bev.py simulates cameras that are
+# not hardware-synchronized, each delivering at its own rate (Hz), shown at ASYNC_DISPLAY_RATE
+ASYNC_CAMERA_RATES = {"Cam_Front": 30, "Cam_Left": 25, "Cam_Back": 20, "Cam_Right": 15}
+ASYNC_DISPLAY_RATE = 30
+
+# Native YUV compositor ("yuv" mode)
+YUV_INPUT_FORMAT = "nv12"   # Camera pixel format: "nv12" or "yuyv" (as delivered by V4L2)
+YUV_OUTPUT_FORMAT = "bgr"   # "bgr" (one conversion after blending) or "nv12" for a YUV display sink
+
+# Display layout (pipeline/display/): the head-unit screen, compiled by compile_layout.py into one
+# display-resolution LUT set so render_layout.py produces the whole screen in a single composite.
+# Panel rects are (x, y, width, height) in screen pixels; pixels outside every panel stay black.
+# "bev": the 2D BEV canvas scaled into rect, "camera": dewarped pinhole view (fov in degrees)
+DISPLAY_WIDTH = 1280
+DISPLAY_HEIGHT = 720
+DISPLAY_LAYOUT = [
+    {"view": "bev", "rect": (16, 16, 688, 688)},
+    {"view": "camera", "camera": "Cam_Front", "fov": 100, "rect": (720, 138, 544, 444)},
+]
+
+# Virtual pinhole views (pipeline/compositor/virtual_view.py): rectified views of one camera, each
+# split into panes rotated by yaw (positive = right) and pitch (positive = down) off the optical
+# axis with a horizontal fov, all in degrees. Maps are built once and cached in data/virtual_views/cache
+VIRTUAL_VIEWS = {
+    "rear": {
+        "camera": "Cam_Back",
+        "size": (640, 400),
+        "mirror": True,  # Shown as in a rear-view mirror
+        "panes": [{"yaw": 0, "pitch": 20, "fov": 100}],
+    },
+    "curb_right": {
+        "camera": "Cam_Right",
+        "size": (480, 360),
+        "panes": [{"yaw": 0, "pitch": 50, "fov": 90}],
+    },
+    "cross_traffic": {
+        "camera": "Cam_Front",
+        "size": (960, 360),
+        "panes": [{"yaw": -50, "pitch": 10, "fov": 70}, {"yaw": 50, "pitch": 10, "fov": 70}],
+    },
+}
+RENDER_VIRTUAL_VIEWS = []  # Names from VIRTUAL_VIEWS streamed every frame alongside the BEV (render_bev.py)
+DEBUG_UNDISTORT_FOV = 147  # Horizontal fov of the undistorted debug images (calibration / stitching)
+
+# Autotuner: largest per-pixel deviation (0-255) from the float reference a winning backend may have
+AUTOTUNE_MAX_ERROR = 1
+
+# Pipelined render loop (render_bev.py)
+RENDER_PIPELINED = False  # Overlap decode (N+1), composite (N) and encode (N-1) on separate threads
+RENDER_QUEUE_DEPTH = 2    # Frames buffered between stages (2 = double buffering)
+
+# Report steady-state allocations of the render loops via tracemalloc (extra 10 frames, after timing)
+RENDER_TRACK_ALLOCATIONS = False
@@ -41,7 +41,7 @@ with np.load(intrinsic_params_path) as data:
     K = data["K"]
     D = data["D"]
 
-cameras = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+cameras = config.CAMERAS
 print("Initializing 3D spatial mapping grid for Evaluation...")
 u, v = np.meshgrid(np.arange(BEV_WIDTH), np.arange(BEV_HEIGHT))
 X = X_RANGE[1] - (v / PIXELS_PER_METER)
@@ -17,113 +17,436 @@ if base_dir not in sys.path:
     sys.path.append(base_dir)
 
 import config
+from pipeline.compositor import (
+    backends,
+    benchmark,
+    gain_comp,
+    incremental,
+    lut_pyramid,
+    overlay,
+    per_camera,
+    pipelined,
+    reduced_input,
+    source_crop,
+    tiled,
+    virtual_view,
+    yuv,
+)
 
-PIXELS_PER_METER = config.PIXELS_PER_METER
-BEV_WIDTH = config.BEV_WIDTH
-BEV_HEIGHT = config.BEV_HEIGHT
 CAR_LENGTH = config.CAR_LENGTH
 CAR_WIDTH = config.CAR_WIDTH
-luts_dir = os.path.join(base_dir, "data/bev_2d/luts")
+base_luts_dir = os.path.join(base_dir, "data/bev_2d/luts")
+
+# LUT pyramid level for this render target: the smallest one at least RENDER_OUTPUT_WIDTH wide
+level = lut_pyramid.select_level(
+    lut_pyramid.available_levels(base_luts_dir, config.BEV_WIDTH),
+    config.RENDER_OUTPUT_WIDTH or config.BEV_WIDTH,
+)
+luts_dir = lut_pyramid.level_dir(base_luts_dir, level, config.BEV_WIDTH)
+BEV_WIDTH, BEV_HEIGHT = lut_pyramid.level_shape(level, (config.BEV_WIDTH, config.BEV_HEIGHT))
+PIXELS_PER_METER = config.PIXELS_PER_METER * BEV_WIDTH / config.BEV_WIDTH
 images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+views_dir = os.path.join(base_dir, "data/virtual_views")
 
-cameras = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+cameras = config.CAMERAS
 luts = {}
 
-print("Loading pre-computed SVM Look-Up Tables (LUTs)...")
-for cam in cameras:
-    lut_path = os.path.join(luts_dir, f"lut_{cam}.npz")
-    if not os.path.exists(lut_path):
-        print(
-            f"Error: Missing LUT for {cam}. Run stitching_bev.py first to generate them."
-        )
+# Resolve the compositing backend (COMPOSITOR_MODE; "auto" reads this level's autotune.json)
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir, config.INPUT_SCALE)
+# The sparse compositor reads the packed twin LUTs written next to the dense ones
+lut_suffix = "_sparse" if compositor_mode == "sparse" else ""
+# Backends consuming a combined table from the stitching stage: (file, prepare kwarg)
+combined_luts = {
+    "regions": ("lut_regions.npz", "partition"),
+    "topk": ("lut_topk.npz", "topk_lut"),
+}
+
+print(f"Loading pre-computed SVM Look-Up Tables (LUTs) at {BEV_WIDTH}x{BEV_HEIGHT}...")
+prepare_kwargs = {}
+if compositor_mode in combined_luts:
+    filename, kwarg = combined_luts[compositor_mode]
+    combined_path = os.path.join(luts_dir, filename)
+    if not os.path.exists(combined_path):
+        print(f"Error: Missing {combined_path}. Re-run stitching_bev.py to generate it.")
         sys.exit(1)
+    with np.load(combined_path) as data:
+        prepare_kwargs[kwarg] = {key: data[key] for key in data.files}
 
-    with np.load(lut_path) as data:
-        # Pre-calculated projection coordinates
-        map_x = data["map_x"]
-        map_y = data["map_y"]
-        # Pre-normalized alpha blending weight
-        weight = data["weight"]
-
-        luts[cam] = {
-            "map_x": map_x,
-            "map_y": map_y,
-            # Expand weight to 3 channels for fast vectorized color multiplication
-            "weight": np.stack([weight] * 3, axis=-1).astype(np.float32),
-        }
-
-print("\nStarting simulated Real-Time Render loop...")
-
-# Load our static test images (In a real car, this would be a live VideoCapture feed)
-frames = {}
-for cam in cameras:
-    frames[cam] = cv2.imread(os.path.join(images_dir, f"{cam}.png"))
-
-
-# Pre-draw the Car Icon overlay
-def create_car_overlay():
-    overlay = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.uint8)
-    car_top = int(BEV_HEIGHT / 2 - (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
-    car_bot = int(BEV_HEIGHT / 2 + (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
-    car_left = int(BEV_WIDTH / 2 - (CAR_WIDTH / 2.0) * PIXELS_PER_METER)
-    car_right = int(BEV_WIDTH / 2 + (CAR_WIDTH / 2.0) * PIXELS_PER_METER)
-
-    cv2.rectangle(overlay, (car_left, car_top), (car_right, car_bot), (30, 30, 30), -1)
-    cv2.rectangle(
-        overlay, (car_left, car_top), (car_right, car_bot), (255, 255, 255), 3
-    )
-    cv2.putText(
-        overlay,
-        "FRONT",
-        (int(BEV_WIDTH / 2 - 40), car_top + 40),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.8,
-        (255, 255, 255),
-        2,
+# The top-K LUT already holds every camera's contribution, no per-camera tables needed
+if compositor_mode != "topk":
+    for cam in cameras:
+        lut_path = os.path.join(luts_dir, f"lut_{cam}{lut_suffix}.npz")
+        if not os.path.exists(lut_path):
+            print(
+                f"Error: Missing LUT for {cam}. Run stitching_bev.py first to generate them."
+            )
+            sys.exit(1)
+
+        with np.load(lut_path) as data:
+            # Pre-calculated projection coordinates and pre-normalized alpha blending weight
+            # (sparse LUTs additionally carry their shape, bbox and packed pixel indices)
+            luts[cam] = {key: data[key] for key in data.files}
+
+# Reduced-resolution input: keep the full-res tables for the quality report and rescale the
+# source coordinates once to match frames decoded at 1/INPUT_SCALE
+full_luts, full_prepare_kwargs = luts, prepare_kwargs
+luts, prepare_kwargs = reduced_input.rescale_luts(luts, prepare_kwargs, config.INPUT_SCALE)
+
+# Source boxes the LUTs read (None for LUTs stored before source cropping)
+full_crops = source_crop.lut_crops(full_luts, full_prepare_kwargs, cameras)
+crops = source_crop.lut_crops(luts, prepare_kwargs, cameras)
+
+backend = backends.prepare_backend(
+    compositor_mode,
+    luts,
+    cameras,
+    reuse_buffers=not config.RENDER_PIPELINED,
+    **prepare_kwargs,
+)
+
+# Photometric gain compensation: GAIN_COMP_RATE times per second the overlap samples stored by
+# stitching_bev.py re-solve the per-camera gains, folded into the LUT weights on a worker thread
+compensator = None
+if config.GAIN_COMPENSATION:
+    if compositor_mode == "async":
+        # Its canvas holds every camera's cached weighted contribution, and the loop below
+        # updates that one prepared state in place instead of swapping in rebuilt backends
+        print("Error: GAIN_COMPENSATION does not support the async compositor.")
+        sys.exit(1)
+    gain_samples_path = os.path.join(base_luts_dir, "lut_gain_samples.npz")
+    if not os.path.exists(gain_samples_path):
+        print(f"Error: Missing {gain_samples_path}. Re-run stitching_bev.py to generate it.")
+        sys.exit(1)
+    with np.load(gain_samples_path) as data:
+        gain_samples = {key: data[key] for key in data.files}
+
+    def prepare_gained(gains):
+        gained_luts, gained_kwargs = gain_comp.scale_luts(luts, prepare_kwargs, cameras, gains)
+        return backends.prepare_backend(
+            compositor_mode,
+            gained_luts,
+            cameras,
+            reuse_buffers=not config.RENDER_PIPELINED,
+            **gained_kwargs,
+        )
+
+    compensator = gain_comp.GainCompensator(
+        gain_samples,
+        cameras,
+        backend,
+        prepare_gained,
+        release=backends.release,
+        rate=config.GAIN_COMP_RATE,
+        smoothing=config.GAIN_SMOOTHING,
+        tolerance=config.GAIN_TOLERANCE,
+        scale=config.INPUT_SCALE,
     )
-    return overlay
 
 
-car_overlay = create_car_overlay()
-car_mask = car_overlay > 0
+def current_backend(decoded):
+    # Only every 1 / GAIN_COMP_RATE seconds does this read the overlap samples
+    if compensator is None:
+        return backend
+    return compensator.update(decoded, time.time())
+
+
+print(f"\nStarting simulated Real-Time Render loop ({compositor_mode} compositor)...")
+
+
+def decode_frames(scale=config.INPUT_SCALE):
+    # Load our static test images (In a real car, this would be a live VideoCapture feed)
+    return {
+        cam: reduced_input.read_frame(os.path.join(images_dir, f"{cam}.png"), scale)
+        for cam in cameras
+    }
+
+
+def prepare_frames(decoded, crops=crops):
+    loaded = dict(decoded)
+    for cam in cameras:
+        if crops is not None:
+            # Only the region the LUT samples is remapped (a V4L2 crop / ROI on a real device)
+            loaded[cam] = source_crop.crop_frame(loaded[cam], crops[cam])
+        if compositor_mode == "yuv":
+            # Stand-in for a V4L2 camera delivering NV12 / YUYV
+            loaded[cam] = yuv.from_bgr(loaded[cam], config.YUV_INPUT_FORMAT)
+    return loaded
+
+
+def load_frames(scale=config.INPUT_SCALE, crops=crops):
+    return prepare_frames(decode_frames(scale), crops)
+
+
+decoded = decode_frames()
+frames = prepare_frames(decoded)
+frame_sizes = ", ".join(f"{f.shape[1]}x{f.shape[0]}" for f in frames.values())
+print(
+    f"Input frames: {frame_sizes} (1/{config.INPUT_SCALE} scale"
+    f"{', source-cropped' if crops is not None else ''}), "
+    f"{sum(f.nbytes for f in frames.values()) / 2**20:.1f} MiB per frame set"
+)
+
+# Virtual pinhole views streamed alongside the BEV, from the full decoded frames
+views = {}
+if config.RENDER_VIRTUAL_VIEWS:
+    if compositor_mode == "yuv":
+        print("Error: RENDER_VIRTUAL_VIEWS needs BGR camera frames, not the yuv compositor.")
+        sys.exit(1)
+    with np.load(intrinsic_params_path) as data:
+        K = data["K"]
+        D = data["D"]
+    for name in config.RENDER_VIRTUAL_VIEWS:
+        if name not in config.VIRTUAL_VIEWS:
+            print(f"Error: Unknown virtual view '{name}'. Available: {', '.join(config.VIRTUAL_VIEWS)}")
+            sys.exit(1)
+        view = config.VIRTUAL_VIEWS[name]
+        width, height = view["size"]
+        views[name] = (
+            view["camera"],
+            virtual_view.load_view_maps(
+                os.path.join(views_dir, "cache"), K, D, view, config.INPUT_SCALE
+            ),
+            np.empty((height, width, 3), dtype=np.uint8),
+        )
+    print(f"Streaming virtual views: {', '.join(config.RENDER_VIRTUAL_VIEWS)}")
+
+
+def render_views(decoded, updated=None):
+    # One fixed-point remap per view into its persistent buffer; updated limits the cameras
+    for cam, maps, out in views.values():
+        if updated is None or cam in updated:
+            virtual_view.render_view(decoded[cam], maps, out=out)
+
+
+# Pre-rendered UI overlay sprites, blended only inside their rectangles every frame
+car_layer = []
+if config.DRAW_CAR_MASK:
+    car_layer.append(
+        overlay.car_sprite((BEV_WIDTH, BEV_HEIGHT), PIXELS_PER_METER, CAR_LENGTH, CAR_WIDTH)
+    )
+guidelines = {}
+if config.DRAW_GUIDELINES:
+    guidelines = overlay.guideline_sprites(
+        config.GUIDELINE_MAX_STEER,
+        config.GUIDELINE_STEER_STEP,
+        (BEV_WIDTH, BEV_HEIGHT),
+        PIXELS_PER_METER,
+        CAR_LENGTH,
+        CAR_WIDTH,
+        config.CAR_WHEELBASE,
+        config.CAR_REAR_OVERHANG,
+        config.GUIDELINE_LENGTH,
+    )
+if car_layer or guidelines:
+    area = overlay.sprite_area(car_layer) + max(
+        (overlay.sprite_area([sprite]) for sprite in guidelines.values()), default=0
+    )
+    print(
+        f"UI overlay: {len(car_layer)} car + {len(guidelines)} guideline sprites, up to "
+        f"{area} px blended per frame ({area / (BEV_WIDTH * BEV_HEIGHT) * 100:.1f}% of the canvas)"
+    )
+if compositor_mode == "yuv" and config.YUV_OUTPUT_FORMAT == "nv12":
+    # Draw the overlay straight into the NV12 canvas
+    car_layer = [part for sprite in car_layer for part in overlay.to_nv12(sprite, BEV_HEIGHT)]
+    guidelines = {
+        angle: overlay.to_nv12(sprite, BEV_HEIGHT) for angle, sprite in guidelines.items()
+    }
+else:
+    guidelines = {angle: [sprite] for angle, sprite in guidelines.items()}
 
 # Simulate 50 frames to measure FPS
 NUM_FRAMES = 50
-start_time = time.time()
 
-for i in range(NUM_FRAMES):
-    # This loop represents what happens EVERY SINGLE FRAME in a real car dashboard
-    bev = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.float32)
 
+def steering_angle(i):
+    # Stand-in for the steering angle on the vehicle bus: one full left-right sweep per run
+    return config.GUIDELINE_MAX_STEER * np.sin(2.0 * np.pi * i / NUM_FRAMES)
+
+
+def overlay_sprites(steer):
+    if not guidelines:
+        return car_layer
+    angle = overlay.quantize_steer(steer, config.GUIDELINE_MAX_STEER, config.GUIDELINE_STEER_STEP)
+    return car_layer + guidelines[angle]
+
+
+if config.RENDER_PIPELINED:
+    # Staged pipeline: decode N+1 | composite N | encode N-1 run concurrently
+
+    def acquire_frames(i):
+        # Decode every frame from disk, standing in for a live VideoCapture / V4L2 read
+        decoded = decode_frames()
+        return decoded, prepare_frames(decoded), steering_angle(i)
+
+    def composite_frame(frame_set):
+        decoded, frames, steer = frame_set
+        render_views(decoded)
+        bev = backends.composite(current_backend(decoded), frames)
+        overlay.draw_sprites(bev, overlay_sprites(steer))
+        return bev
+
+    sink = {}
+
+    def emit_frame(i, image):
+        # Encode for the display / stream sink and keep the newest frame for the PNG dump
+        sink["encoded"] = cv2.imencode(".jpg", image)[1]
+        sink["last"] = image
+
+    stats = pipelined.run_pipeline(
+        acquire_frames,
+        composite_frame,
+        emit_frame,
+        NUM_FRAMES,
+        queue_depth=config.RENDER_QUEUE_DEPTH,
+    )
+    final_bev = sink["last"]
+    fps = NUM_FRAMES / stats["wall"]
+
+    print("End-to-end latency per frame (acquire start -> encode done):")
+    for i, latency in enumerate(stats["latency"]):
+        print(f"  frame {i:>3}: {latency * 1000:7.2f} ms")
+    for stage in ("acquire", "composite", "emit"):
+        print(f"Mean {stage:<9} stage: {np.mean(stats[stage]) * 1000:7.2f} ms")
+    print(
+        f"Latency mean / p95 / max: {np.mean(stats['latency']) * 1000:.2f} / "
+        f"{np.percentile(stats['latency'], 95) * 1000:.2f} / "
+        f"{np.max(stats['latency']) * 1000:.2f} ms"
+    )
+elif compositor_mode == "async":
+    # Unsynchronized cameras: each display tick folds in only the frames that arrived since
+    # the previous tick (simulated clock, see ASYNC_CAMERA_RATES in config.py)
+    display_rate = config.ASYNC_DISPLAY_RATE
+    staleness_log = {cam: [] for cam in cameras}
+
+    def render_frame(i):
+        now = i / display_rate
+        bev = backend["composite_kwargs"]["out"]
+        for cam in cameras:
+            rate = config.ASYNC_CAMERA_RATES[cam]
+            # Index of the newest frame this camera has delivered by now (integer math, no drift)
+            newest = i * rate // display_rate
+            if i == 0 or newest > (i - 1) * rate // display_rate:
+                per_camera.update(
+                    backend["prepared"],
+                    cam,
+                    frames[cam],
+                    bev,
+                    timestamp=newest / rate,
+                    scratch=backend["composite_kwargs"]["scratch"],
+                )
+                render_views(decoded, updated=(cam,))
+        for cam, age in per_camera.staleness(backend["prepared"], now).items():
+            staleness_log[cam].append(age)
+
+        sprites = overlay_sprites(steering_angle(i))
+        if sprites:
+            # The canvas keeps the other cameras' pixels for the next tick, draw on a copy
+            bev = overlay.draw_sprites(backends.overlay_canvas(backend, bev), sprites)
+        return bev
+
+    start_time = time.time()
+
+    for i in range(NUM_FRAMES):
+        final_bev = render_frame(i)
+
+    end_time = time.time()
+    fps = NUM_FRAMES / (end_time - start_time)
+
+    print("Per-camera staleness at display time:")
     for cam in cameras:
-        lut = luts[cam]
-        img = frames[cam]
-
-        # 1. Fetch exact pixel colors instantly mapping curved 180 FOV to flat ground
-        warped = cv2.remap(
-            img,
-            lut["map_x"],
-            lut["map_y"],
-            cv2.INTER_LINEAR,
-            borderMode=cv2.BORDER_CONSTANT,
-            borderValue=(0, 0, 0),
+        ages = np.array(staleness_log[cam]) * 1000
+        print(
+            f"  {cam:<10} {config.ASYNC_CAMERA_RATES[cam]:>3} Hz  "
+            f"{backend['prepared']['updates'][cam]:>3} updates  "
+            f"mean {ages.mean():6.2f} ms  max {ages.max():6.2f} ms"
         )
+else:
+    def render_frame(i):
+        # This represents what happens EVERY SINGLE FRAME in a real car dashboard
+        frame_backend = current_backend(decoded)
+        bev = backends.composite(frame_backend, frames)
+        render_views(decoded)
+
+        # Render UI Overlay (on a copy if the backend keeps its canvas, e.g. incremental)
+        sprites = overlay_sprites(steering_angle(i))
+        if sprites:
+            bev = overlay.draw_sprites(backends.overlay_canvas(frame_backend, bev), sprites)
+        return bev
+
+    start_time = time.time()
 
-        # 2. Multiply by alpha weight and composite instantly (no complex math)
-        bev += warped.astype(np.float32) * lut["weight"]
+    for i in range(NUM_FRAMES):
+        final_bev = render_frame(i)
 
-    final_bev = bev.astype(np.uint8)
+    end_time = time.time()
+    fps = NUM_FRAMES / (end_time - start_time)
 
-    # Render UI Overlay
-    if config.DRAW_CAR_MASK:
-        final_bev[car_mask] = car_overlay[car_mask]
+    if config.RENDER_TRACK_ALLOCATIONS:
+        peak, held = benchmark.measure_allocations(render_frame)
+        print(
+            f"Steady-state allocations: peak {peak / 1024:.1f} KiB, "
+            f"retained {held / 1024:.1f} KiB over 10 frames"
+        )
+
+if compensator is not None:
+    compensator.close()
+    backend = compensator.backend
+    gains = ", ".join(f"{cam} {gain:.3f}" for cam, gain in zip(cameras, compensator.applied))
+    stats = compensator.stats
+    print(f"Gain compensation: {gains}")
+    print(
+        f"Overlap mismatch: {stats['error_before']:.2f} -> {stats['error_after']:.2f} gray levels "
+        f"({stats['updates']} updates at {config.GAIN_COMP_RATE:g} Hz, {stats['rebuilds']} rebuilds)"
+    )
 
-end_time = time.time()
-fps = NUM_FRAMES / (end_time - start_time)
+if compositor_mode == "tiled":
+    print(f"Per-tile composite time ({config.COMPOSITOR_WORKERS} workers):")
+    for y0, y1, tile_ms, tile_cams in tiled.tile_report(backend["prepared"]):
+        print(f"  rows {y0:>4}-{y1:<4} {tile_ms:6.2f} ms  ({tile_cams} cams)")
+if compositor_mode == "incremental":
+    dirty, total = incremental.dirty_report(backend["prepared"])
+    print(f"Dirty tiles per frame: {dirty:.1f} / {total} ({dirty / total * 100:.1f}% recomposited)")
+backends.release(backend)
 
-print(f"Processed 4x Camera inputs to composite 1000x1000px SVM output.")
+print(f"Processed 4x Camera inputs to composite {BEV_WIDTH}x{BEV_HEIGHT}px SVM output.")
 print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
 
 output_path = os.path.join(base_dir, "data/bev_2d/realtime_demo_bev.png")
+if final_bev.ndim == 2:
+    # NV12 canvas (YUV_OUTPUT_FORMAT = "nv12"), converted only for the PNG dump
+    final_bev = cv2.cvtColor(final_bev, cv2.COLOR_YUV2BGR_NV12)
 cv2.imwrite(output_path, final_bev)
 print(f"Output saved to: {output_path}")
+
+for name, (cam, maps, out) in views.items():
+    view_path = os.path.join(views_dir, f"{name}.png")
+    cv2.imwrite(view_path, out)
+    print(f"Virtual view '{name}' ({cam}, {out.shape[1]}x{out.shape[0]}) saved to: {view_path}")
+
+if config.INPUT_SCALE > 1:
+    # Quality delta: the same backend fed full-resolution frames and the original LUTs
+    if compensator is not None:
+        full_luts, full_prepare_kwargs = gain_comp.scale_luts(
+            full_luts, full_prepare_kwargs, cameras, compensator.applied
+        )
+    reference_backend = backends.prepare_backend(
+        compositor_mode, full_luts, cameras, **full_prepare_kwargs
+    )
+    reference = backends.composite(
+        reference_backend, load_frames(scale=1, crops=full_crops)
+    )
+    backends.release(reference_backend)
+    if reference.ndim == 2:
+        reference = cv2.cvtColor(reference, cv2.COLOR_YUV2BGR_NV12)
+
+    quality = reduced_input.quality_report(
+        reference, final_bev, valid=reference.max(axis=-1) > 0
+    )
+    print(
+        f"Quality vs full-resolution input (covered pixels): "
+        f"mean error {quality['mean_error']:.2f}, max {quality['max_error']:.0f}, "
+        f"PSNR {quality['psnr']:.2f} dB"
+    )
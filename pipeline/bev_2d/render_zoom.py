@@ -0,0 +1,128 @@
+"""
+Module: render_zoom.py
+
+This module provides the zoomed parking views: high-density BEV close-ups of ground rectangles
+(ZOOM_ROIS / ZOOM_PIXELS_PER_METER in config.py), e.g. around each wheel.
+
+Every zoom is built on first request from the calibration, covering only its rectangle
+(pipeline/compositor/roi_view.py), and cached; the loop requests each zoom twice to show the
+cost of a first request and of a repeat one, then composites it like any BEV frame.
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import backends, reduced_input, roi_view, source_crop, sparse_lut
+
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+luts_dir = os.path.join(base_dir, "data/bev_2d/luts")
+output_dir = os.path.join(base_dir, "data/bev_2d/zoom")
+os.makedirs(output_dir, exist_ok=True)
+
+cameras = config.CAMERAS
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir, config.INPUT_SCALE)
+if compositor_mode == "yuv":
+    # Every zoom crops the frames differently, which packed NV12 / YUYV cannot do
+    print("Error: The zoomed views need BGR frames; pick another COMPOSITOR_MODE.")
+    sys.exit(1)
+
+if not os.path.exists(intrinsic_params_path):
+    print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+    sys.exit(1)
+
+with np.load(intrinsic_params_path) as data:
+    K = data["K"]
+    D = data["D"]
+
+print("Loading extrinsics and camera frames...")
+calibration = {}
+frame_shapes = {}
+decoded = {}
+for cam in cameras:
+    ext_path = os.path.join(extrinsic_dir, f"extrinsic_{cam}.npz")
+    img_path = os.path.join(images_dir, f"{cam}.png")
+    if not os.path.exists(ext_path) or not os.path.exists(img_path):
+        print(f"Error: Missing extrinsics or frame for {cam}. Run the calibration first.")
+        sys.exit(1)
+    with np.load(ext_path) as edata:
+        calibration[cam] = (edata["rvec"], edata["tvec"])
+    frame_shapes[cam] = cv2.imread(img_path).shape[:2]
+    decoded[cam] = reduced_input.read_frame(img_path, config.INPUT_SCALE)
+
+
+def prepare_zoom(luts):
+    """Turn a zoom's LUT set into a ready-to-composite backend and the frame crops it reads."""
+    if compositor_mode == "sparse":
+        luts = {
+            cam: {
+                **sparse_lut.pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"]),
+                "src_crop": lut["src_crop"],
+            }
+            for cam, lut in luts.items()
+        }
+    luts, prepare_kwargs = reduced_input.rescale_luts(luts, {}, config.INPUT_SCALE)
+    return {
+        "backend": backends.prepare_backend(compositor_mode, luts, cameras, **prepare_kwargs),
+        "crops": source_crop.lut_crops(luts, prepare_kwargs, cameras),
+    }
+
+
+zooms = roi_view.RoiViews(
+    cameras,
+    calibration,
+    K,
+    D,
+    frame_shapes,
+    mask_radius_scale=config.MASK_RADIUS_SCALE,
+    budget_mb=config.ZOOM_CACHE_MB,
+    prepare=prepare_zoom,
+    release=lambda zoom: backends.release(zoom["backend"]),
+)
+print(f"Calibration hash: {zooms.digest}")
+
+NUM_FRAMES = 20
+density = config.ZOOM_PIXELS_PER_METER
+print(f"\nZooming at {density} px/m ({compositor_mode} compositor)...")
+for name, rect in config.ZOOM_ROIS.items():
+    start_time = time.time()
+    zooms.get(rect, density)
+    first_ms = (time.time() - start_time) * 1000.0
+
+    start_time = time.time()
+    zoom = zooms.get(rect, density)
+    repeat_ms = (time.time() - start_time) * 1000.0
+
+    frames = source_crop.crop_frames(decoded, zoom["crops"])
+    start_time = time.time()
+    for i in range(NUM_FRAMES):
+        view = backends.composite(zoom["backend"], frames)
+    fps = NUM_FRAMES / (time.time() - start_time)
+
+    output_path = os.path.join(output_dir, f"{name}.png")
+    cv2.imwrite(output_path, view)
+    print(
+        f"  {name:<18} {view.shape[1]}x{view.shape[0]}  first request {first_ms:7.1f} ms, "
+        f"repeat {repeat_ms:5.2f} ms, {fps:6.1f} FPS -> {output_path}"
+    )
+
+stats = zooms.cache.stats
+print(
+    f"Zoom cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions "
+    f"({len(zooms.cache.entries)} zooms, {zooms.cache.nbytes / 2**20:.0f} of "
+    f"{config.ZOOM_CACHE_MB} MB)"
+)
+zooms.close()
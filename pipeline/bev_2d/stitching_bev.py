@@ -4,6 +4,7 @@ Module: stitching_bev.py
 This module provides functionality related to stitching bev.
 """
 
+import functools
 import os
 import sys
 
@@ -17,6 +18,17 @@ if base_dir not in sys.path:
     sys.path.append(base_dir)
 
 import config
+from pipeline.compositor import (
+    gain_comp,
+    lut_pyramid,
+    projection,
+    regions,
+    source_crop,
+    sparse_lut,
+    topk,
+    vignetting,
+    virtual_view,
+)
 
 PIXELS_PER_METER = config.PIXELS_PER_METER
 BEV_WIDTH = config.BEV_WIDTH
@@ -28,11 +40,15 @@ CAR_WIDTH = config.CAR_WIDTH
 intrinsic_params_path = os.path.join(
     base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
 )
+vignetting_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/vignetting_params.npz"
+)
 extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
 images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
 output_dir = os.path.join(base_dir, "data/bev_2d")
 debug_dir = os.path.join(output_dir, "debug")
 luts_dir = os.path.join(output_dir, "luts")
+view_cache_dir = os.path.join(base_dir, "data/virtual_views/cache")
 os.makedirs(output_dir, exist_ok=True)
 os.makedirs(debug_dir, exist_ok=True)
 os.makedirs(luts_dir, exist_ok=True)
@@ -46,7 +62,22 @@ with np.load(intrinsic_params_path) as data:
     K = data["K"]
     D = data["D"]
 
-cameras = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+# Lens vignetting correction, folded into every LUT weight (None when disabled)
+vignetting_gain = None
+if config.VIGNETTING_CORRECTION:
+    if os.path.exists(vignetting_params_path):
+        vignetting_gain = functools.partial(
+            vignetting.correction,
+            profile=vignetting.load_profile(vignetting_params_path),
+            max_gain=config.VIGNETTING_MAX_GAIN,
+        )
+    else:
+        print(
+            f"Warning: No vignetting profile at {vignetting_params_path}, run "
+            "pipeline/calibration/calibrate_vignetting.py first. Skipping the correction."
+        )
+
+cameras = config.CAMERAS
 
 # Generate 3D grid corresponding to pixels on the BEV plane (Z=0)
 print("Initializing 3D spatial mapping grid...")
@@ -59,12 +90,13 @@ X = X_RANGE[1] - (v / PIXELS_PER_METER)
 Y = Y_RANGE[1] - (u / PIXELS_PER_METER)
 Z = np.zeros_like(X)
 
-pts_3d = np.stack((X, Y, Z), axis=-1).reshape(-1, 1, 3).astype(np.float32)
+points = np.stack((X, Y, Z), axis=-1)
 
 bev_image_float = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.float32)
 blend_weights = np.zeros((BEV_HEIGHT, BEV_WIDTH), dtype=np.float32)
 
 camera_maps = {}  # Dictionary to store data for LUTs
+calibration = {}  # Extrinsics of the processed cameras, reused by the LUT pyramid
 
 print("\nProcessing cameras for SVM stitching:")
 for cam in cameras:
@@ -78,23 +110,15 @@ for cam in cameras:
     with np.load(ext_path) as edata:
         rvec = edata["rvec"]
         tvec = edata["tvec"]
+    calibration[cam] = (rvec, tvec)
 
     img = cv2.imread(img_path)
     img_h, img_w = img.shape[:2]
     print(f"  [Procesing] {cam}: Mapping pixels...")
 
-    # 1. Transform World to Camera coordinate to cull points behind the lens
-    R, _ = cv2.Rodrigues(rvec)
-    pts_3d_squeezed = pts_3d.reshape(-1, 3).T  # 3 x N
-    pts_cam = R @ pts_3d_squeezed + tvec  # 3 x N
-    z_cam = pts_cam[2, :].reshape(BEV_HEIGHT, BEV_WIDTH)
-
-    # 2. Project 3D points onto the camera's 2D image plane
-    pts_2d, _ = cv2.fisheye.projectPoints(pts_3d, rvec, tvec, K, D)
-    pts_2d = pts_2d.reshape(BEV_HEIGHT, BEV_WIDTH, 2)
-
-    map_x = pts_2d[..., 0].astype(np.float32)
-    map_y = pts_2d[..., 1].astype(np.float32)
+    # 1-2. Project the grid onto the camera's 2D image plane (with its depth, to cull points
+    # behind the lens); the LUT pyramid projects its levels through the same function
+    map_x, map_y, z_cam = projection.project_grid(points, rvec, tvec, K, D)
 
     # 3. Pull colors from original images based on mapping
     warped = cv2.remap(
@@ -107,49 +131,23 @@ for cam in cameras:
     )
 
     # 4. Generate Spatial Blend Weighting Mask
-    # Mask out pixels that are physically behind the camera
-    z_mask = z_cam > 0
+    # Mask out pixels that are physically behind the camera or map off the physical sensor
+    valid_mask = projection.valid_mask(map_x, map_y, z_cam, img.shape)
 
-    # Mask out points mapping entirely off the physical sensor
-    valid_x = (map_x >= 0) & (map_x < img_w - 1)
-    valid_y = (map_y >= 0) & (map_y < img_h - 1)
-
-    # Define a smooth feathering weight based on distance from sensor center
+    # Smooth feathering weight based on distance from sensor center, zero outside valid_mask
     # This prevents harsh seams between overlapping fields of view
-    # Distance normalized so center = 0, edge = 1
-    
-    # PARAMETER: Adjust this to let the camera cover a wider angle (less masking at the edges)
+    # PARAMETER: MASK_RADIUS_SCALE lets the camera cover a wider angle (less masking at the edges)
     # > 1.0 pushes the mask outward (less masking, wider angle)
     # < 1.0 pulls the mask inward (more masking, narrower angle)
-    mask_radius_scale = config.MASK_RADIUS_SCALE
-    
-    max_radius = (np.min([img_w, img_h]) / 2.0) * mask_radius_scale
-    radial_dist = np.sqrt((map_x - img_w / 2.0) ** 2 + (map_y - img_h / 2.0) ** 2) / max_radius
-    
-    # PARAMETER: We can add an exponent to adjust the feather curve (e.g., 2.0 for softer edges)
-    weight = np.clip(1.0 - (radial_dist ** 2), 0.0, 1.0)
-
-    # Enforce boolean exclusions
-    valid_mask = z_mask & valid_x & valid_y
-
-    weight = weight * valid_mask.astype(np.float32)
+    weight = projection.feather_weight(map_x, map_y, z_cam, img.shape, config.MASK_RADIUS_SCALE)
 
     # --- DEBUG SAVING ---
     # 1. Undistorted camera view
-    # Extreme fisheye lenses (~180 FOV) mathematically stretch to infinity on flat pinhole projections.
-    # OpenCV's auto-estimator pushes those edges to pure white/black. We scale the focal lengths artificially
-    # (e.g., * 0.5) to shrink the infinite projection into a visible cropped circle for debugging.
-    scale = 0.5
-    new_K = K.copy()
-    new_K[0, 0] = K[0, 0] * scale
-    new_K[1, 1] = K[1, 1] * scale
-
-    # Use initUndistortRectifyMap + remap for performance standard consistency
-    map1, map2 = cv2.fisheye.initUndistortRectifyMap(
-        K, D, np.eye(3), new_K, (img_w, img_h), cv2.CV_16SC2
-    )
-    undistorted_img = cv2.remap(
-        img, map1, map2, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT
+    # Extreme fisheye lenses (~180 FOV) stretch to infinity on a flat pinhole projection, so the
+    # debug view is a wide (DEBUG_UNDISTORT_FOV) virtual pinhole camera with cached maps
+    debug_view = {"size": (img_w, img_h), "panes": [{"fov": config.DEBUG_UNDISTORT_FOV}]}
+    undistorted_img = virtual_view.render_view(
+        img, virtual_view.load_view_maps(view_cache_dir, K, D, debug_view)
     )
     cv2.imwrite(os.path.join(debug_dir, f"{cam}_01_undistorted.png"), undistorted_img)
 
@@ -178,12 +176,19 @@ for cam in cameras:
     # --------------------
 
     # 5. Accumulate colors
+    # The preview is vignetting-corrected like the LUTs; the blend total stays uncorrected
+    color_weight = weight if vignetting_gain is None else weight * vignetting_gain(map_x, map_y)
     for c in range(3):
-        bev_image_float[..., c] += warped[..., c].astype(np.float32) * weight
+        bev_image_float[..., c] += warped[..., c].astype(np.float32) * color_weight
     blend_weights += weight
 
     # Store parameters for LUT generation
-    camera_maps[cam] = {"map_x": map_x, "map_y": map_y, "weight": weight}
+    camera_maps[cam] = {
+        "map_x": map_x,
+        "map_y": map_y,
+        "weight": weight,
+        "frame_shape": img.shape[:2],
+    }
 
 print("\nFinalizing stitching overlap logic...")
 valid_pixels = blend_weights > 0
@@ -199,18 +204,107 @@ print(
 # Floating point division on every pixel, every frame.
 safe_blend_weights = np.maximum(blend_weights, 1e-6)
 
+norm_weights = {}
+cropped_maps = {}
 for cam, maps in camera_maps.items():
     # Normalize blending weight cleanly
     norm_weight = maps["weight"] / safe_blend_weights
     # Clean up regions outside any validation mask just in case
     norm_weight[maps["weight"] == 0] = 0.0
+    if vignetting_gain is not None:
+        norm_weight *= vignetting_gain(maps["map_x"], maps["map_y"])
+
+    # Only the source box this camera's LUT actually reads is kept at render time;
+    # source coordinates are stored relative to it
+    src_crop = source_crop.footprint_crop(
+        maps["map_x"], maps["map_y"], norm_weight, maps["frame_shape"]
+    )
+    crop_x, crop_y = source_crop.offset_maps(maps["map_x"], maps["map_y"], src_crop)
+    cropped_maps[cam] = {"map_x": crop_x, "map_y": crop_y, "src_crop": src_crop}
 
     lut_path = os.path.join(luts_dir, f"lut_{cam}.npz")
     np.savez_compressed(
-        lut_path, map_x=maps["map_x"], map_y=maps["map_y"], weight=norm_weight
+        lut_path, map_x=crop_x, map_y=crop_y, weight=norm_weight, src_crop=src_crop
     )
     print(f"  Saved LUT -> {lut_path}")
 
+    # Sparse twin: only the pixels this camera actually contributes to
+    sparse_path = os.path.join(luts_dir, f"lut_{cam}_sparse.npz")
+    np.savez_compressed(
+        sparse_path,
+        **sparse_lut.pack_sparse_lut(crop_x, crop_y, norm_weight),
+        src_crop=src_crop,
+    )
+    print(f"  Saved sparse LUT -> {sparse_path}")
+    y0, y1, x0, x1 = src_crop
+    print(
+        f"  Source crop -> x {x0}:{x1}, y {y0}:{y1} "
+        f"({source_crop.crop_fraction(src_crop, maps['frame_shape']) * 100:.1f}% of the frame)"
+    )
+
+    norm_weights[cam] = norm_weight
+
+# Fixed subsample of the overlap bands for run-time gain compensation: the render loop only
+# reads these source pixels to estimate per-camera exposure differences
+gain_samples = gain_comp.overlap_samples(
+    {cam: (maps["map_x"], maps["map_y"]) for cam, maps in camera_maps.items()},
+    norm_weights,
+    list(camera_maps),
+    config.GAIN_SAMPLES_PER_PAIR,
+)
+gain_samples_path = os.path.join(luts_dir, "lut_gain_samples.npz")
+np.savez_compressed(gain_samples_path, **gain_samples)
+print(
+    f"  Saved gain compensation samples -> {gain_samples_path} "
+    f"({len(gain_samples['pairs'])} camera pairs, {gain_samples['src_x'].shape[1]} samples)"
+)
+
+# Partition the canvas into exclusive single-camera regions and overlap bands so the
+# renderer can remap-copy most pixels and only blend along the seams
+partition = regions.partition_regions(norm_weights, list(camera_maps))
+regions_path = os.path.join(luts_dir, "lut_regions.npz")
+np.savez_compressed(regions_path, **partition)
+copy_px, scaled_px, blend_px = regions.region_shares(partition)
+print(
+    f"  Saved region partition -> {regions_path} (copy: {copy_px * 100:.1f}%, "
+    f"scaled copy: {scaled_px * 100:.1f}%, blend: {blend_px * 100:.1f}% of canvas)"
+)
+
+# Top-K camera-per-pixel LUT: a single table whose per-frame cost does not grow with camera count
+topk_lut = topk.build_topk_lut(
+    {
+        cam: {**cropped_maps[cam], "weight": norm_weights[cam]}
+        for cam in camera_maps
+    },
+    list(camera_maps),
+    k=config.TOPK_CAMERAS,
+)
+topk_path = os.path.join(luts_dir, "lut_topk.npz")
+np.savez_compressed(topk_path, **topk_lut)
+print(f"  Saved top-{config.TOPK_CAMERAS} camera LUT -> {topk_path}")
+
+# Multi-resolution LUT pyramid: the same ground area at the other LUT_PYRAMID_LEVELS widths,
+# for render targets smaller (thumbnail, cluster) or larger (center screen) than BEV_WIDTH
+level_cameras = list(camera_maps)
+level_shapes = {cam: maps["frame_shape"] for cam, maps in camera_maps.items()}
+for level in config.LUT_PYRAMID_LEVELS:
+    if level == BEV_WIDTH:
+        continue
+    level_X, level_Y = lut_pyramid.level_grid(level, (BEV_WIDTH, BEV_HEIGHT), X_RANGE, Y_RANGE)
+    level_luts = lut_pyramid.build_level_luts(
+        np.stack((level_X, level_Y, np.zeros_like(level_X)), axis=-1),
+        level_cameras,
+        calibration,
+        K,
+        D,
+        level_shapes,
+        config.MASK_RADIUS_SCALE,
+        weight_gain=vignetting_gain,
+    )
+    level_path = lut_pyramid.level_dir(luts_dir, level, BEV_WIDTH)
+    lut_pyramid.save_level(level_path, "lut_", level_luts, level_cameras, config.TOPK_CAMERAS)
+    print(f"  Saved {level}x{level_X.shape[0]} pyramid level -> {level_path}")
+
 # Render the Central Car Icon properly oriented
 if config.DRAW_CAR_MASK:
     car_top_pixels = int(BEV_HEIGHT / 2 - (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
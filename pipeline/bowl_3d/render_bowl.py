@@ -17,119 +17,217 @@ if base_dir not in sys.path:
     sys.path.append(base_dir)
 
 import config
+from pipeline.compositor import (
+    backends,
+    benchmark,
+    incremental,
+    lut_pyramid,
+    overlay,
+    reduced_input,
+    source_crop,
+    tiled,
+    yuv,
+)
 
-PIXELS_PER_METER = config.PIXELS_PER_METER
-BEV_WIDTH = config.BEV_WIDTH
-BEV_HEIGHT = config.BEV_HEIGHT
 CAR_LENGTH = config.CAR_LENGTH
 CAR_WIDTH = config.CAR_WIDTH
-luts_dir = os.path.join(base_dir, "data/bowl_3d/luts")
+base_luts_dir = os.path.join(base_dir, "data/bowl_3d/luts")
+
+# LUT pyramid level for this render target: the smallest one at least RENDER_OUTPUT_WIDTH wide
+level = lut_pyramid.select_level(
+    lut_pyramid.available_levels(base_luts_dir, config.BEV_WIDTH),
+    config.RENDER_OUTPUT_WIDTH or config.BEV_WIDTH,
+)
+luts_dir = lut_pyramid.level_dir(base_luts_dir, level, config.BEV_WIDTH)
+BEV_WIDTH, BEV_HEIGHT = lut_pyramid.level_shape(level, (config.BEV_WIDTH, config.BEV_HEIGHT))
+PIXELS_PER_METER = config.PIXELS_PER_METER * BEV_WIDTH / config.BEV_WIDTH
 images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
 
-cameras = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+cameras = config.CAMERAS
 luts = {}
 
-print("Loading pre-computed 3D Bowl Look-Up Tables (LUTs)...")
-for cam in cameras:
-    lut_path = os.path.join(luts_dir, f"lut_bowl_{cam}.npz")
-    if not os.path.exists(lut_path):
-        print(
-            f"Error: Missing LUT for {cam}. Run stitching_bowl.py first to generate them."
-        )
+# Resolve the compositing backend (COMPOSITOR_MODE; "auto" reads this level's autotune.json)
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir, config.INPUT_SCALE)
+# The sparse compositor reads the packed twin LUTs written next to the dense ones
+lut_suffix = "_sparse" if compositor_mode == "sparse" else ""
+# Backends consuming a combined table from the stitching stage: (file, prepare kwarg)
+combined_luts = {
+    "regions": ("lut_bowl_regions.npz", "partition"),
+    "topk": ("lut_bowl_topk.npz", "topk_lut"),
+}
+
+print(f"Loading pre-computed 3D Bowl Look-Up Tables (LUTs) at {BEV_WIDTH}x{BEV_HEIGHT}...")
+prepare_kwargs = {}
+if compositor_mode in combined_luts:
+    filename, kwarg = combined_luts[compositor_mode]
+    combined_path = os.path.join(luts_dir, filename)
+    if not os.path.exists(combined_path):
+        print(f"Error: Missing {combined_path}. Re-run stitching_bowl.py to generate it.")
         sys.exit(1)
+    with np.load(combined_path) as data:
+        prepare_kwargs[kwarg] = {key: data[key] for key in data.files}
 
-    with np.load(lut_path) as data:
-        # Pre-calculated projection coordinates based on Z-Up bowl
-        map_x = data["map_x"]
-        map_y = data["map_y"]
-        # Pre-normalized alpha blending weight
-        weight = data["weight"]
+# The top-K LUT already holds every camera's contribution, no per-camera tables needed
+if compositor_mode != "topk":
+    for cam in cameras:
+        lut_path = os.path.join(luts_dir, f"lut_bowl_{cam}{lut_suffix}.npz")
+        if not os.path.exists(lut_path):
+            print(
+                f"Error: Missing LUT for {cam}. Run stitching_bowl.py first to generate them."
+            )
+            sys.exit(1)
+
+        with np.load(lut_path) as data:
+            # Pre-calculated projection coordinates and pre-normalized alpha blending weight
+            # (sparse LUTs additionally carry their shape, bbox and packed pixel indices)
+            luts[cam] = {key: data[key] for key in data.files}
+
+if compositor_mode == "yuv" and config.YUV_OUTPUT_FORMAT != "bgr":
+    print("Error: The bowl texture carries an alpha channel, set YUV_OUTPUT_FORMAT = \"bgr\".")
+    sys.exit(1)
+
+# Alpha clipping is baked by stitching_bowl.py, the compositor fills only the BGR channels
+alpha_path = os.path.join(luts_dir, "lut_bowl_alpha.npz")
+if not os.path.exists(alpha_path):
+    print(f"Error: Missing {alpha_path}. Re-run stitching_bowl.py to generate it.")
+    sys.exit(1)
+with np.load(alpha_path) as data:
+    bowl_alpha = data["alpha"]
+
+# Reduced-resolution input: keep the full-res tables for the quality report and rescale the
+# source coordinates once to match frames decoded at 1/INPUT_SCALE
+full_luts, full_prepare_kwargs = luts, prepare_kwargs
+luts, prepare_kwargs = reduced_input.rescale_luts(luts, prepare_kwargs, config.INPUT_SCALE)
+
+# Source boxes the LUTs read (None for LUTs stored before source cropping)
+full_crops = source_crop.lut_crops(full_luts, full_prepare_kwargs, cameras)
+crops = source_crop.lut_crops(luts, prepare_kwargs, cameras)
+
+backend = backends.prepare_backend(
+    compositor_mode, luts, cameras, alpha=bowl_alpha, **prepare_kwargs
+)
+
+print(f"\nStarting simulated Real-Time 3D Bowl Render loop ({compositor_mode} compositor)...")
+
+
+def load_frames(scale=config.INPUT_SCALE, crops=crops):
+    loaded = {}
+    for cam in cameras:
+        loaded[cam] = reduced_input.read_frame(
+            os.path.join(images_dir, f"{cam}.png"), scale
+        )
+        if crops is not None:
+            # Only the region the LUT samples is remapped (a V4L2 crop / ROI on a real device)
+            loaded[cam] = source_crop.crop_frame(loaded[cam], crops[cam])
+        if compositor_mode == "yuv":
+            # Stand-in for a V4L2 camera delivering NV12 / YUYV
+            loaded[cam] = yuv.from_bgr(loaded[cam], config.YUV_INPUT_FORMAT)
+    return loaded
+
+
+frames = load_frames()
+frame_sizes = ", ".join(f"{f.shape[1]}x{f.shape[0]}" for f in frames.values())
+print(
+    f"Input frames: {frame_sizes} (1/{config.INPUT_SCALE} scale"
+    f"{', source-cropped' if crops is not None else ''}), "
+    f"{sum(f.nbytes for f in frames.values()) / 2**20:.1f} MiB per frame set"
+)
+
+
+# Pre-rendered UI overlay sprites, blended only inside their rectangles every frame
+car_layer = []
+if config.DRAW_CAR_MASK:
+    car_layer.append(
+        overlay.car_sprite((BEV_WIDTH, BEV_HEIGHT), PIXELS_PER_METER, CAR_LENGTH, CAR_WIDTH)
+    )
+guidelines = {}
+if config.DRAW_GUIDELINES:
+    guidelines = overlay.guideline_sprites(
+        config.GUIDELINE_MAX_STEER,
+        config.GUIDELINE_STEER_STEP,
+        (BEV_WIDTH, BEV_HEIGHT),
+        PIXELS_PER_METER,
+        CAR_LENGTH,
+        CAR_WIDTH,
+        config.CAR_WHEELBASE,
+        config.CAR_REAR_OVERHANG,
+        config.GUIDELINE_LENGTH,
+    )
 
-        luts[cam] = {
-            "map_x": map_x,
-            "map_y": map_y,
-            "weight": np.stack([weight] * 3, axis=-1).astype(np.float32),
-        }
+NUM_FRAMES = 50
 
-print("\nStarting simulated Real-Time 3D Bowl Render loop...")
 
-frames = {}
-for cam in cameras:
-    frames[cam] = cv2.imread(os.path.join(images_dir, f"{cam}.png"))
+def steering_angle(i):
+    # Stand-in for the steering angle on the vehicle bus: one full left-right sweep per run
+    return config.GUIDELINE_MAX_STEER * np.sin(2.0 * np.pi * i / NUM_FRAMES)
 
 
-def create_car_overlay():
-    overlay = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.uint8)
-    car_top = int(BEV_HEIGHT / 2 - (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
-    car_bot = int(BEV_HEIGHT / 2 + (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
-    car_left = int(BEV_WIDTH / 2 - (CAR_WIDTH / 2.0) * PIXELS_PER_METER)
-    car_right = int(BEV_WIDTH / 2 + (CAR_WIDTH / 2.0) * PIXELS_PER_METER)
+def overlay_sprites(steer):
+    if not guidelines:
+        return car_layer
+    angle = overlay.quantize_steer(steer, config.GUIDELINE_MAX_STEER, config.GUIDELINE_STEER_STEP)
+    return car_layer + [guidelines[angle]]
 
-    cv2.rectangle(overlay, (car_left, car_top), (car_right, car_bot), (30, 30, 30), -1)
-    cv2.rectangle(
-        overlay, (car_left, car_top), (car_right, car_bot), (255, 255, 255), 3
-    )
-    cv2.putText(
-        overlay,
-        "FRONT",
-        (int(BEV_WIDTH / 2 - 40), car_top + 40),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.8,
-        (255, 255, 255),
-        2,
-    )
-    return overlay
 
+def render_frame(i):
+    # This runs constantly injecting 4 frames into a composed 3D Bowl Texture
+    # (BGRA, already transparent outside the bowl rim)
+    bev_rgba = backends.composite(backend, frames)
 
-car_overlay = create_car_overlay()
-car_mask = car_overlay > 0
+    # Render UI Overlay (colour channels only, the bowl alpha is kept), on a copy if the
+    # backend keeps its canvas between frames
+    sprites = overlay_sprites(steering_angle(i))
+    if sprites:
+        bev_rgba = overlay.draw_sprites(backends.overlay_canvas(backend, bev_rgba), sprites)
+    return bev_rgba
 
-# Simulate bounding limits
-u, v = np.meshgrid(np.arange(BEV_WIDTH), np.arange(BEV_HEIGHT))
-X = 5.0 - (v / PIXELS_PER_METER)
-Y = 5.0 - (u / PIXELS_PER_METER)
-R_abs = np.sqrt(X**2 + Y**2)
 
-NUM_FRAMES = 50
 start_time = time.time()
 
 for i in range(NUM_FRAMES):
-    # This loop runs constantly injecting 4 frames into a composed 3D Bowl Texture
-    bev = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.float32)
-
-    for cam in cameras:
-        lut = luts[cam]
-        img = frames[cam]
-
-        # 1. Fetch pixels instantly correcting for curving 3D wall distortion
-        warped = cv2.remap(
-            img,
-            lut["map_x"],
-            lut["map_y"],
-            cv2.INTER_LINEAR,
-            borderMode=cv2.BORDER_CONSTANT,
-            borderValue=(0, 0, 0),
-        )
-
-        # 2. Multiply by alpha weight and composite instantly (no 3D math required)
-        bev += warped.astype(np.float32) * lut["weight"]
-
-    final_bev = bev.astype(np.uint8)
-
-    # Render UI Overlay
-    if config.DRAW_CAR_MASK:
-        final_bev[car_mask] = car_overlay[car_mask]
-
-    # Clip alpha transparency
-    final_bev_rgba = cv2.cvtColor(final_bev, cv2.COLOR_BGR2BGRA)
-    final_bev_rgba[R_abs > 4.9] = (0, 0, 0, 0)
+    final_bev_rgba = render_frame(i)
 
 end_time = time.time()
 fps = NUM_FRAMES / (end_time - start_time)
 
-print(f"Processed 4x Camera inputs to composite 1000x1000px 3D Bowl Texture.")
+if config.RENDER_TRACK_ALLOCATIONS:
+    peak, held = benchmark.measure_allocations(render_frame)
+    print(
+        f"Steady-state allocations: peak {peak / 1024:.1f} KiB, "
+        f"retained {held / 1024:.1f} KiB over 10 frames"
+    )
+
+if compositor_mode == "tiled":
+    print(f"Per-tile composite time ({config.COMPOSITOR_WORKERS} workers):")
+    for y0, y1, tile_ms, tile_cams in tiled.tile_report(backend["prepared"]):
+        print(f"  rows {y0:>4}-{y1:<4} {tile_ms:6.2f} ms  ({tile_cams} cams)")
+if compositor_mode == "incremental":
+    dirty, total = incremental.dirty_report(backend["prepared"])
+    print(f"Dirty tiles per frame: {dirty:.1f} / {total} ({dirty / total * 100:.1f}% recomposited)")
+backends.release(backend)
+
+print(f"Processed 4x Camera inputs to composite {BEV_WIDTH}x{BEV_HEIGHT}px 3D Bowl Texture.")
 print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
 
 output_path = os.path.join(base_dir, "data/bowl_3d/realtime_demo_bowl.png")
 cv2.imwrite(output_path, final_bev_rgba)
 print(f"Output saved to: {output_path}")
+
+if config.INPUT_SCALE > 1:
+    # Quality delta: the same backend fed full-resolution frames and the original LUTs
+    reference_backend = backends.prepare_backend(
+        compositor_mode, full_luts, cameras, alpha=bowl_alpha, **full_prepare_kwargs
+    )
+    reference = backends.composite(
+        reference_backend, load_frames(scale=1, crops=full_crops)
+    )
+    backends.release(reference_backend)
+
+    quality = reduced_input.quality_report(
+        reference[..., :3], final_bev_rgba[..., :3], valid=bowl_alpha > 0
+    )
+    print(
+        f"Quality vs full-resolution input (opaque pixels): "
+        f"mean error {quality['mean_error']:.2f}, max {quality['max_error']:.0f}, "
+        f"PSNR {quality['psnr']:.2f} dB"
+    )
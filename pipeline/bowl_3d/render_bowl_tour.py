@@ -0,0 +1,190 @@
+"""
+Module: render_bowl_tour.py
+
+This module provides the animated CPU free-view loop: a head unit cycling through preset 3D
+viewpoints (FREE_VIEW_PRESETS in config.py) and moving between them, without a GPU.
+
+Each preset-to-preset move is sampled at FREE_VIEW_TRANSITION_STEPS key poses. Their view LUTs
+come from a ViewCache (pipeline/compositor/view_cache.py): LRU within FREE_VIEW_CACHE_MB (by
+default sized to hold every key pose of the tour), the rest of the current move compiled on a
+background thread while its first poses are shown, and frames between two key poses
+crossfading their composites. The first view is compiled before the timed loop starts.
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import (
+    backends,
+    free_view,
+    reduced_input,
+    source_crop,
+    sparse_lut,
+    view_cache,
+)
+
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+luts_dir = os.path.join(base_dir, "data/bowl_3d/luts")
+output_path = os.path.join(base_dir, "data/bowl_3d/realtime_demo_bowl_tour.png")
+
+cameras = config.CAMERAS
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir)
+if compositor_mode == "yuv":
+    # Every cached view crops the frames differently, which packed NV12 / YUYV cannot do
+    print("Error: The free-view tour needs BGR frames; pick another COMPOSITOR_MODE.")
+    sys.exit(1)
+
+bowl_surface = {
+    "flat_rect": (config.BOWL_FLAT_RECT_X, config.BOWL_FLAT_RECT_Y),
+    "flat_margin": config.BOWL_FLAT_MARGIN,
+    "steepness": config.BOWL_STEEPNESS,
+    "clip_radius": config.BOWL_ALPHA_CLIP_RADIUS,
+}
+
+if not os.path.exists(intrinsic_params_path):
+    print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+    sys.exit(1)
+
+with np.load(intrinsic_params_path) as data:
+    K = data["K"]
+    D = data["D"]
+
+print("Loading extrinsics and camera frames...")
+calibration = {}
+frame_shapes = {}
+decoded = {}
+for cam in cameras:
+    ext_path = os.path.join(extrinsic_dir, f"extrinsic_{cam}.npz")
+    img_path = os.path.join(images_dir, f"{cam}.png")
+    if not os.path.exists(ext_path) or not os.path.exists(img_path):
+        print(f"Error: Missing extrinsics or frame for {cam}. Run the calibration first.")
+        sys.exit(1)
+    with np.load(ext_path) as edata:
+        calibration[cam] = (edata["rvec"], edata["tvec"])
+    frame_shapes[cam] = cv2.imread(img_path).shape[:2]
+    decoded[cam] = reduced_input.read_frame(img_path, config.INPUT_SCALE)
+
+
+def build_view(pose):
+    """Compile a pose into a ready-to-composite backend and the frame crops it reads."""
+    luts = free_view.compile_view(
+        pose,
+        config.FREE_VIEW_SIZE,
+        bowl_surface,
+        cameras,
+        calibration,
+        K,
+        D,
+        frame_shapes,
+        mask_radius_scale=config.MASK_RADIUS_SCALE,
+    )
+    if compositor_mode == "sparse":
+        luts = {
+            cam: {
+                **sparse_lut.pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"]),
+                "src_crop": lut["src_crop"],
+            }
+            for cam, lut in luts.items()
+        }
+    luts, prepare_kwargs = reduced_input.rescale_luts(luts, {}, config.INPUT_SCALE)
+    return {
+        "backend": backends.prepare_backend(compositor_mode, luts, cameras, **prepare_kwargs),
+        "crops": source_crop.lut_crops(luts, prepare_kwargs, cameras),
+    }
+
+
+def render(view):
+    return backends.composite(view["backend"], source_crop.crop_frames(decoded, view["crops"]))
+
+
+# One cycle through the presets: hold each one, then move to the next. Every frame names the
+# key poses of its move, the key pose index and the crossfade fraction towards the next one
+steps = config.FREE_VIEW_TRANSITION_STEPS
+presets = list(config.FREE_VIEW_PRESETS.values())
+schedule = []
+for index, pose in enumerate(presets):
+    following = presets[(index + 1) % len(presets)]
+    keys = [free_view.interpolate_pose(pose, following, i / steps) for i in range(steps + 1)]
+    schedule += [(keys, 0, 0.0)] * config.FREE_VIEW_HOLD_FRAMES
+    for frame in range(config.FREE_VIEW_TRANSITION_FRAMES):
+        position = (frame + 1) * steps / config.FREE_VIEW_TRANSITION_FRAMES
+        key = min(int(position), steps - 1)
+        schedule.append((keys, key, position - key))
+
+# Pre-warm the first view, then size the cache to hold every key pose of the tour from its
+# footprint, so looping the tour never evicts and recompiles
+tour_keys = {}
+for keys, _, _ in schedule:
+    for pose in keys:
+        key, snapped = view_cache.quantize_pose(pose)
+        tour_keys.setdefault(key, snapped)
+first_pose = schedule[0][0][0]
+warm_start = time.time()
+first_view = build_view(view_cache.quantize_pose(first_pose)[1])
+warm_time = time.time() - warm_start
+view_mb = view_cache.array_nbytes(first_view) / (1024.0 * 1024.0)
+# Views differ slightly in size (source crops), hence the headroom
+budget_mb = config.FREE_VIEW_CACHE_MB or view_mb * len(tour_keys) * 1.1
+
+cache = view_cache.ViewCache(
+    build_view,
+    budget_mb,
+    release=lambda view: backends.release(view["backend"]),
+)
+cache.put(first_pose, first_view)
+width, height = config.FREE_VIEW_SIZE
+blended = np.empty((height, width, 3), dtype=np.uint8)
+
+print(
+    f"View cache: {budget_mb:.0f} MB for {len(tour_keys)} key poses of ~{view_mb:.0f} MB "
+    f"(first view compiled in {warm_time * 1000:.0f} ms before the loop)"
+)
+print(
+    f"\nTouring {len(presets)} presets ({', '.join(config.FREE_VIEW_PRESETS)}) over "
+    f"{len(schedule)} frames ({compositor_mode} compositor)..."
+)
+frame_times = []
+start_time = time.time()
+
+for keys, key, fraction in schedule:
+    frame_start = time.time()
+    # Compile the rest of the move in the background while its first key poses are shown
+    cache.prefetch(keys[key + 1 :])
+    view = render(cache.get(keys[key]))
+    if fraction > 0.0:
+        view = view_cache.crossfade(view, render(cache.get(keys[key + 1])), fraction, out=blended)
+    frame_times.append(time.time() - frame_start)
+
+end_time = time.time()
+fps = len(schedule) / (end_time - start_time)
+cv2.imwrite(output_path, view)
+stats = cache.stats
+entries, cached_mb = len(cache.entries), cache.nbytes / (1024.0 * 1024.0)
+cache.close()
+
+print(f"Composited {len(schedule)} {width}x{height} frames of the 3D bowl tour.")
+print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
+print(
+    f"Frame time: median {np.median(frame_times) * 1000:.1f} ms, "
+    f"worst {np.max(frame_times) * 1000:.1f} ms"
+)
+print(
+    f"View cache: {stats['hits']} hits, {stats['misses']} misses, {stats['waits']} waits on "
+    f"background compiles, {stats['prefetched']} prefetched, {stats['evictions']} evictions "
+    f"({entries} views, {cached_mb:.0f} of {budget_mb:.0f} MB)"
+)
+print(f"Output saved to: {output_path}")
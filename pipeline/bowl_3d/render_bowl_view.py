@@ -0,0 +1,145 @@
+"""
+Module: render_bowl_view.py
+
+This module provides the CPU free-view 3D bowl render loop, for targets without a usable GPU.
+
+The virtual camera pose (FREE_VIEW_POSE / FREE_VIEW_SIZE in config.py) is compiled once into
+view-dependent display LUTs by ray-casting every display pixel against the bowl surface
+(pipeline/compositor/free_view.py). Each frame of the 3D view is then a single composite pass
+with whichever compositor backend COMPOSITOR_MODE selects, as cheap as a BEV frame.
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import backends, free_view, reduced_input, source_crop, sparse_lut, yuv
+
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+luts_dir = os.path.join(base_dir, "data/bowl_3d/luts")
+output_path = os.path.join(base_dir, "data/bowl_3d/realtime_demo_bowl_view.png")
+
+cameras = config.CAMERAS
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir)
+bowl_surface = {
+    "flat_rect": (config.BOWL_FLAT_RECT_X, config.BOWL_FLAT_RECT_Y),
+    "flat_margin": config.BOWL_FLAT_MARGIN,
+    "steepness": config.BOWL_STEEPNESS,
+    "clip_radius": config.BOWL_ALPHA_CLIP_RADIUS,
+}
+
+if not os.path.exists(intrinsic_params_path):
+    print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+    sys.exit(1)
+
+with np.load(intrinsic_params_path) as data:
+    K = data["K"]
+    D = data["D"]
+
+print("Loading extrinsics and camera resolutions...")
+calibration = {}
+frame_shapes = {}
+for cam in cameras:
+    ext_path = os.path.join(extrinsic_dir, f"extrinsic_{cam}.npz")
+    img = cv2.imread(os.path.join(images_dir, f"{cam}.png"))
+    if not os.path.exists(ext_path) or img is None:
+        print(f"Error: Missing extrinsics or frame for {cam}. Run the calibration first.")
+        sys.exit(1)
+    with np.load(ext_path) as edata:
+        calibration[cam] = (edata["rvec"], edata["tvec"])
+    frame_shapes[cam] = img.shape[:2]
+
+width, height = config.FREE_VIEW_SIZE
+print(f"Compiling {width}x{height} free-view LUTs for pose {config.FREE_VIEW_POSE}...")
+start_time = time.time()
+try:
+    luts = free_view.compile_view(
+        config.FREE_VIEW_POSE,
+        config.FREE_VIEW_SIZE,
+        bowl_surface,
+        cameras,
+        calibration,
+        K,
+        D,
+        frame_shapes,
+        mask_radius_scale=config.MASK_RADIUS_SCALE,
+    )
+except ValueError as e:
+    print(f"Error: {e}")
+    sys.exit(1)
+compile_ms = (time.time() - start_time) * 1000.0
+coverage = (sum(lut["weight"] for lut in luts.values()) > 0).mean()
+print(f"  Compiled in {compile_ms:.0f} ms ({coverage * 100:.1f}% of the view hits the bowl)")
+for cam, lut in luts.items():
+    y0, y1, x0, x1 = lut["src_crop"]
+    print(
+        f"  {cam}: source crop x {x0}:{x1}, y {y0}:{y1} "
+        f"({source_crop.crop_fraction(lut['src_crop'], frame_shapes[cam]) * 100:.1f}% of the frame)"
+    )
+
+if compositor_mode == "sparse":
+    # The sparse compositor reads packed LUTs, as stitching_bowl.py writes them
+    luts = {
+        cam: {
+            **sparse_lut.pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"]),
+            "src_crop": lut["src_crop"],
+        }
+        for cam, lut in luts.items()
+    }
+
+# The region partition and top-K table are derived from the compiled LUTs by their backends
+luts, prepare_kwargs = reduced_input.rescale_luts(luts, {}, config.INPUT_SCALE)
+crops = source_crop.lut_crops(luts, prepare_kwargs, cameras)
+
+backend = backends.prepare_backend(compositor_mode, luts, cameras, **prepare_kwargs)
+
+
+def load_frames():
+    loaded = {}
+    for cam in cameras:
+        frame = reduced_input.read_frame(
+            os.path.join(images_dir, f"{cam}.png"), config.INPUT_SCALE
+        )
+        if crops is not None:
+            frame = source_crop.crop_frame(frame, crops[cam])
+        if compositor_mode == "yuv":
+            # Stand-in for a V4L2 camera delivering NV12 / YUYV
+            frame = yuv.from_bgr(frame, config.YUV_INPUT_FORMAT)
+        loaded[cam] = frame
+    return loaded
+
+
+frames = load_frames()
+
+NUM_FRAMES = 50
+print(f"\nStarting simulated Real-Time free-view loop ({compositor_mode} compositor)...")
+start_time = time.time()
+
+for i in range(NUM_FRAMES):
+    view = backends.composite(backend, frames)
+
+end_time = time.time()
+fps = NUM_FRAMES / (end_time - start_time)
+backends.release(backend)
+
+print(f"Composited a {width}x{height} 3D bowl view per pass.")
+print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
+
+if view.ndim == 2:
+    # NV12 view (YUV_OUTPUT_FORMAT = "nv12"), converted only for the PNG dump
+    view = cv2.cvtColor(view, cv2.COLOR_YUV2BGR_NV12)
+cv2.imwrite(output_path, view)
+print(f"Output saved to: {output_path}")
@@ -4,6 +4,7 @@ Module: stitching_bowl.py
 This module provides functionality related to stitching bowl.
 """
 
+import functools
 import os
 import sys
 
@@ -16,6 +17,16 @@ if base_dir not in sys.path:
     sys.path.append(base_dir)
 
 import config
+from pipeline.compositor import (
+    free_view,
+    lut_pyramid,
+    projection,
+    regions,
+    source_crop,
+    sparse_lut,
+    topk,
+    vignetting,
+)
 
 PIXELS_PER_METER = config.PIXELS_PER_METER
 BEV_WIDTH = config.BEV_WIDTH
@@ -26,10 +37,22 @@ CAR_LENGTH = config.CAR_LENGTH
 CAR_WIDTH = config.CAR_WIDTH
 FLAT_MARGIN = config.BOWL_FLAT_MARGIN
 BOWL_STEEPNESS = config.BOWL_STEEPNESS
+# Texels beyond this radius (meters) are fully transparent in the rendered bowl texture
+ALPHA_CLIP_RADIUS = config.BOWL_ALPHA_CLIP_RADIUS
+# The bowl surface, shared with the free-view ray-caster
+BOWL_SURFACE = {
+    "flat_rect": (config.BOWL_FLAT_RECT_X, config.BOWL_FLAT_RECT_Y),
+    "flat_margin": FLAT_MARGIN,
+    "steepness": BOWL_STEEPNESS,
+    "clip_radius": ALPHA_CLIP_RADIUS,
+}
 
 intrinsic_params_path = os.path.join(
     base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
 )
+vignetting_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/vignetting_params.npz"
+)
 extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
 images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
 
@@ -47,7 +70,22 @@ with np.load(intrinsic_params_path) as data:
     K = data["K"]
     D = data["D"]
 
-cameras = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+# Lens vignetting correction, folded into every LUT weight (None when disabled)
+vignetting_gain = None
+if config.VIGNETTING_CORRECTION:
+    if os.path.exists(vignetting_params_path):
+        vignetting_gain = functools.partial(
+            vignetting.correction,
+            profile=vignetting.load_profile(vignetting_params_path),
+            max_gain=config.VIGNETTING_MAX_GAIN,
+        )
+    else:
+        print(
+            f"Warning: No vignetting profile at {vignetting_params_path}, run "
+            "pipeline/calibration/calibrate_vignetting.py first. Skipping the correction."
+        )
+
+cameras = config.CAMERAS
 
 print("Initializing 3D spatial mapping grid for 3D BOWL...")
 u, v = np.meshgrid(np.arange(BEV_WIDTH), np.arange(BEV_HEIGHT))
@@ -56,20 +94,22 @@ u, v = np.meshgrid(np.arange(BEV_WIDTH), np.arange(BEV_HEIGHT))
 X = X_RANGE[1] - (v / PIXELS_PER_METER)
 Y = Y_RANGE[1] - (u / PIXELS_PER_METER)
 
-# 1. Rounded Rectangle Flat Area to prevent parallax ghosting on the flat mats.
-dx = np.maximum(np.abs(X) - config.BOWL_FLAT_RECT_X, 0.0)
-dy = np.maximum(np.abs(Y) - config.BOWL_FLAT_RECT_Y, 0.0)
-R_dist = np.sqrt(dx**2 + dy**2)
+# Bowl Depth Geometry (Z-up Curve): a rounded rectangle flat area to prevent parallax
+# ghosting on the flat mats, then the wall sweeping upward
+Z = free_view.bowl_height(X, Y, BOWL_SURFACE)
 
-# Bowl Depth Geometry (Z-up Curve)
-Z = np.where(R_dist <= FLAT_MARGIN, 0.0, ((R_dist - FLAT_MARGIN) ** 2) * BOWL_STEEPNESS)
+# Alpha / validity channel baked once here instead of being re-clipped every frame
+R_abs = np.sqrt(X**2 + Y**2)
+inside_bowl = R_abs <= ALPHA_CLIP_RADIUS
+bowl_alpha = np.where(inside_bowl, 255, 0).astype(np.uint8)
 
-pts_3d = np.stack((X, Y, Z), axis=-1).reshape(-1, 1, 3).astype(np.float32)
+points = np.stack((X, Y, Z), axis=-1)
 
 bev_image_float = np.zeros((BEV_HEIGHT, BEV_WIDTH, 3), dtype=np.float32)
 blend_weights = np.zeros((BEV_HEIGHT, BEV_WIDTH), dtype=np.float32)
 
 camera_maps = {}  # Dictionary to store data for LUTs
+calibration = {}  # Extrinsics of the processed cameras, reused by the LUT pyramid
 
 print("\nProcessing cameras for 3D Bowl texture mapping:")
 for cam in cameras:
@@ -83,23 +123,14 @@ for cam in cameras:
     with np.load(ext_path) as edata:
         rvec = edata["rvec"]
         tvec = edata["tvec"]
+    calibration[cam] = (rvec, tvec)
 
     img = cv2.imread(img_path)
-    img_h, img_w = img.shape[:2]
     print(f"  [Procesing] {cam}: Projecting pure 3D Bowl logic...")
 
-    # 1. Transform World to Camera coordinate to cull points behind the lens
-    R, _ = cv2.Rodrigues(rvec)
-    pts_3d_squeezed = pts_3d.reshape(-1, 3).T
-    pts_cam = R @ pts_3d_squeezed + tvec
-    z_cam = pts_cam[2, :].reshape(BEV_HEIGHT, BEV_WIDTH)
-
-    # 2. Project 3D points onto the camera's 2D image plane using K and D
-    pts_2d, _ = cv2.fisheye.projectPoints(pts_3d, rvec, tvec, K, D)
-    pts_2d = pts_2d.reshape(BEV_HEIGHT, BEV_WIDTH, 2)
-
-    map_x = pts_2d[..., 0].astype(np.float32)
-    map_y = pts_2d[..., 1].astype(np.float32)
+    # 1-2. Project the bowl grid onto the camera's 2D image plane (with its depth, to cull
+    # points behind the lens); the LUT pyramid projects its levels through the same function
+    map_x, map_y, z_cam = projection.project_grid(points, rvec, tvec, K, D)
 
     # 3. Pull colors from original images based on mapping for the static preview
     warped = cv2.remap(
@@ -112,32 +143,25 @@ for cam in cameras:
     )
 
     # 4. Generate Spatial Blend Weighting Mask
-    z_mask = z_cam > 0
-    valid_x = (map_x >= 0) & (map_x < img_w - 1)
-    valid_y = (map_y >= 0) & (map_y < img_h - 1)
-
-    # PARAMETER: Adjust this to let the camera cover a wider angle (less masking at the edges)
+    # PARAMETER: MASK_RADIUS_SCALE lets the camera cover a wider angle (less masking at the edges)
     # > 1.0 pushes the mask outward (less masking, wider angle)
     # < 1.0 pulls the mask inward (more masking, narrower angle)
-    mask_radius_scale = config.MASK_RADIUS_SCALE  
-    
-    max_radius = (np.min([img_w, img_h]) / 2.0) * mask_radius_scale
-    radial_dist = np.sqrt((map_x - img_w / 2.0) ** 2 + (map_y - img_h / 2.0) ** 2) / max_radius
-    
-    # PARAMETER: We can add an exponent to adjust the feather curve (e.g., 2.0 for softer edges)
-    weight = np.clip(1.0 - (radial_dist ** 2), 0.0, 1.0)
-
-    valid_mask = z_mask & valid_x & valid_y
-
-    weight = weight * valid_mask.astype(np.float32)
+    weight = projection.feather_weight(map_x, map_y, z_cam, img.shape, config.MASK_RADIUS_SCALE)
 
     # 5. Accumulate colors
+    # The preview is vignetting-corrected like the LUTs; the blend total stays uncorrected
+    color_weight = weight if vignetting_gain is None else weight * vignetting_gain(map_x, map_y)
     for c in range(3):
-        bev_image_float[..., c] += warped[..., c].astype(np.float32) * weight
+        bev_image_float[..., c] += warped[..., c].astype(np.float32) * color_weight
     blend_weights += weight
 
     # Store parameters for LUT generation
-    camera_maps[cam] = {"map_x": map_x, "map_y": map_y, "weight": weight}
+    camera_maps[cam] = {
+        "map_x": map_x,
+        "map_y": map_y,
+        "weight": weight,
+        "frame_shape": img.shape[:2],
+    }
 
 print("\nFinalizing stitching overlap logic...")
 valid_pixels = blend_weights > 0
@@ -150,16 +174,103 @@ print("\nGenerating and saving optimized LUTs for Real-Time 3D Texture rendering
 # Pre-divide the weights here so the real-time render loop avoids floating point division
 safe_blend_weights = np.maximum(blend_weights, 1e-6)
 
+norm_weights = {}
+cropped_maps = {}
 for cam, maps in camera_maps.items():
     norm_weight = maps["weight"] / safe_blend_weights
     norm_weight[maps["weight"] == 0] = 0.0
+    # Transparent texels never need a color, so the compositor leaves them black
+    norm_weight[~inside_bowl] = 0.0
+    if vignetting_gain is not None:
+        norm_weight *= vignetting_gain(maps["map_x"], maps["map_y"])
+
+    # Only the source box this camera's LUT actually reads is kept at render time;
+    # source coordinates are stored relative to it
+    src_crop = source_crop.footprint_crop(
+        maps["map_x"], maps["map_y"], norm_weight, maps["frame_shape"]
+    )
+    crop_x, crop_y = source_crop.offset_maps(maps["map_x"], maps["map_y"], src_crop)
+    cropped_maps[cam] = {"map_x": crop_x, "map_y": crop_y, "src_crop": src_crop}
 
     lut_path = os.path.join(luts_dir, f"lut_bowl_{cam}.npz")
     np.savez_compressed(
-        lut_path, map_x=maps["map_x"], map_y=maps["map_y"], weight=norm_weight
+        lut_path, map_x=crop_x, map_y=crop_y, weight=norm_weight, src_crop=src_crop
     )
     print(f"  Saved 3D Bowl LUT -> {lut_path}")
 
+    # Sparse twin: only the pixels this camera actually contributes to
+    sparse_path = os.path.join(luts_dir, f"lut_bowl_{cam}_sparse.npz")
+    np.savez_compressed(
+        sparse_path,
+        **sparse_lut.pack_sparse_lut(crop_x, crop_y, norm_weight),
+        src_crop=src_crop,
+    )
+    print(f"  Saved sparse 3D Bowl LUT -> {sparse_path}")
+    y0, y1, x0, x1 = src_crop
+    print(
+        f"  Source crop -> x {x0}:{x1}, y {y0}:{y1} "
+        f"({source_crop.crop_fraction(src_crop, maps['frame_shape']) * 100:.1f}% of the frame)"
+    )
+
+    norm_weights[cam] = norm_weight
+
+alpha_path = os.path.join(luts_dir, "lut_bowl_alpha.npz")
+np.savez_compressed(alpha_path, alpha=bowl_alpha)
+print(f"  Saved baked alpha channel -> {alpha_path} ({inside_bowl.mean() * 100:.1f}% opaque)")
+
+# Partition the canvas into exclusive single-camera regions and overlap bands so the
+# renderer can remap-copy most pixels and only blend along the seams
+partition = regions.partition_regions(norm_weights, list(camera_maps))
+regions_path = os.path.join(luts_dir, "lut_bowl_regions.npz")
+np.savez_compressed(regions_path, **partition)
+copy_px, scaled_px, blend_px = regions.region_shares(partition)
+print(
+    f"  Saved region partition -> {regions_path} (copy: {copy_px * 100:.1f}%, "
+    f"scaled copy: {scaled_px * 100:.1f}%, blend: {blend_px * 100:.1f}% of canvas)"
+)
+
+# Top-K camera-per-pixel LUT: a single table whose per-frame cost does not grow with camera count
+topk_lut = topk.build_topk_lut(
+    {
+        cam: {**cropped_maps[cam], "weight": norm_weights[cam]}
+        for cam in camera_maps
+    },
+    list(camera_maps),
+    k=config.TOPK_CAMERAS,
+)
+topk_path = os.path.join(luts_dir, "lut_bowl_topk.npz")
+np.savez_compressed(topk_path, **topk_lut)
+print(f"  Saved top-{config.TOPK_CAMERAS} camera LUT -> {topk_path}")
+
+# Multi-resolution LUT pyramid: the same bowl texture at the other LUT_PYRAMID_LEVELS widths,
+# for render targets smaller or larger than BEV_WIDTH
+level_cameras = list(camera_maps)
+level_shapes = {cam: maps["frame_shape"] for cam, maps in camera_maps.items()}
+for level in config.LUT_PYRAMID_LEVELS:
+    if level == BEV_WIDTH:
+        continue
+    level_X, level_Y = lut_pyramid.level_grid(level, (BEV_WIDTH, BEV_HEIGHT), X_RANGE, Y_RANGE)
+    level_Z = free_view.bowl_height(level_X, level_Y, BOWL_SURFACE)
+    level_inside = np.sqrt(level_X**2 + level_Y**2) <= ALPHA_CLIP_RADIUS
+    level_luts = lut_pyramid.build_level_luts(
+        np.stack((level_X, level_Y, level_Z), axis=-1),
+        level_cameras,
+        calibration,
+        K,
+        D,
+        level_shapes,
+        config.MASK_RADIUS_SCALE,
+        valid=level_inside,
+        weight_gain=vignetting_gain,
+    )
+    level_path = lut_pyramid.level_dir(luts_dir, level, BEV_WIDTH)
+    lut_pyramid.save_level(level_path, "lut_bowl_", level_luts, level_cameras, config.TOPK_CAMERAS)
+    np.savez_compressed(
+        os.path.join(level_path, "lut_bowl_alpha.npz"),
+        alpha=np.where(level_inside, 255, 0).astype(np.uint8),
+    )
+    print(f"  Saved {level}x{level_X.shape[0]} pyramid level -> {level_path}")
+
 # Central Car Icon
 if config.DRAW_CAR_MASK:
     car_top = int(BEV_HEIGHT / 2 - (CAR_LENGTH / 2.0) * PIXELS_PER_METER)
@@ -0,0 +1,101 @@
+"""
+Module: calibrate_vignetting.py
+
+This module provides the lens vignetting calibration.
+
+It projects a ground grid into the extrinsic calibration images, pairs the observations of the
+points seen by two cameras and fits the radial shading profile of the (shared) fisheye lens
+model around the principal point of the intrinsic calibration (pipeline/compositor/vignetting.py).
+The profile is saved next to the intrinsics; with VIGNETTING_CORRECTION enabled the stitching
+scripts fold its inverse into the LUT weights.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+import config
+from pipeline.compositor import projection, vignetting
+
+# Ground sampling step of the overlap observations (meters)
+GRID_STEP = 0.02
+
+
+def calibrate():
+    # Determine project root (base_dir)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    base_dir = os.path.abspath(os.path.join(script_dir, "../../"))
+
+    # Define paths based on project root
+    params_dir = os.path.join(base_dir, "data/calibration/intrinsic/params")
+    intrinsic_params_path = os.path.join(params_dir, "intrinsic_params.npz")
+    extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
+    images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+
+    if not os.path.exists(intrinsic_params_path):
+        print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+        return
+
+    with np.load(intrinsic_params_path) as data:
+        K = data["K"]
+        D = data["D"]
+
+    cameras, calibration, frames = [], {}, {}
+    for cam in config.CAMERAS:
+        ext_path = os.path.join(extrinsic_dir, f"extrinsic_{cam}.npz")
+        img_path = os.path.join(images_dir, f"{cam}.png")
+        if not os.path.exists(ext_path) or not os.path.exists(img_path):
+            print(f"  [Skip] {cam} (Missing data files)")
+            continue
+        with np.load(ext_path) as edata:
+            calibration[cam] = (edata["rvec"], edata["tvec"])
+        frames[cam] = cv2.imread(img_path)
+        cameras.append(cam)
+    if len(cameras) < 2:
+        print("Error: Vignetting calibration needs at least two calibrated cameras")
+        return
+
+    X, Y = np.meshgrid(
+        np.arange(config.X_RANGE[0], config.X_RANGE[1], GRID_STEP),
+        np.arange(config.Y_RANGE[0], config.Y_RANGE[1], GRID_STEP),
+    )
+    points = np.stack((X.ravel(), Y.ravel(), np.zeros(X.size)), axis=-1)
+    frame_shapes = {cam: frames[cam].shape[:2] for cam in cameras}
+    views = projection.project_points(
+        points, cameras, calibration, K, D, frame_shapes, config.MASK_RADIUS_SCALE
+    )
+
+    print(f"Estimating the radial vignetting profile from {len(cameras)} camera overlaps...")
+    # Same radius normalization as the stitching feathering: half the shorter frame side
+    center = (K[0, 2], K[1, 2])
+    radius = min(frame_shapes[cameras[0]]) / 2.0
+    try:
+        profile = vignetting.estimate_profile(frames, views, cameras, center, radius)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    print("-" * 40)
+    print(f"Overlap samples: {profile['samples']} ({profile['inliers']} inliers)")
+    max_gain = config.VIGNETTING_MAX_GAIN
+    print(f"Relative brightness per radius (LUT weight gain, at most {max_gain:g}):")
+    for r in np.linspace(0.0, profile["r_max"], 6):
+        level = vignetting.shading(r, profile["coeffs"])
+        gain = vignetting.profile_gain(r, profile["coeffs"], profile["r_max"], max_gain)
+        print(f"  r = {r:4.2f}: {level:5.3f} ({gain:5.3f})")
+    print(f"\nLuminance profile log V(r) = b1 r^2 + b2 r^4 + b3 r^6: {profile['coeffs']}")
+    print("Relative exposures: " + ", ".join(
+        f"{cam} {exposure:.3f}" for cam, exposure in zip(cameras, profile["exposures"])
+    ))
+    print("-" * 40)
+
+    npz_path = os.path.join(params_dir, "vignetting_params.npz")
+    np.savez(npz_path, cameras=np.array(cameras), **profile)
+    print(f"Saved NumPy format to: {npz_path}")
+
+
+if __name__ == "__main__":
+    calibrate()
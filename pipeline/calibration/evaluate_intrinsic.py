@@ -14,6 +14,7 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 base_dir = os.path.abspath(os.path.join(script_dir, "../../"))
 sys.path.append(base_dir)
 import config
+from pipeline.compositor import virtual_view
 
 def verify():
     # Determine project root (base_dir)
@@ -45,26 +46,15 @@ def verify():
 
     print(f"Loaded parameters from {params_path}")
 
-    # 2. Manually construct a new K, forcing a 1:1 aspect ratio and adjusting scale
-    # We take the fx from calibrated K as the baseline and multiply by a scale factor
-    scale = 0.5  # Smaller value = wider field of view; larger value = zoomed in
-    new_f = K[0, 0] * scale
-
-    new_K = np.array(
-        [
-            [new_f, 0, w / 2],  # Center cx set to half of image width
-            [0, new_f, h / 2],  # Center cy set to half of image height
-            [0, 0, 1],
-        ],
-        dtype=np.float64,
-    )
+    # 2. Wide virtual pinhole camera (1:1 aspect ratio, centred) to undistort into
+    # (a smaller DEBUG_UNDISTORT_FOV zooms in, a larger one shows more of the fisheye circle)
+    debug_view = {"size": (w, h), "panes": [{"fov": config.DEBUG_UNDISTORT_FOV}]}
+    new_K = virtual_view.pinhole_matrix(debug_view["size"], config.DEBUG_UNDISTORT_FOV)
 
     # 3. Perform undistortion
-    map1, map2 = cv2.fisheye.initUndistortRectifyMap(
-        K, D, np.eye(3), new_K, (w, h), cv2.CV_16SC2
-    )
-    undistorted_img = cv2.remap(
-        img, map1, map2, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT
+    view_cache_dir = os.path.join(base_dir, "data/virtual_views/cache")
+    undistorted_img = virtual_view.render_view(
+        img, virtual_view.load_view_maps(view_cache_dir, K, D, debug_view)
     )
 
     output_path = os.path.join(
@@ -0,0 +1,194 @@
+"""
+Module: autotune.py
+
+Benchmarks every registered compositor backend on the real LUTs and camera frames of this
+machine and persists the fastest acceptable one as autotune.json next to the LUTs.
+Render scripts running with COMPOSITOR_MODE = "auto" pick that backend up at startup.
+
+Backend costs depend on the canvas and source sizes, so every LUT pyramid level (--level) keeps
+its own autotune.json, holding one result per input scale (--scale, see INPUT_SCALE).
+
+Usage:
+    python3 pipeline/compositor/autotune.py --target bev
+    python3 pipeline/compositor/autotune.py --target bowl --frames 30
+    python3 pipeline/compositor/autotune.py --target bev --level 500 --scale 2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import backends, lut_pyramid, reduced_input, source_crop
+
+TARGETS = {
+    "bev": {
+        "luts_dir": os.path.join(base_dir, "data/bev_2d/luts"),
+        "lut_prefix": "lut_",
+        "regions_file": "lut_regions.npz",
+        "levels": True,
+    },
+    "bowl": {
+        "luts_dir": os.path.join(base_dir, "data/bowl_3d/luts"),
+        "lut_prefix": "lut_bowl_",
+        "regions_file": "lut_bowl_regions.npz",
+        "levels": True,
+    },
+    "panorama": {
+        "luts_dir": os.path.join(base_dir, "data/panorama/luts"),
+        "lut_prefix": "lut_pano_",
+        "regions_file": "lut_pano_regions.npz",
+        "levels": False,
+    },
+}
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+cameras = config.CAMERAS
+
+
+def benchmark_backend(name, luts, frames, reference, num_frames, overrides):
+    backend = backends.prepare_backend(name, luts, cameras, **overrides)
+    try:
+        # Warm-up: lazily built tables, thread pool spin-up, page faults on fresh buffers
+        output = backends.composite(backend, frames)
+        output = backends.composite(backend, frames)
+
+        start = time.perf_counter()
+        for _ in range(num_frames):
+            output = backends.composite(backend, frames)
+        elapsed = (time.perf_counter() - start) / num_frames
+
+        diff = np.abs(output.astype(np.int16) - reference.astype(np.int16))
+    finally:
+        backends.release(backend)
+
+    return {
+        "ms": elapsed * 1000.0,
+        "fps": 1.0 / elapsed,
+        "max_error": int(diff.max()),
+        "mean_error": float(diff.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune the real-time LUT compositor.")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="bev")
+    parser.add_argument("--frames", type=int, default=20, help="Timed frames per backend")
+    parser.add_argument(
+        "--max-error",
+        type=int,
+        default=config.AUTOTUNE_MAX_ERROR,
+        help="Largest per-pixel deviation from the float reference a winner may have",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        default=config.BEV_WIDTH,
+        help="LUT pyramid level (canvas width) to tune, see LUT_PYRAMID_LEVELS",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=config.INPUT_SCALE,
+        help="Input decode scale (1/scale) to tune for, see INPUT_SCALE",
+    )
+    args = parser.parse_args()
+
+    target = TARGETS[args.target]
+    luts_dir = target["luts_dir"]
+    if target["levels"]:
+        luts_dir = lut_pyramid.level_dir(luts_dir, args.level, config.BEV_WIDTH)
+    elif args.level != config.BEV_WIDTH:
+        print(f"Error: The {args.target} target has no LUT pyramid levels.")
+        sys.exit(1)
+    try:
+        reduced_input.check_scale(args.scale)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    luts = {}
+    for cam in cameras:
+        lut_path = os.path.join(luts_dir, f"{target['lut_prefix']}{cam}.npz")
+        if not os.path.exists(lut_path):
+            print(f"Error: Missing LUT {lut_path}. Run the stitching stage first.")
+            sys.exit(1)
+        with np.load(lut_path) as data:
+            luts[cam] = {key: data[key] for key in data.files}
+
+    frames = {}
+    for cam in cameras:
+        frames[cam] = reduced_input.read_frame(os.path.join(images_dir, f"{cam}.png"), args.scale)
+        if frames[cam] is None:
+            print(f"Error: Missing camera frame for {cam} in {images_dir}")
+            sys.exit(1)
+    # Benchmark on the reduced, cropped source boxes the LUTs read, as the render loops do
+    luts, _ = reduced_input.rescale_luts(luts, {}, args.scale)
+    frames = source_crop.crop_frames(frames, source_crop.lut_crops(luts, {}, cameras))
+
+    overrides = {}
+    regions_path = os.path.join(luts_dir, target["regions_file"])
+    if os.path.exists(regions_path):
+        with np.load(regions_path) as data:
+            overrides["regions"] = {"partition": {key: data[key] for key in data.files}}
+
+    reference = backends.composite(
+        backends.prepare_backend("float", luts, cameras), frames
+    ).copy()
+
+    # Scene-dependent backends (e.g. incremental) would win on a static benchmark frame
+    candidates = {n: e for n, e in backends.BACKENDS.items() if e["autotune"]}
+    print(
+        f"Autotuning {len(candidates)} compositor backends on {args.target} LUTs "
+        f"({luts_dir}, input scale 1/{args.scale})..."
+    )
+    results = {}
+    for name, entry in candidates.items():
+        results[name] = benchmark_backend(
+            name, luts, frames, reference, args.frames, overrides.get(name, {})
+        )
+        r = results[name]
+        print(
+            f"  {name:<8} {r['ms']:8.2f} ms  {r['fps']:7.2f} FPS  "
+            f"max err {r['max_error']:>3}  ({entry['description']})"
+        )
+
+    eligible = {n: r for n, r in results.items() if r["max_error"] <= args.max_error}
+    winner = min(eligible, key=lambda n: eligible[n]["ms"])
+
+    # One entry per input scale; results for the other scales of this level are kept
+    tune_path = os.path.join(luts_dir, backends.AUTOTUNE_FILENAME)
+    tuned = {}
+    if os.path.exists(tune_path):
+        with open(tune_path, "r") as f:
+            tuned = json.load(f)
+    tuned.setdefault("scales", {})[str(args.scale)] = {
+        "backend": winner,
+        "max_error": args.max_error,
+        # Corrected LUTs change what the regions compositor can copy (see resolve_mode)
+        "vignetting_correction": config.VIGNETTING_CORRECTION,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "lut_shape": list(reference.shape[:2]),
+        "frame_shapes": {cam: list(frame.shape[:2]) for cam, frame in frames.items()},
+        "results": results,
+    }
+    with open(tune_path, "w") as f:
+        json.dump({"scales": tuned["scales"]}, f, indent=2)
+
+    print(f"\nFastest backend within {args.max_error} LSB at 1/{args.scale} input: {winner}")
+    print(f"Saved autotune result -> {tune_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Module: backends.py
+
+This module provides the compositor backend registry used by the real-time render loops.
+
+Every backend is a module exposing prepare_luts(luts, cameras, **kwargs) and
+composite(frames, prepared, cameras, ...). Optional hooks are picked up when present:
+allocate_buffers() for the out=/scratch= API and shutdown() for backends owning threads.
+Given a baked alpha channel, composite() returns a BGRA frame whose alpha is written once at
+preparation time; backends with out= buffers then render straight into its color channels.
+The special mode "auto" resolves to whatever the autotuner persisted next to the LUTs for the
+input scale in use.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import (
+    fixed_point,
+    float_remap,
+    fused_numba,
+    gather,
+    incremental,
+    nearest,
+    per_camera,
+    regions,
+    sparse_lut,
+    tiled,
+    topk,
+    yuv,
+)
+
+AUTOTUNE_FILENAME = "autotune.json"
+
+BACKENDS = {}
+
+
+def register_backend(name, module, description, autotune=True, **prepare_kwargs):
+    """
+    Register a compositor module under name; prepare_kwargs are its default settings.
+    Backends whose speed depends on scene content rather than the machine pass autotune=False.
+    """
+    BACKENDS[name] = {
+        "module": module,
+        "description": description,
+        "autotune": autotune,
+        "prepare_kwargs": prepare_kwargs,
+    }
+
+
+register_backend("float", float_remap, "float32 remap + float weights (reference)")
+register_backend("fixed", fixed_point, "CV_16SC2 fixed-point remap + Q8 integer weights")
+register_backend("sparse", sparse_lut, "packed remap of covered pixels only")
+register_backend("regions", regions, "remap-copy exclusive regions, blend overlaps")
+register_backend(
+    "tiled",
+    tiled,
+    "horizontal tiles on a thread pool",
+    num_tiles=config.COMPOSITOR_TILES,
+    workers=config.COMPOSITOR_WORKERS,
+    cpu_affinity=config.COMPOSITOR_CPU_AFFINITY,
+)
+register_backend("gather", gather, "np.take gather of nearest source pixels")
+register_backend("nearest", nearest, "nearest-neighbour integer remap + Q8 weights")
+register_backend(
+    "topk", topk, "K atlas remaps from top-K camera LUT", k=config.TOPK_CAMERAS
+)
+register_backend(
+    "incremental",
+    incremental,
+    "recomposite only tiles whose source footprint changed",
+    autotune=False,
+    tile_size=config.INCREMENTAL_TILE_SIZE,
+    downsample=config.INCREMENTAL_DOWNSAMPLE,
+    threshold=config.INCREMENTAL_THRESHOLD,
+)
+register_backend(
+    "async", per_camera, "per-camera partial recomposite from cached contributions"
+)
+register_backend(
+    "yuv",
+    yuv,
+    "native NV12 / YUYV input, luma + half-res chroma remaps",
+    autotune=False,
+    input_format=config.YUV_INPUT_FORMAT,
+    output_format=config.YUV_OUTPUT_FORMAT,
+)
+if fused_numba.NUMBA_AVAILABLE:
+    register_backend("numba", fused_numba, "Numba-fused remap + weight + accumulate")
+
+
+def resolve_mode(mode, luts_dir, scale=1):
+    """
+    Map "auto" to the backend autotuned for the LUT set in luts_dir (a pyramid level directory
+    has its own autotune.json) at input scale 1/scale, falling back to "float".
+    """
+    if mode != "auto":
+        return mode
+
+    tune_path = os.path.join(luts_dir, AUTOTUNE_FILENAME)
+    if os.path.exists(tune_path):
+        with open(tune_path, "r") as f:
+            tuned = json.load(f).get("scales", {}).get(str(scale), {})
+        if tuned.get("backend") in BACKENDS:
+            if tuned.get("vignetting_correction", False) != config.VIGNETTING_CORRECTION:
+                print(
+                    f"Warning: {tune_path} was tuned with VIGNETTING_CORRECTION = "
+                    f"{not config.VIGNETTING_CORRECTION}, re-run autotune.py after re-stitching."
+                )
+            return tuned["backend"]
+
+    print(
+        f"Warning: No autotune result for input scale 1/{scale} at {tune_path}, "
+        "using the float compositor."
+    )
+    return "float"
+
+
+def prepare_backend(name, luts, cameras, reuse_buffers=True, alpha=None, **overrides):
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown compositor backend '{name}'. Available: {', '.join(BACKENDS)}"
+        )
+
+    entry = BACKENDS[name]
+    module = entry["module"]
+    prepared = module.prepare_luts(luts, cameras, **{**entry["prepare_kwargs"], **overrides})
+
+    # Buffers are shared between frames, so callers keeping several frames in flight
+    # (the pipelined loop) must opt out
+    composite_kwargs = {}
+    if reuse_buffers and hasattr(module, "allocate_buffers"):
+        out, scratch = module.allocate_buffers(prepared, cameras)
+        composite_kwargs = {"out": out, "scratch": scratch}
+
+    rgba = None
+    if alpha is not None:
+        rgba = np.empty(alpha.shape + (4,), dtype=np.uint8)
+        rgba[..., 3] = alpha
+        if "out" in composite_kwargs:
+            # Composite directly into the BGR channels of the BGRA frame
+            composite_kwargs["out"] = rgba[..., :3]
+
+    return {
+        "name": name,
+        "module": module,
+        "prepared": prepared,
+        "cameras": cameras,
+        "composite_kwargs": composite_kwargs,
+        "rgba": rgba,
+        # Only a caller-provided canvas persists; without one these backends hand out copies
+        "keeps_canvas": getattr(module, "KEEPS_CANVAS", False) and "out" in composite_kwargs,
+        "display": None,
+    }
+
+
+def overlay_canvas(backend, canvas):
+    """
+    Return the buffer UI overlays may be drawn on for a composited canvas: the canvas itself, or
+    a reused copy of it when the backend keeps its canvas between frames, so last frame's
+    sprites are never composited around again.
+    """
+    if not backend["keeps_canvas"]:
+        return canvas
+    if backend["display"] is None or backend["display"].shape != canvas.shape:
+        backend["display"] = np.empty_like(canvas)
+    np.copyto(backend["display"], canvas)
+    return backend["display"]
+
+
+def composite(backend, frames):
+    result = backend["module"].composite(
+        frames, backend["prepared"], backend["cameras"], **backend["composite_kwargs"]
+    )
+    rgba = backend["rgba"]
+    if rgba is None:
+        return result
+    if not np.shares_memory(result, rgba):
+        # Backends allocating their own output still skip the per-frame BGR2BGRA + clip
+        rgba[..., :3] = result
+    return rgba
+
+
+def release(backend):
+    if hasattr(backend["module"], "shutdown"):
+        backend["module"].shutdown(backend["prepared"])
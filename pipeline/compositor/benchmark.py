@@ -0,0 +1,30 @@
+"""
+Module: benchmark.py
+
+This module provides small measurement helpers shared by the render loops.
+"""
+
+import tracemalloc
+
+
+def measure_allocations(step, num_frames=10):
+    """
+    Run step(i) num_frames times under tracemalloc after one warm-up call.
+
+    Returns (peak_bytes, net_bytes): the transient high-water mark above the starting
+    point and whatever is still held afterwards. NumPy (and therefore cv2 outputs)
+    report their buffers to tracemalloc, so a truly allocation-free loop reads ~0 here.
+    """
+    step(0)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(num_frames):
+            step(i)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak - baseline, current - baseline
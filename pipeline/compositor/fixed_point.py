@@ -0,0 +1,124 @@
+"""
+Module: fixed_point.py
+
+This module provides an integer-only LUT compositor for the real-time render loops.
+
+The float maps are converted once with cv2.convertMaps into CV_16SC2 / CV_16UC1 fixed-point pairs
+(OpenCV's native remap format), and the pre-normalized blend weights are quantized to Q8 uint16 so
+that every frame is composited with uint8 x uint16 multiply-adds and a single final shift.
+Output matches the float32 reference path within +/-1 LSB. Weights summing past 1 (gain or
+vignetting correction) keep fewer fraction bits so the accumulator cannot overflow.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+# Weights are stored as Q8 fixed point: 1.0 == 256.
+# 255 * 256 fits a uint16 accumulator with room to spare for rounding residue.
+WEIGHT_BITS = 8
+WEIGHT_ONE = 1 << WEIGHT_BITS
+
+
+def weight_bits(peak):
+    """
+    Fraction bits for weights whose per-pixel totals reach peak: Q8 for normalized weights,
+    fewer once gain or vignetting correction push totals above 1, so 255 * total still fits
+    the uint16 accumulator.
+    """
+    if peak < saturation.WEIGHT_LIMIT:
+        return WEIGHT_BITS
+    return max(int(np.floor(np.log2(WEIGHT_ONE / peak))), 0)
+
+
+def quantize_weights(weights, bits=WEIGHT_BITS):
+    """
+    Quantize per-camera float weights to fixed point with `bits` fraction bits so every covered
+    pixel sums to exactly its rounded float total (1 << bits for normalized weights).
+    """
+    one = 1 << bits
+    cams = list(weights.keys())
+    stack = np.stack([weights[cam] for cam in cams], axis=0).astype(np.float32)
+    q = np.rint(stack * one).astype(np.int32)
+
+    # Rounding can leave a +/-1 residue per pixel. Fold it into the dominant camera so a flat
+    # area stays flat instead of drifting by one grey level across seams.
+    total = stack.sum(axis=0)
+    residue = np.where(total > 0, np.rint(total * one).astype(np.int32) - q.sum(axis=0), 0)
+    dominant = np.argmax(stack, axis=0)
+    np.put_along_axis(
+        q,
+        dominant[np.newaxis],
+        np.take_along_axis(q, dominant[np.newaxis], axis=0) + residue[np.newaxis],
+        axis=0,
+    )
+    q = np.maximum(q, 0)
+
+    return {cam: q[i].astype(np.uint16) for i, cam in enumerate(cams)}
+
+
+def prepare_luts(luts, cameras):
+    total = saturation.weight_total(luts, cameras)
+    bits = weight_bits(float(total.max()))
+    q_weights = quantize_weights({cam: luts[cam]["weight"] for cam in cameras}, bits)
+
+    prepared = {}
+    for cam in cameras:
+        map1, map2 = cv2.convertMaps(
+            luts[cam]["map_x"], luts[cam]["map_y"], cv2.CV_16SC2
+        )
+        prepared[cam] = {
+            "map1": map1,  # Integer source coordinates (CV_16SC2)
+            "map2": map2,  # Sub-pixel interpolation table index (CV_16UC1)
+            # Expanded to 3 channels so the multiply below needs no broadcasting
+            "weight": np.ascontiguousarray(np.stack([q_weights[cam]] * 3, axis=-1)),
+        }
+    prepared["bits"] = bits
+    prepared["clamp"] = saturation.needs_clamp(total)
+    return prepared
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared[cameras[0]]["map1"].shape[:2]
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch = {
+        "acc": np.empty((height, width, 3), dtype=np.uint16),
+        "term": np.empty((height, width, 3), dtype=np.uint16),
+        "warped": np.empty((height, width, 3), dtype=np.uint8),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    acc = scratch["acc"]
+    acc.fill(0)
+
+    for cam in cameras:
+        lut = prepared[cam]
+
+        warped = cv2.remap(
+            frames[cam],
+            lut["map1"],
+            lut["map2"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+
+        # uint8 * Q8 weight -> uint16, accumulated without ever touching float
+        np.multiply(warped, lut["weight"], out=scratch["term"])
+        acc += scratch["term"]
+
+    # Drop the fraction (truncation, same as the float path's astype(np.uint8))
+    np.right_shift(acc, prepared["bits"], out=acc)
+    if prepared["clamp"]:
+        np.minimum(acc, 255, out=acc)
+    np.copyto(out, acc, casting="unsafe")
+    return out
@@ -0,0 +1,69 @@
+"""
+Module: float_remap.py
+
+This module provides the reference float32 LUT compositor used by the real-time render loops.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+
+def prepare_luts(luts, cameras):
+    prepared = {}
+    for cam in cameras:
+        lut = luts[cam]
+        prepared[cam] = {
+            "map_x": lut["map_x"],
+            "map_y": lut["map_y"],
+            # Expand weight to 3 channels for fast vectorized color multiplication
+            "weight": np.stack([lut["weight"]] * 3, axis=-1).astype(np.float32),
+        }
+    prepared["clamp"] = saturation.needs_clamp(saturation.weight_total(luts, cameras))
+    return prepared
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared[cameras[0]]["map_x"].shape
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch = {
+        "acc": np.empty((height, width, 3), dtype=np.float32),
+        "term": np.empty((height, width, 3), dtype=np.float32),
+        "warped": np.empty((height, width, 3), dtype=np.uint8),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    bev = scratch["acc"]
+    bev.fill(0)
+
+    for cam in cameras:
+        lut = prepared[cam]
+
+        # 1. Fetch exact pixel colors instantly mapping curved 180 FOV to the output surface
+        warped = cv2.remap(
+            frames[cam],
+            lut["map_x"],
+            lut["map_y"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+
+        # 2. Multiply by alpha weight and composite instantly (no complex math)
+        np.multiply(warped, lut["weight"], out=scratch["term"])
+        bev += scratch["term"]
+
+    # Weights above 1 (gain / vignetting correction) saturate instead of wrapping around
+    if prepared["clamp"]:
+        np.minimum(bev, 255, out=bev)
+    np.copyto(out, bev, casting="unsafe")
+    return out
@@ -0,0 +1,202 @@
+"""
+Module: free_view.py
+
+This module provides view-dependent LUTs of the 3D bowl for CPU-only targets.
+
+For a virtual camera pose, every display pixel is ray-cast against the bowl surface of
+stitching_bowl.py and the hit point is projected straight into the fisheye cameras, with the
+same radial feathering as the bowl texture. The result is one display-resolution LUT per camera
+(map_x, map_y, weight, src_crop), the format the stitching stage writes, so rendering the 3D
+bowl from a fixed viewpoint is a single composite pass of any compositor backend, exactly as
+expensive as a BEV frame. No GPU, mesh or intermediate bowl texture is involved.
+
+A pose is an orbit around a target point (automotive frame: X forward, Y left, Z up):
+    {"azimuth": 200, "elevation": 35, "distance": 8.0, "target": (0.5, 0.0, 0.0), "fov": 60}
+azimuth (degrees) is measured counter-clockwise from the front of the car, elevation (degrees)
+above the ground, distance in meters and fov is the horizontal field of view in degrees.
+
+The bowl surface is a dict mirroring the BOWL_* settings of config.py:
+    {"flat_rect": (2.5, 2.5), "flat_margin": 1.5, "steepness": 0.5, "clip_radius": 4.9}
+"""
+
+import numpy as np
+
+from pipeline.compositor import projection, virtual_view
+
+# Bisection steps of the ray-cast (followed by one secant step); 16 halvings of a ~15 m
+# ray span leave well under a millimeter
+RAYCAST_ITERATIONS = 16
+# Meters below the ground plane where descending rays stop
+GROUND_MARGIN = -0.01
+
+
+def bowl_height(x, y, surface):
+    """Height (meters) of the bowl surface above the ground at (x, y)."""
+    # Rounded rectangle flat area, then a quadratic wall sweeping up from its margin
+    dx = np.maximum(np.abs(x) - surface["flat_rect"][0], 0.0)
+    dy = np.maximum(np.abs(y) - surface["flat_rect"][1], 0.0)
+    r_dist = np.sqrt(dx**2 + dy**2)
+    return np.where(
+        r_dist <= surface["flat_margin"],
+        0.0,
+        ((r_dist - surface["flat_margin"]) ** 2) * surface["steepness"],
+    )
+
+
+def orbit_eye(pose):
+    """World position of the virtual camera of an orbit pose."""
+    azimuth, elevation = np.radians([pose["azimuth"], pose["elevation"]])
+    direction = np.array(
+        [
+            np.cos(elevation) * np.cos(azimuth),
+            np.cos(elevation) * np.sin(azimuth),
+            np.sin(elevation),
+        ]
+    )
+    return np.asarray(pose.get("target", (0.0, 0.0, 0.0)), dtype=np.float64) + (
+        pose["distance"] * direction
+    )
+
+
+def interpolate_pose(start, end, fraction):
+    """Pose a fraction of the way from start to end (azimuth takes the shorter way round)."""
+    turn = (end["azimuth"] - start["azimuth"] + 180.0) % 360.0 - 180.0
+    pose = {"azimuth": (start["azimuth"] + fraction * turn) % 360.0}
+    for name, default in (("elevation", None), ("distance", None), ("fov", 60.0)):
+        first = start.get(name, default)
+        pose[name] = first + fraction * (end.get(name, default) - first)
+    first = np.asarray(start.get("target", (0.0, 0.0, 0.0)), dtype=np.float64)
+    last = np.asarray(end.get("target", (0.0, 0.0, 0.0)), dtype=np.float64)
+    pose["target"] = tuple((first + fraction * (last - first)).tolist())
+    return pose
+
+
+def look_at(eye, target):
+    """Camera-to-world rotation whose columns are the camera's right, down and forward axes."""
+    forward = np.asarray(target, dtype=np.float64) - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, (0.0, 0.0, 1.0))
+    if np.linalg.norm(right) < 1e-9:
+        raise ValueError("Free-view camera cannot look straight up or down")
+    right /= np.linalg.norm(right)
+    down = np.cross(forward, right)
+    return np.stack((right, down, forward), axis=1)
+
+
+def view_rays(pose, size):
+    """Eye position and world-frame ray directions (height * width, 3) of a pose's pixels."""
+    eye = orbit_eye(pose)
+    rotation = look_at(eye, pose.get("target", (0.0, 0.0, 0.0)))
+    camera_matrix = virtual_view.pinhole_matrix(size, pose.get("fov", 60.0))
+
+    width, height = size
+    u, v = np.meshgrid(
+        np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)
+    )
+    rays_cam = np.stack(
+        (
+            (u.ravel() - camera_matrix[0, 2]) / camera_matrix[0, 0],
+            (v.ravel() - camera_matrix[1, 2]) / camera_matrix[1, 1],
+            np.ones(width * height, dtype=np.float32),
+        ),
+        axis=1,
+    )
+    return eye, rays_cam @ rotation.T.astype(np.float32)
+
+
+def raycast_bowl(eye, rays, surface, iterations=RAYCAST_ITERATIONS):
+    """
+    First hit of each ray with the bowl inside its clip radius: (points (N, 3), hit (N,)).
+
+    The space above the surface is convex (the height is a convex function of x, y), so along a
+    ray the clearance above the surface is concave: a ray entering the clip cylinder above the
+    surface crosses it exactly once before leaving the cylinder or reaching the ground, and
+    plain bisection finds that crossing. Rays landing on the flat floor are solved in closed
+    form first. Other rays entering below the surface would see the outside of the bowl and
+    are dropped, like back faces.
+    """
+    ex, ey, ez = (float(c) for c in eye)
+    dx, dy, dz = rays[:, 0], rays[:, 1], rays[:, 2]
+    points = np.zeros((len(rays), 3), dtype=np.float64)
+    hit = np.zeros(len(rays), dtype=bool)
+
+    # Span of each ray inside the vertical clip cylinder
+    a = dx * dx + dy * dy
+    half_b = ex * dx + ey * dy
+    c = ex * ex + ey * ey - surface["clip_radius"] ** 2
+    disc = half_b * half_b - a * c
+    vertical = a < 1e-12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = np.sqrt(np.maximum(disc, 0.0))
+        t_in = np.maximum(np.where(vertical, 0.0, (-half_b - root) / a), 0.0)
+        t_out = np.where(vertical, np.inf, (-half_b + root) / a)
+    spans = np.where(vertical, c <= 0, disc > 0) & (t_out > t_in)
+
+    # Most of a typical view lands on the flat floor: intersect the ground plane directly
+    index = np.flatnonzero(spans & (dz < 0))
+    t_floor = -ez / dz[index]
+    floor_x = ex + t_floor * dx[index]
+    floor_y = ey + t_floor * dy[index]
+    on_floor = (
+        (t_floor >= t_in[index])
+        & (t_floor <= t_out[index])
+        & (bowl_height(floor_x, floor_y, surface) == 0.0)
+    )
+    points[index[on_floor], 0] = floor_x[on_floor]
+    points[index[on_floor], 1] = floor_y[on_floor]
+    hit[index[on_floor]] = True
+    spans[index[on_floor]] = False
+
+    index = np.flatnonzero(spans)
+    lo, hi = t_in[index], t_out[index]
+    dx, dy, dz = dx[index], dy[index], dz[index]
+    # The surface never dips below the ground, so a descending ray hits it by z = 0; the
+    # bracket ends a little below it so the floor is strictly crossed in float32
+    descending = dz < 0
+    hi[descending] = np.minimum(hi[descending], (GROUND_MARGIN - ez) / dz[descending])
+
+    def clearance(t):
+        return ez + t * dz - bowl_height(ex + t * dx, ey + t * dy, surface)
+
+    h_lo, h_hi = clearance(lo), clearance(hi)
+    crossing = np.isfinite(hi) & (h_lo > 0) & (h_hi <= 0)
+    index, lo, hi, h_lo, h_hi = (
+        index[crossing], lo[crossing], hi[crossing], h_lo[crossing], h_hi[crossing]
+    )
+    dx, dy, dz = dx[crossing], dy[crossing], dz[crossing]
+
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        h_mid = clearance(mid)
+        above = h_mid > 0
+        lo[above] = mid[above]
+        h_lo[above] = h_mid[above]
+        below = ~above
+        hi[below] = mid[below]
+        h_hi[below] = h_mid[below]
+
+    # Final secant step inside the bracket
+    t = lo + (hi - lo) * h_lo / (h_lo - h_hi)
+    points[index] = np.stack((ex + t * dx, ey + t * dy, ez + t * dz), axis=1)
+    hit[index] = True
+    return points, hit
+
+
+def compile_view(pose, size, surface, cameras, calibration, K, D, frame_shapes,
+                 mask_radius_scale=1.0):
+    """
+    Build the LUT set of a free-view pose at size (width, height):
+    {camera: {map_x, map_y, weight, src_crop}} with coordinates relative to each camera's crop.
+    calibration maps each camera to its extrinsic (rvec, tvec).
+    """
+    eye, rays = view_rays(pose, size)
+    inside = eye[0] ** 2 + eye[1] ** 2 <= surface["clip_radius"] ** 2
+    if inside and eye[2] <= bowl_height(eye[0], eye[1], surface):
+        raise ValueError(f"Free-view camera at {np.round(eye, 2).tolist()} is below the bowl")
+
+    points, hit = raycast_bowl(eye, rays, surface)
+    hit_index = np.flatnonzero(hit)
+    views = projection.project_points(
+        points[hit_index], cameras, calibration, K, D, frame_shapes, mask_radius_scale
+    )
+    return projection.blend_luts(views, size, frame_shapes, index=hit_index)
@@ -0,0 +1,134 @@
+"""
+Module: fused_numba.py
+
+This module provides an optional Numba-compiled compositor that fuses remap, weighting and
+accumulation into a single pass over the output canvas.
+
+For every output pixel the kernel visits only the cameras with nonzero weight, samples them
+bilinearly with OpenCV's own fixed-point scheme (5-bit sub-pixel table, 15-bit coefficients,
+per-tap BORDER_CONSTANT), multiplies by the float32 LUT weight in camera order and writes the
+final uint8 pixel. No intermediate warped image or float canvas is ever materialized, which is
+what matters when memory bandwidth, not arithmetic, is the bottleneck. The result is
+bit-identical to the float_remap reference path.
+
+Numba is optional: without it NUMBA_AVAILABLE is False and the backend is not registered.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+# Mirrors OpenCV's INTER_BITS / INTER_REMAP_COEF_BITS used by cv2.remap(INTER_LINEAR)
+INTER_BITS = 5
+INTER_TAB_SIZE = 1 << INTER_BITS
+COEF_BITS = 15
+
+
+if NUMBA_AVAILABLE:
+
+    @numba.njit(parallel=True, cache=True)
+    def _fused_kernel(frames, map_x, map_y, weight, out):
+        num_cams, height, width = weight.shape
+
+        for v in numba.prange(height):
+            for u in range(width):
+                acc0 = np.float32(0.0)
+                acc1 = np.float32(0.0)
+                acc2 = np.float32(0.0)
+
+                for c in range(num_cams):
+                    w = weight[c, v, u]
+                    if w == 0:
+                        continue
+
+                    img = frames[c]
+                    img_h = img.shape[0]
+                    img_w = img.shape[1]
+
+                    # Same float -> fixed conversion as cv2.remap (round half to even)
+                    ix = np.int64(np.rint(map_x[c, v, u] * INTER_TAB_SIZE))
+                    iy = np.int64(np.rint(map_y[c, v, u] * INTER_TAB_SIZE))
+                    x0 = ix >> INTER_BITS
+                    y0 = iy >> INTER_BITS
+                    fx = ix & (INTER_TAB_SIZE - 1)
+                    fy = iy & (INTER_TAB_SIZE - 1)
+
+                    # Bilinear coefficients scaled to 2^15 (exact for a power-of-two table)
+                    w00 = (INTER_TAB_SIZE - fx) * (INTER_TAB_SIZE - fy) * 32
+                    w01 = fx * (INTER_TAB_SIZE - fy) * 32
+                    w10 = (INTER_TAB_SIZE - fx) * fy * 32
+                    w11 = fx * fy * 32
+
+                    for ch in range(3):
+                        s = 0
+                        if 0 <= y0 < img_h:
+                            if 0 <= x0 < img_w:
+                                s += w00 * np.int64(img[y0, x0, ch])
+                            if 0 <= x0 + 1 < img_w:
+                                s += w01 * np.int64(img[y0, x0 + 1, ch])
+                        if 0 <= y0 + 1 < img_h:
+                            if 0 <= x0 < img_w:
+                                s += w10 * np.int64(img[y0 + 1, x0, ch])
+                            if 0 <= x0 + 1 < img_w:
+                                s += w11 * np.int64(img[y0 + 1, x0 + 1, ch])
+
+                        sample = (s + (1 << (COEF_BITS - 1))) >> COEF_BITS
+                        if sample > 255:
+                            sample = 255
+                        term = np.float32(sample) * w
+                        if ch == 0:
+                            acc0 += term
+                        elif ch == 1:
+                            acc1 += term
+                        else:
+                            acc2 += term
+
+                # Truncate like the float path's astype(np.uint8), saturating weights above 1
+                out[v, u, 0] = np.uint8(min(acc0, np.float32(255.0)))
+                out[v, u, 1] = np.uint8(min(acc1, np.float32(255.0)))
+                out[v, u, 2] = np.uint8(min(acc2, np.float32(255.0)))
+
+
+def prepare_luts(luts, cameras):
+    if not NUMBA_AVAILABLE:
+        raise ImportError(
+            "The fused compositor needs Numba. Install it with: pip install numba"
+        )
+
+    # Camera-major stacks so each pixel's per-camera entries sit at a fixed stride
+    return {
+        "map_x": np.ascontiguousarray(
+            np.stack([luts[cam]["map_x"] for cam in cameras]), dtype=np.float32
+        ),
+        "map_y": np.ascontiguousarray(
+            np.stack([luts[cam]["map_y"] for cam in cameras]), dtype=np.float32
+        ),
+        "weight": np.ascontiguousarray(
+            np.stack([luts[cam]["weight"] for cam in cameras]), dtype=np.float32
+        ),
+    }
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas once; the fused kernel needs no scratch at all."""
+    _, height, width = prepared["weight"].shape
+    return np.empty((height, width, 3), dtype=np.uint8), {}
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    if out is None:
+        out, _ = allocate_buffers(prepared, cameras)
+
+    _fused_kernel(
+        tuple(np.ascontiguousarray(frames[cam]) for cam in cameras),
+        prepared["map_x"],
+        prepared["map_y"],
+        prepared["weight"],
+        out,
+    )
+    return out
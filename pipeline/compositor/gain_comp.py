@@ -0,0 +1,218 @@
+"""
+Module: gain_comp.py
+
+This module provides low-rate photometric gain compensation of the camera frames.
+
+Exposure and white-balance differences between cameras show up as visible seams in the
+overlap bands. Instead of comparing full warped frames every frame, the stitching stage stores
+a fixed subsample of overlap source coordinates per camera pair (overlap_samples). At run time
+GainCompensator reads only those source pixels, a few times per second, solves one gain per
+camera (Brown & Lowe: equalize the overlap means, with a prior pulling every gain towards 1) and
+folds the gains into the LUT weights by re-preparing the compositor on a background thread.
+Frames in between composite exactly as without compensation. Gains above 1 push weight totals
+past 1; the compositors then saturate bright pixels instead of wrapping (saturation.py).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pipeline.compositor import reduced_input, regions, topk
+
+# Only pixels where both cameras carry a real share of the blend are sampled
+OVERLAP_MIN_WEIGHT = 0.1
+
+# Solver noise terms: overlap intensity noise (gray levels) and gain prior (std around 1)
+SIGMA_NOISE = 10.0
+SIGMA_GAIN = 0.1
+
+# Samples with either side clipped say nothing about the exposure ratio
+SATURATED = 250
+
+
+def overlap_samples(maps, weights, cameras, samples_per_pair):
+    """
+    Fixed subsample of the overlap of every camera pair. maps holds each camera's full-frame
+    (map_x, map_y); returns arrays for np.savez: pairs (P, 2) camera indices, offsets (P + 1)
+    into the per-sample source coordinates src_x / src_y (2, S) of the pair's two cameras.
+    """
+    pairs, src_x, src_y, offsets = [], [], [], [0]
+    for a, cam_a in enumerate(cameras):
+        for b in range(a + 1, len(cameras)):
+            cam_b = cameras[b]
+            overlap = (weights[cam_a] >= OVERLAP_MIN_WEIGHT) & (
+                weights[cam_b] >= OVERLAP_MIN_WEIGHT
+            )
+            index = np.flatnonzero(overlap)
+            if index.size == 0:
+                continue
+            # Evenly spread over the band so one corner does not dominate
+            count = min(samples_per_pair, index.size)
+            index = index[np.linspace(0, index.size - 1, count).astype(np.int64)]
+            pairs.append((a, b))
+            src_x.append([maps[cam_a][0].ravel()[index], maps[cam_b][0].ravel()[index]])
+            src_y.append([maps[cam_a][1].ravel()[index], maps[cam_b][1].ravel()[index]])
+            offsets.append(offsets[-1] + count)
+    if not pairs:
+        raise ValueError("No camera pair overlaps, nothing to compensate")
+    return {
+        "pairs": np.array(pairs, dtype=np.int32),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "src_x": np.concatenate(src_x, axis=1).astype(np.float32),
+        "src_y": np.concatenate(src_y, axis=1).astype(np.float32),
+        "cameras": np.array(cameras),
+    }
+
+
+def prepare_samples(samples, cameras, scale=1):
+    """Integer source pixels of the stored samples for frames decoded at 1/scale."""
+    if list(samples["cameras"]) != list(cameras):
+        raise ValueError(
+            f"Gain samples were built for {list(samples['cameras'])}, not {cameras}"
+        )
+    src_x, src_y = samples["src_x"], samples["src_y"]
+    if scale != 1:
+        src_x = reduced_input.rescale_coords(src_x, scale)
+        src_y = reduced_input.rescale_coords(src_y, scale)
+    return {
+        "pairs": samples["pairs"],
+        "offsets": samples["offsets"],
+        "x": np.rint(src_x).astype(np.int32),
+        "y": np.rint(src_y).astype(np.int32),
+    }
+
+
+def overlap_means(frames, prepared, cameras):
+    """Mean gray level (P, 2) of each pair's samples in its two cameras, and the sample counts."""
+    gray = np.empty(prepared["x"].shape, dtype=np.float32)
+    for side in range(2):
+        cam_ids = np.repeat(prepared["pairs"][:, side], np.diff(prepared["offsets"]))
+        for c, cam in enumerate(cameras):
+            select = cam_ids == c
+            if not np.any(select):
+                continue
+            frame = frames[cam]
+            x = np.clip(prepared["x"][side, select], 0, frame.shape[1] - 1)
+            y = np.clip(prepared["y"][side, select], 0, frame.shape[0] - 1)
+            gray[side, select] = frame[y, x].mean(axis=-1)
+
+    usable = (gray < SATURATED).all(axis=0)
+    offsets = prepared["offsets"]
+    means = np.zeros((len(offsets) - 1, 2), dtype=np.float64)
+    counts = np.add.reduceat(usable, offsets[:-1]).astype(np.float64)
+    for side in range(2):
+        sums = np.add.reduceat(np.where(usable, gray[side], 0.0), offsets[:-1])
+        means[:, side] = sums / np.maximum(counts, 1.0)
+    return means, counts
+
+
+def solve_gains(means, counts, pairs, num_cameras):
+    """Per-camera gains minimizing the overlap mismatch, regularized towards 1."""
+    A = np.zeros((num_cameras, num_cameras))
+    b = np.zeros(num_cameras)
+    for (i, j), (mean_i, mean_j), n in zip(pairs, means, counts):
+        A[i, i] += n * (mean_i**2 / SIGMA_NOISE**2 + 1.0 / SIGMA_GAIN**2)
+        A[j, j] += n * (mean_j**2 / SIGMA_NOISE**2 + 1.0 / SIGMA_GAIN**2)
+        A[i, j] -= n * mean_i * mean_j / SIGMA_NOISE**2
+        A[j, i] -= n * mean_i * mean_j / SIGMA_NOISE**2
+        b[i] += n / SIGMA_GAIN**2
+        b[j] += n / SIGMA_GAIN**2
+    # Cameras without a usable overlap keep unit gain
+    A += np.eye(num_cameras) * 1e-6
+    b += 1e-6
+    return np.linalg.solve(A, b)
+
+
+def overlap_error(means, counts, pairs, gains):
+    """Sample-weighted mean absolute gray-level mismatch of the overlaps under gains."""
+    diff = np.abs(gains[pairs[:, 0]] * means[:, 0] - gains[pairs[:, 1]] * means[:, 1])
+    return float((diff * counts).sum() / max(counts.sum(), 1.0))
+
+
+def scale_luts(luts, prepare_kwargs, cameras, gains):
+    """
+    Copies of the LUTs (and of a combined top-K LUT) with every camera's weights times its gain.
+    A region partition is rebuilt from the scaled weights, so exclusive regions whose gain is
+    not exactly 1 are blended (multiplied) instead of copied.
+    """
+    scaled = {
+        cam: {**lut, "weight": (lut["weight"] * gains[cameras.index(cam)]).astype(np.float32)}
+        for cam, lut in luts.items()
+    }
+    scaled_kwargs = dict(prepare_kwargs)
+    if "topk_lut" in prepare_kwargs:
+        table = prepare_kwargs["topk_lut"]
+        slot_gains = np.append(gains, 0.0).astype(np.float32)
+        cam_ids = np.where(table["cam_ids"] == topk.NO_CAMERA, len(gains), table["cam_ids"])
+        scaled_kwargs["topk_lut"] = {**table, "weight": table["weight"] * slot_gains[cam_ids]}
+    if "partition" in prepare_kwargs:
+        scaled_kwargs["partition"] = regions.partition_regions(
+            {cam: scaled[cam]["weight"] for cam in cameras}, cameras
+        )
+    return scaled, scaled_kwargs
+
+
+class GainCompensator:
+    """
+    Rate-limited gain estimation with background compositor rebuilds.
+
+    update(frames, now) returns the backend to composite with. At most `rate` times per second
+    it measures the overlaps of the (full, uncropped) frames, moves the gains `smoothing` of
+    the way to the new solution, and once they drift more than `tolerance` from the applied
+    ones, calls prepare(gains) on a worker thread; the finished backend replaces the current
+    one at a later update and the superseded one goes to release(backend).
+    """
+
+    def __init__(self, samples, cameras, backend, prepare, release=None, rate=2.0,
+                 smoothing=0.5, tolerance=0.005, scale=1):
+        self.samples = prepare_samples(samples, cameras, scale)
+        self.cameras = cameras
+        self.backend = backend
+        self.prepare = prepare
+        self.release = release
+        self.period = 1.0 / rate
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.gains = np.ones(len(cameras))
+        self.applied = np.ones(len(cameras))
+        self.last = None
+        self.pending = None
+        self.stats = {"updates": 0, "rebuilds": 0, "error_before": None, "error_after": None}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gain-comp")
+
+    def _swap(self):
+        old, self.backend = self.backend, self.pending.result()
+        self.pending = None
+        if self.release is not None:
+            self.release(old)
+
+    def update(self, frames, now):
+        if self.pending is not None and self.pending.done():
+            self._swap()
+        if self.last is not None and now - self.last < self.period:
+            return self.backend
+        self.last = now
+
+        pairs = self.samples["pairs"]
+        means, counts = overlap_means(frames, self.samples, self.cameras)
+        solved = solve_gains(means, counts, pairs, len(self.cameras))
+        self.gains += self.smoothing * (solved - self.gains)
+        self.stats["updates"] += 1
+        if self.stats["error_before"] is None:
+            self.stats["error_before"] = overlap_error(means, counts, pairs, np.ones_like(solved))
+
+        # Applied gains keep a mean of 1 so the overall brightness does not drift; totals above 1
+        # saturate in the compositors
+        target = self.gains / self.gains.mean()
+        if self.pending is None and np.abs(target - self.applied).max() > self.tolerance:
+            self.applied = target
+            self.pending = self.executor.submit(self.prepare, self.applied)
+            self.stats["rebuilds"] += 1
+        self.stats["error_after"] = overlap_error(means, counts, pairs, self.applied)
+        return self.backend
+
+    def close(self):
+        """Finish a pending rebuild and switch to it; the caller releases self.backend."""
+        self.executor.shutdown(wait=True)
+        if self.pending is not None:
+            self._swap()
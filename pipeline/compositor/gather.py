@@ -0,0 +1,99 @@
+"""
+Module: gather.py
+
+This module provides a pure NumPy gather compositor.
+
+For every covered output pixel the LUT is reduced to one flat source pixel index
+(nearest sample), so a frame is composited with np.take on whole BGR pixels followed by a
+weighted scatter into the canvas, with no cv2.remap call at all. Depending on the CPU's
+gather throughput and cache size this can beat remap on small outputs.
+"""
+
+import numpy as np
+
+from pipeline.compositor import saturation
+from pipeline.compositor.sparse_lut import pack_sparse_lut
+
+
+def prepare_luts(luts, cameras):
+    prepared = {}
+    for cam in cameras:
+        lut = luts[cam]
+        if "index" not in lut:
+            lut = pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"])
+
+        # Source frames are only known at run time, so keep the rounded coordinates and
+        # fold them into flat indices lazily once the frame width is seen.
+        prepared[cam] = {
+            "shape": tuple(int(s) for s in lut["shape"]),
+            # Native index width, so the per-frame take / scatter skip an index conversion
+            "index": lut["index"].astype(np.intp),
+            "src_x": np.rint(lut["map_x"]).astype(np.int32),
+            "src_y": np.rint(lut["map_y"]).astype(np.int32),
+            "src_index": None,
+            "src_shape": None,
+            "weight": np.repeat(lut["weight"][:, np.newaxis], 3, axis=1),
+        }
+    prepared["clamp"] = saturation.needs_clamp(saturation.weight_total(luts, cameras))
+    return prepared
+
+
+def _source_index(lut, frame):
+    height, width = frame.shape[:2]
+    if lut["src_shape"] != (height, width):
+        src_x = np.clip(lut["src_x"], 0, width - 1)
+        src_y = np.clip(lut["src_y"], 0, height - 1)
+        lut["src_index"] = (src_y * width + src_x).astype(np.intp)
+        lut["src_shape"] = (height, width)
+    return lut["src_index"]
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared[cameras[0]]["shape"]
+    count = max(prepared[cam]["index"].size for cam in cameras)
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch = {
+        "acc": np.empty((height * width, 3), dtype=np.float32),
+        "sampled": np.empty((count, 3), dtype=np.uint8),
+        "contrib": np.empty((count, 3), dtype=np.float32),
+        "gathered": np.empty((count, 3), dtype=np.float32),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    height, width = prepared[cameras[0]]["shape"]
+    bev = scratch["acc"]
+    bev.fill(0)
+    bev_px = bev.view(np.dtype((np.void, bev.itemsize * 3))).reshape(-1)
+    src_pixel = np.dtype((np.void, 3))
+
+    for cam in cameras:
+        lut = prepared[cam]
+        count = lut["index"].size
+        if count == 0:
+            continue
+
+        frame = np.ascontiguousarray(frames[cam])
+        src_index = _source_index(lut, frame)
+
+        # Gather whole BGR pixels as opaque 3-byte items; mode="clip" writes straight into
+        # out (indices are in range by construction)
+        sampled = scratch["sampled"][:count]
+        frame_px = frame.view(src_pixel).reshape(-1)
+        np.take(frame_px, src_index, out=sampled.view(src_pixel).reshape(-1), mode="clip")
+
+        contrib = np.multiply(sampled, lut["weight"], out=scratch["contrib"][:count])
+        gathered = scratch["gathered"][:count]
+        contrib += np.take(bev, lut["index"], axis=0, out=gathered, mode="clip")
+        bev_px[lut["index"]] = contrib.view(bev_px.dtype).reshape(-1)
+
+    if prepared["clamp"]:
+        np.minimum(bev, 255, out=bev)
+    np.copyto(out, bev.reshape(height, width, 3), casting="unsafe")
+    return out
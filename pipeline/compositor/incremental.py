@@ -0,0 +1,206 @@
+"""
+Module: incremental.py
+
+This module provides a dirty-tile incremental LUT compositor for mostly static scenes
+(parked vehicle, sentry / surveillance mode).
+
+The canvas is split into square tiles and every tile is mapped back through the LUTs to its
+source footprint: the set of downsampled cells it reads in each camera. Per frame, each
+camera is shrunk to a thumbnail (decimated, then 2x2 averaged) and compared against a
+reference thumbnail; only tiles whose footprint touches a changed cell are remapped and
+blended again, the rest keep their pixels from the previous frame. The reference only
+advances in cells that were flagged, so slow drift still accumulates until it crosses the
+threshold instead of being missed forever. Changes confined to a few pixels can be averaged
+below the threshold by the downsampling; lower threshold / downsample trade CPU for
+sensitivity.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+# The caller's output buffer is the persistent canvas (clean tiles keep last frame's pixels),
+# so UI overlays go on a copy (backends.overlay_canvas)
+KEEPS_CANVAS = True
+
+
+def prepare_luts(luts, cameras, tile_size=50, downsample=8, threshold=8):
+    height, width = luts[cameras[0]]["map_x"].shape
+    tiles_y = -(-height // tile_size)
+    tiles_x = -(-width // tile_size)
+
+    tiles = []
+    for ty in range(tiles_y):
+        for tx in range(tiles_x):
+            y0, y1 = ty * tile_size, min((ty + 1) * tile_size, height)
+            x0, x1 = tx * tile_size, min((tx + 1) * tile_size, width)
+            tile_cams = []
+            for cam in cameras:
+                weight = luts[cam]["weight"][y0:y1, x0:x1]
+                # Cameras with no weight anywhere in the tile are skipped entirely
+                if not np.any(weight > 0):
+                    continue
+                tile_cams.append(
+                    (
+                        cam,
+                        np.ascontiguousarray(luts[cam]["map_x"][y0:y1, x0:x1], dtype=np.float32),
+                        np.ascontiguousarray(luts[cam]["map_y"][y0:y1, x0:x1], dtype=np.float32),
+                        np.stack([weight] * 3, axis=-1).astype(np.float32),
+                    )
+                )
+            tiles.append((y0, y1, x0, x1, tile_cams))
+
+    # Output tile index of every canvas pixel, used to map footprints back to tiles
+    rows = np.arange(height)[:, np.newaxis] // tile_size
+    cols = np.arange(width)[np.newaxis, :] // tile_size
+    tile_index = (rows * tiles_x + cols).astype(np.int32)
+
+    return {
+        "shape": (height, width),
+        "tiles": tiles,
+        "tile_index": tile_index,
+        "clamp": saturation.needs_clamp(saturation.weight_total(luts, cameras)),
+        "luts": {
+            cam: (luts[cam]["map_x"], luts[cam]["map_y"], luts[cam]["weight"])
+            for cam in cameras
+        },
+        "downsample": downsample,
+        "threshold": threshold,
+        # Footprints depend on the camera resolution and are built on the first frame
+        "frame_shapes": None,
+        "footprint_tiles": None,
+        "footprint_cells": None,
+        "references": None,
+        "canvas": None,
+        "last_out": None,
+        "dirty_tiles": 0,
+        "frames": 0,
+    }
+
+
+def _grid_shape(frame_shape, downsample):
+    return -(-frame_shape[0] // downsample), -(-frame_shape[1] // downsample)
+
+
+def _build_footprints(prepared, cameras, frame_shapes):
+    downsample = prepared["downsample"]
+    tile_index = prepared["tile_index"]
+
+    keys = []
+    cell_offset = 0
+    for cam in cameras:
+        map_x, map_y, weight = prepared["luts"][cam]
+        grid_h, grid_w = _grid_shape(frame_shapes[cam], downsample)
+        valid = weight > 0
+        tiles = tile_index[valid].astype(np.int64)
+        src_x = np.floor(map_x[valid]).astype(np.int64)
+        src_y = np.floor(map_y[valid]).astype(np.int64)
+
+        # Bilinear sampling reads the 2x2 neighbourhood, whose taps may straddle a cell border
+        for dx in (0, 1):
+            for dy in (0, 1):
+                cx = np.clip((src_x + dx) // downsample, 0, grid_w - 1)
+                cy = np.clip((src_y + dy) // downsample, 0, grid_h - 1)
+                cells = cell_offset + cy * grid_w + cx
+                keys.append(tiles << 32 | cells)
+        cell_offset += grid_h * grid_w
+
+    keys = np.unique(np.concatenate(keys))
+    prepared["footprint_tiles"] = (keys >> 32).astype(np.int32)
+    prepared["footprint_cells"] = (keys & 0xFFFFFFFF).astype(np.int32)
+    prepared["frame_shapes"] = frame_shapes
+
+
+def _thumbnail(frame, downsample):
+    grid_h, grid_w = _grid_shape(frame.shape, downsample)
+    # Decimate to half the cell size, then average 2x2: four samples per cell cost a
+    # fraction of a full INTER_AREA pass and still catch anything larger than the stride
+    step = max(downsample // 2, 1)
+    sampled = cv2.resize(
+        frame,
+        (-(-frame.shape[1] // step), -(-frame.shape[0] // step)),
+        interpolation=cv2.INTER_NEAREST,
+    )
+    return cv2.resize(sampled, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+
+
+def _detect_dirty_tiles(frames, prepared, cameras):
+    downsample = prepared["downsample"]
+    changed = []
+    for cam in cameras:
+        thumb = _thumbnail(frames[cam], downsample)
+        reference = prepared["references"][cam]
+        diff = cv2.absdiff(thumb, reference)
+        # Channel-wise maximum (ndarray.max over a length-3 axis is far slower here)
+        diff = np.maximum(np.maximum(diff[..., 0], diff[..., 1]), diff[..., 2])
+        cam_changed = diff > prepared["threshold"]
+        reference[cam_changed] = thumb[cam_changed]
+        changed.append(cam_changed.ravel())
+
+    hit = np.concatenate(changed)[prepared["footprint_cells"]]
+    dirty = np.zeros(len(prepared["tiles"]), dtype=bool)
+    dirty[prepared["footprint_tiles"][hit]] = True
+    return np.flatnonzero(dirty)
+
+
+def _composite_tile(frames, tile, out, clamp):
+    y0, y1, x0, x1, tile_cams = tile
+    acc = np.zeros((y1 - y0, x1 - x0, 3), dtype=np.float32)
+    for cam, map_x, map_y, weight in tile_cams:
+        warped = cv2.remap(
+            frames[cam],
+            map_x,
+            map_y,
+            cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+        acc += warped.astype(np.float32) * weight
+    if clamp:
+        np.minimum(acc, 255, out=acc)
+    out[y0:y1, x0:x1] = acc
+
+
+def allocate_buffers(prepared, cameras):
+    # The output doubles as the persistent canvas: clean tiles keep last frame's pixels
+    height, width = prepared["shape"]
+    return np.zeros((height, width, 3), dtype=np.uint8), None
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without a caller buffer the canvas lives in prepared and a copy is handed out,
+    # so frames kept in flight are not modified by later updates
+    hand_out_copy = out is None
+    if out is None:
+        if prepared["canvas"] is None:
+            prepared["canvas"], _ = allocate_buffers(prepared, cameras)
+        out = prepared["canvas"]
+
+    frame_shapes = {cam: frames[cam].shape for cam in cameras}
+    if prepared["frame_shapes"] != frame_shapes:
+        _build_footprints(prepared, cameras, frame_shapes)
+        prepared["last_out"] = None
+
+    if prepared["last_out"] is not out:
+        # New canvas or camera resolution: composite everything and restart the references
+        prepared["references"] = {
+            cam: _thumbnail(frames[cam], prepared["downsample"]) for cam in cameras
+        }
+        dirty = np.arange(len(prepared["tiles"]))
+        prepared["last_out"] = out
+    else:
+        dirty = _detect_dirty_tiles(frames, prepared, cameras)
+
+    for t in dirty:
+        _composite_tile(frames, prepared["tiles"][t], out, prepared["clamp"])
+    prepared["dirty_tiles"] += len(dirty)
+    prepared["frames"] += 1
+
+    return out.copy() if hand_out_copy else out
+
+
+def dirty_report(prepared):
+    """Return (mean dirty tiles per frame, total tiles) over all frames composited so far."""
+    frames = max(prepared["frames"], 1)
+    return prepared["dirty_tiles"] / frames, len(prepared["tiles"])
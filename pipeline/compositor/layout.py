@@ -0,0 +1,139 @@
+"""
+Module: layout.py
+
+This module provides the display layout compiler.
+
+A head unit does not show the BEV canvas alone but a screen layout: the BEV in one panel, a
+dewarped view of a selected camera in another, borders in between. Instead of remapping every
+view separately and copying the results into the framebuffer, compile_layout() folds the whole
+screen into one display-resolution LUT per camera (map_x, map_y, weight, src_crop), the same
+format the stitching stage writes. Any compositor backend then renders the complete screen in
+a single composite pass. Pixels outside every panel get no weight and stay black.
+
+Panels are dicts with a "view" and a screen "rect" (x, y, width, height):
+    {"view": "bev", "rect": ...}                                   the 2D BEV canvas, scaled
+    {"view": "camera", "camera": "Cam_Front", "fov": 100, "rect": ...}  dewarped pinhole view
+Camera panels also take the yaw / pitch of a virtual_view.py pane.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import source_crop, virtual_view
+
+VIEWS = ("bev", "camera")
+
+
+def check_layout(panels, display_size):
+    """Validate panel rects against the screen and each other."""
+    width, height = display_size
+    covered = np.zeros((height, width), dtype=bool)
+    for panel in panels:
+        if panel.get("view") not in VIEWS:
+            raise ValueError(f"Unknown panel view '{panel.get('view')}', expected one of {VIEWS}")
+        x, y, w, h = panel["rect"]
+        if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > width or y + h > height:
+            raise ValueError(f"Panel rect {panel['rect']} does not fit a {width}x{height} display")
+        if covered[y : y + h, x : x + w].any():
+            raise ValueError(f"Panel rect {panel['rect']} overlaps another panel")
+        covered[y : y + h, x : x + w] = True
+
+
+def _resample(array, size, interpolation):
+    # Sample the canvas at the panel's pixel centres (cv2.resize keeps centres aligned)
+    return cv2.resize(array, size, interpolation=interpolation)
+
+
+def bev_panel(luts, size):
+    """
+    Scale the BEV LUTs of all cameras to a panel of size (width, height):
+    {camera: (map_x, map_y, weight)} with coordinates in full-frame pixels (the stored
+    source crop origin is added back).
+    """
+    views = {}
+    for cam, lut in luts.items():
+        map_x = np.asarray(lut["map_x"], dtype=np.float32)
+        map_y = np.asarray(lut["map_y"], dtype=np.float32)
+        if "src_crop" in lut:
+            map_x = map_x + np.float32(lut["src_crop"][2])
+            map_y = map_y + np.float32(lut["src_crop"][0])
+        views[cam] = (map_x, map_y, np.asarray(lut["weight"], dtype=np.float32))
+    if all((view[0].shape[1], view[0].shape[0]) == size for view in views.values()):
+        return views
+
+    resampled = {}
+    total = np.zeros(size[::-1], dtype=np.float32)
+    kept = np.zeros(size[::-1], dtype=np.float32)
+    for cam, (map_x, map_y, weight) in views.items():
+        # Coordinates of uncovered pixels are meaningless, so blending them into a covered
+        # neighbour would sample far off the footprint: drop pixels with any uncovered tap
+        covered = _resample((weight > 0).astype(np.float32), size, cv2.INTER_LINEAR)
+        weight = _resample(weight, size, cv2.INTER_LINEAR)
+        total += weight
+        weight = np.where(covered > 0.999, weight, 0.0).astype(np.float32)
+        kept += weight
+        resampled[cam] = (
+            _resample(map_x, size, cv2.INTER_LINEAR),
+            _resample(map_y, size, cv2.INTER_LINEAR),
+            weight,
+        )
+
+    # Hand the dropped share back to the cameras kept at each pixel, so seams stay seamless
+    scale = np.divide(total, kept, out=np.zeros_like(total), where=kept > 0)
+    return {
+        cam: (map_x, map_y, weight * scale) for cam, (map_x, map_y, weight) in resampled.items()
+    }
+
+
+def camera_panel(K, D, frame_shape, size, panel):
+    """
+    Dewarped pinhole view of a fisheye camera as a full-frame LUT of size (width, height);
+    the panel's fov / yaw / pitch follow virtual_view.py.
+    """
+    map_x, map_y = virtual_view.pane_maps(K, D, size, panel)
+    frame_h, frame_w = frame_shape[:2]
+    valid = (map_x >= 0) & (map_x < frame_w - 1) & (map_y >= 0) & (map_y < frame_h - 1)
+    return map_x, map_y, valid.astype(np.float32)
+
+
+def compile_layout(panels, display_size, cameras, bev_luts, K, D, frame_shapes):
+    """
+    Build the display LUT set of a screen layout: {camera: {map_x, map_y, weight, src_crop}}
+    at display_size (width, height), with coordinates relative to each camera's new crop.
+    """
+    check_layout(panels, display_size)
+    width, height = display_size
+
+    display = {}
+    for cam in cameras:
+        # Unused screen pixels point at -1, outside every frame, with no weight
+        display[cam] = {
+            "map_x": np.full((height, width), -1.0, dtype=np.float32),
+            "map_y": np.full((height, width), -1.0, dtype=np.float32),
+            "weight": np.zeros((height, width), dtype=np.float32),
+        }
+
+    for panel in panels:
+        x, y, w, h = panel["rect"]
+        if panel["view"] == "bev":
+            views = bev_panel({cam: bev_luts[cam] for cam in cameras if cam in bev_luts}, (w, h))
+        else:
+            cam = panel["camera"]
+            if cam not in cameras:
+                raise ValueError(f"Camera panel references unknown camera '{cam}'")
+            views = {
+                cam: camera_panel(K, D, frame_shapes[cam], (w, h), {"fov": 100.0, **panel})
+            }
+        for cam, (map_x, map_y, weight) in views.items():
+            display[cam]["map_x"][y : y + h, x : x + w] = map_x
+            display[cam]["map_y"][y : y + h, x : x + w] = map_y
+            display[cam]["weight"][y : y + h, x : x + w] = weight
+
+    for cam, lut in display.items():
+        lut["src_crop"] = source_crop.footprint_crop(
+            lut["map_x"], lut["map_y"], lut["weight"], frame_shapes[cam]
+        )
+        lut["map_x"], lut["map_y"] = source_crop.offset_maps(
+            lut["map_x"], lut["map_y"], lut["src_crop"]
+        )
+    return display
@@ -0,0 +1,117 @@
+"""
+Module: lut_pyramid.py
+
+This module provides the multi-resolution LUT pyramid of the BEV and bowl targets.
+
+The stitching stage writes its LUT set at BEV_WIDTH x BEV_HEIGHT into luts/ as before and, for
+every other width in LUT_PYRAMID_LEVELS, the same ground area sampled at that width into
+luts/level_<width>/ (same file names and formats). A renderer picks the level matching its
+output target at runtime with select_level(), so a thumbnail or cluster display composites a
+small table instead of paying the full-resolution cost and then downscaling. Levels are
+projected from the stored calibration; nothing is recalibrated.
+"""
+
+import os
+
+import numpy as np
+
+from pipeline.compositor import projection, regions, source_crop, sparse_lut, topk
+
+LEVEL_DIR = "level_{}"
+
+
+def level_shape(level, base_size):
+    """(width, height) of a level of the given width, keeping the base aspect ratio."""
+    base_width, base_height = base_size
+    return level, int(round(level * base_height / float(base_width)))
+
+
+def level_dir(luts_dir, level, base_width):
+    """Directory holding a level's LUT set (the base level stays in luts_dir itself)."""
+    if level == base_width:
+        return luts_dir
+    return os.path.join(luts_dir, LEVEL_DIR.format(level))
+
+
+def available_levels(luts_dir, base_width):
+    """Sorted widths of the levels present on disk, the base level included."""
+    levels = {base_width}
+    if os.path.isdir(luts_dir):
+        for name in os.listdir(luts_dir):
+            prefix, _, width = name.partition("_")
+            if prefix == "level" and width.isdigit() and os.listdir(os.path.join(luts_dir, name)):
+                levels.add(int(width))
+    return sorted(levels)
+
+
+def select_level(levels, target_width):
+    """Smallest level at least target_width wide (the largest level for bigger targets)."""
+    for level in sorted(levels):
+        if level >= target_width:
+            return level
+    return max(levels)
+
+
+def level_grid(level, base_size, x_range, y_range):
+    """Ground coordinates (X, Y) of a level's pixels, with the base grid's conventions."""
+    width, height = level_shape(level, base_size)
+    pixels_per_meter = width / float(y_range[1] - y_range[0])
+    u, v = np.meshgrid(np.arange(width), np.arange(height))
+    # In automotive standard (X forward, Y left): row 0 is the far front, column 0 the far left
+    return x_range[1] - (v / pixels_per_meter), y_range[1] - (u / pixels_per_meter)
+
+
+def build_level_luts(points, cameras, calibration, K, D, frame_shapes, mask_radius_scale,
+                     valid=None, weight_gain=None):
+    """
+    Project a level's grid points (height, width, 3) into the cameras with the stitching
+    stage's feathering: {camera: {map_x, map_y, weight, src_crop}}, weights pre-divided and
+    zeroed outside valid. weight_gain(map_x, map_y), if given, scales the pre-divided weights
+    (vignetting correction).
+    """
+    height, width = points.shape[:2]
+
+    maps = {}
+    total = np.zeros((height, width), dtype=np.float32)
+    for cam in cameras:
+        rvec, tvec = calibration[cam]
+        map_x, map_y, z_cam = projection.project_grid(points, rvec, tvec, K, D)
+        weight = projection.feather_weight(
+            map_x, map_y, z_cam, frame_shapes[cam], mask_radius_scale
+        )
+        total += weight
+        maps[cam] = (map_x, map_y, weight)
+
+    safe_total = np.maximum(total, 1e-6)
+    luts = {}
+    for cam, (map_x, map_y, weight) in maps.items():
+        norm_weight = weight / safe_total
+        norm_weight[weight == 0] = 0.0
+        if valid is not None:
+            norm_weight[~valid] = 0.0
+        if weight_gain is not None:
+            norm_weight *= weight_gain(map_x, map_y)
+        src_crop = source_crop.footprint_crop(map_x, map_y, norm_weight, frame_shapes[cam])
+        crop_x, crop_y = source_crop.offset_maps(map_x, map_y, src_crop)
+        luts[cam] = {"map_x": crop_x, "map_y": crop_y, "weight": norm_weight, "src_crop": src_crop}
+    return luts
+
+
+def save_level(directory, prefix, luts, cameras, k):
+    """Write a level's LUT set like the stitching stage: dense, sparse, regions and top-K."""
+    os.makedirs(directory, exist_ok=True)
+    for cam in cameras:
+        lut = luts[cam]
+        np.savez_compressed(os.path.join(directory, f"{prefix}{cam}.npz"), **lut)
+        np.savez_compressed(
+            os.path.join(directory, f"{prefix}{cam}_sparse.npz"),
+            **sparse_lut.pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"]),
+            src_crop=lut["src_crop"],
+        )
+    np.savez_compressed(
+        os.path.join(directory, f"{prefix}regions.npz"),
+        **regions.partition_regions({cam: luts[cam]["weight"] for cam in cameras}, cameras),
+    )
+    np.savez_compressed(
+        os.path.join(directory, f"{prefix}topk.npz"), **topk.build_topk_lut(luts, cameras, k=k)
+    )
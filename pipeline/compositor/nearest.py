@@ -0,0 +1,78 @@
+"""
+Module: nearest.py
+
+This module provides a nearest-neighbour LUT compositor.
+
+Maps are rounded to integer source pixels (cv2.convertMaps with nearest interpolation, a
+single CV_16SC2 map) and weights reuse the Q8 integers of the fixed-point engine. Skipping
+bilinear filtering trades a few grey levels of accuracy for the cheapest possible remap,
+which is why the autotuner only picks it when AUTOTUNE_MAX_ERROR allows.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+from pipeline.compositor.fixed_point import quantize_weights, weight_bits
+
+
+def prepare_luts(luts, cameras):
+    total = saturation.weight_total(luts, cameras)
+    bits = weight_bits(float(total.max()))
+    q_weights = quantize_weights({cam: luts[cam]["weight"] for cam in cameras}, bits)
+
+    prepared = {}
+    for cam in cameras:
+        map1, _ = cv2.convertMaps(
+            luts[cam]["map_x"],
+            luts[cam]["map_y"],
+            cv2.CV_16SC2,
+            nninterpolation=True,
+        )
+        prepared[cam] = {
+            "map1": map1,
+            "weight": np.ascontiguousarray(np.stack([q_weights[cam]] * 3, axis=-1)),
+        }
+    prepared["bits"] = bits
+    prepared["clamp"] = saturation.needs_clamp(total)
+    return prepared
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared[cameras[0]]["map1"].shape[:2]
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch = {
+        "acc": np.empty((height, width, 3), dtype=np.uint16),
+        "term": np.empty((height, width, 3), dtype=np.uint16),
+        "warped": np.empty((height, width, 3), dtype=np.uint8),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    acc = scratch["acc"]
+    acc.fill(0)
+
+    for cam in cameras:
+        lut = prepared[cam]
+        warped = cv2.remap(
+            frames[cam],
+            lut["map1"],
+            None,
+            cv2.INTER_NEAREST,
+            dst=scratch["warped"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+        np.multiply(warped, lut["weight"], out=scratch["term"])
+        acc += scratch["term"]
+
+    np.right_shift(acc, prepared["bits"], out=acc)
+    if prepared["clamp"]:
+        np.minimum(acc, 255, out=acc)
+    np.copyto(out, acc, casting="unsafe")
+    return out
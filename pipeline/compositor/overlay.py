@@ -0,0 +1,213 @@
+"""
+Module: overlay.py
+
+This module provides the cached UI overlay layer of the BEV and bowl renderers.
+
+Overlays (the car icon, steering-dependent parking guidelines) are pre-rendered once into
+sprites: a canvas rectangle [y0, y1, x0, x1] with its colour and alpha, cropped to what was
+drawn. A frame only alpha-blends its sprites inside their rectangles, so overlay cost scales
+with the sprite area instead of the canvas. Guidelines are pre-rendered for every quantized
+steering angle (GUIDELINE_STEER_STEP) and the frame picks the bin of the current angle.
+Sprites drawn without anti-aliasing take an exact masked-copy path.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import yuv
+
+# Sprite rectangles snap to 2 px so they map onto whole NV12 chroma samples
+SPRITE_ALIGN = 2
+
+# Guideline colours (BGR) of the first, second and further meters behind the bumper
+GUIDELINE_COLORS = ((0, 0, 255), (0, 255, 255), (0, 255, 0))
+GUIDELINE_THICKNESS = 3
+
+# Sub-pixel precision of the guideline polylines (cv2 shift bits)
+DRAW_SHIFT = 4
+
+
+def make_sprite(rect, pixels, alpha):
+    """
+    Sprite of a canvas rectangle from its colour (h, w[, c]) and uint8 alpha (h, w).
+
+    Fully opaque-or-transparent sprites keep a boolean mask for a plain masked copy; the others
+    keep the premultiplied colour (scaled by 255, rounding bias included) and the inverse alpha
+    as uint16, so blending is one multiply-add per pixel, plus a uint16 scratch buffer the
+    blend reuses every frame (a sprite is drawn by one thread at a time).
+    """
+    pixels = np.ascontiguousarray(pixels)
+    shape = alpha.shape + (1,) * (pixels.ndim - 2)
+    sprite = {"rect": tuple(int(v) for v in rect), "pixels": pixels, "alpha": alpha}
+    if np.all((alpha == 0) | (alpha == 255)):
+        sprite["mask"] = (alpha == 255).reshape(shape)
+    else:
+        weight = alpha.astype(np.uint16).reshape(shape)
+        sprite["scaled"] = pixels.astype(np.uint16) * weight + 127
+        sprite["inverse"] = 255 - weight
+        sprite["blend"] = np.empty(pixels.shape, dtype=np.uint16)
+    return sprite
+
+
+def crop_sprite(image, alpha):
+    """Crop a canvas-sized premultiplied drawing and its alpha to a sprite (None if empty)."""
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if rows.size == 0:
+        return None
+    height, width = alpha.shape
+    y0 = rows[0] // SPRITE_ALIGN * SPRITE_ALIGN
+    x0 = cols[0] // SPRITE_ALIGN * SPRITE_ALIGN
+    y1 = min(-(-(rows[-1] + 1) // SPRITE_ALIGN) * SPRITE_ALIGN, height)
+    x1 = min(-(-(cols[-1] + 1) // SPRITE_ALIGN) * SPRITE_ALIGN, width)
+
+    drawn = image[y0:y1, x0:x1].astype(np.uint16)
+    weight = alpha[y0:y1, x0:x1]
+    # Back from premultiplied (drawn over black) to plain colour
+    safe = np.maximum(weight, 1).astype(np.uint16)[..., None]
+    pixels = np.minimum((drawn * 255 + safe // 2) // safe, 255).astype(np.uint8)
+    pixels[weight == 0] = 0
+    return make_sprite((y0, y1, x0, x1), pixels, weight)
+
+
+def to_nv12(sprite, canvas_height):
+    """Split a BGR sprite into the luma and chroma sprites of an NV12 canvas."""
+    y0, y1, x0, x1 = sprite["rect"]
+    alpha = sprite["alpha"]
+    planes = yuv.from_bgr(sprite["pixels"], "nv12")
+    height, width = alpha.shape
+    chroma_alpha = alpha.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3))
+    if "mask" in sprite:
+        # Any covered pixel claims its chroma sample, like yuv.nv12_mask()
+        chroma_alpha = np.where(chroma_alpha > 0, 255, 0)
+    chroma_alpha = np.repeat(np.round(chroma_alpha).astype(np.uint8), 2, axis=1)
+    chroma_rect = (canvas_height + y0 // 2, canvas_height + y1 // 2, x0, x1)
+    return [
+        make_sprite(sprite["rect"], planes[:height], alpha),
+        make_sprite(chroma_rect, planes[height:], chroma_alpha),
+    ]
+
+
+def draw_sprites(canvas, sprites):
+    """Alpha-blend sprites into a canvas in place (BGR, BGRA or a single-plane NV12 canvas)."""
+    for sprite in sprites:
+        y0, y1, x0, x1 = sprite["rect"]
+        roi = canvas[y0:y1, x0:x1]
+        if sprite["pixels"].ndim == 3:
+            # Leave the alpha channel of a BGRA canvas alone
+            roi = roi[..., : sprite["pixels"].shape[2]]
+        if "mask" in sprite:
+            np.copyto(roi, sprite["pixels"], where=sprite["mask"])
+        else:
+            blended = np.multiply(roi, sprite["inverse"], out=sprite["blend"])
+            blended += sprite["scaled"]
+            blended //= 255
+            np.copyto(roi, blended, casting="unsafe")
+    return canvas
+
+
+def sprite_area(sprites):
+    """Canvas pixels covered by the sprite rectangles."""
+    return sum((y1 - y0) * (x1 - x0) for y0, y1, x0, x1 in (s["rect"] for s in sprites))
+
+
+def car_sprite(canvas_size, pixels_per_meter, car_length, car_width):
+    """Car icon centred on the canvas: filled body, white outline and a FRONT label."""
+    width, height = canvas_size
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    car_top = int(height / 2 - (car_length / 2.0) * pixels_per_meter)
+    car_bot = int(height / 2 + (car_length / 2.0) * pixels_per_meter)
+    car_left = int(width / 2 - (car_width / 2.0) * pixels_per_meter)
+    car_right = int(width / 2 + (car_width / 2.0) * pixels_per_meter)
+
+    cv2.rectangle(image, (car_left, car_top), (car_right, car_bot), (30, 30, 30), -1)
+    cv2.rectangle(image, (car_left, car_top), (car_right, car_bot), (255, 255, 255), 3)
+    cv2.putText(
+        image,
+        "FRONT",
+        (int(width / 2 - 40), car_top + 40),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.8,
+        (255, 255, 255),
+        2,
+    )
+    alpha = np.where(image.any(axis=-1), 255, 0).astype(np.uint8)
+    return crop_sprite(image, alpha)
+
+
+def steer_bins(max_steer, step):
+    """Steering angles (degrees) that get a pre-rendered guideline sprite."""
+    count = int(round(max_steer / step))
+    return [round(i * step, 6) for i in range(-count, count + 1)]
+
+
+def quantize_steer(angle, max_steer, step):
+    """Steering bin of a road-wheel angle in degrees (positive = left)."""
+    return round(round(float(np.clip(angle, -max_steer, max_steer)) / step) * step, 6)
+
+
+def reverse_path(steer, wheelbase, rear_axle_x, body_points, length, step=0.05):
+    """
+    Ground positions (len(body_points), N, 2) in meters, automotive frame (X forward, Y left),
+    swept by body points (X, Y) while reversing `length` meters at a fixed steering angle
+    (bicycle model around the rear axle).
+    """
+    curvature = np.tan(np.radians(steer)) / wheelbase
+    travel = -np.arange(0.0, length + step / 2, step)
+    heading = curvature * travel
+    if abs(curvature) < 1e-9:
+        axle = np.stack((travel, np.zeros_like(travel)), axis=-1)
+    else:
+        axle = np.stack(
+            (np.sin(heading) / curvature, (1.0 - np.cos(heading)) / curvature), axis=-1
+        )
+    axle[:, 0] += rear_axle_x
+    cos, sin = np.cos(heading), np.sin(heading)
+    paths = []
+    for x, y in body_points:
+        dx = x - rear_axle_x
+        paths.append(axle + np.stack((cos * dx - sin * y, sin * dx + cos * y), axis=-1))
+    return np.array(paths)
+
+
+def guideline_sprite(steer, canvas_size, pixels_per_meter, car_length, car_width, wheelbase,
+                     rear_overhang, length):
+    """
+    Reversing guidelines for one steering angle: the tracks of the rear bumper corners,
+    coloured per meter, with a cross bar at every meter.
+    """
+    width, height = canvas_size
+    rear_axle_x = -car_length / 2.0 + rear_overhang
+    corners = ((-car_length / 2.0, car_width / 2.0), (-car_length / 2.0, -car_width / 2.0))
+    step = 0.05
+    paths = reverse_path(steer, wheelbase, rear_axle_x, corners, length, step)
+
+    # Ground meters to canvas pixels (canvas centre = vehicle origin, front up, left on the left)
+    u = width / 2.0 - paths[..., 1] * pixels_per_meter
+    v = height / 2.0 - paths[..., 0] * pixels_per_meter
+    points = np.round(np.stack((u, v), axis=-1) * (1 << DRAW_SHIFT)).astype(np.int32)
+
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    per_meter = int(round(1.0 / step))
+    meters = int(np.ceil(length - 1e-6))
+    for meter in range(meters):
+        color = GUIDELINE_COLORS[min(meter, len(GUIDELINE_COLORS) - 1)]
+        segment = points[:, meter * per_meter : (meter + 1) * per_meter + 1]
+        bar = points[:, min((meter + 1) * per_meter, points.shape[1] - 1)]
+        for target, value in ((image, color), (alpha, 255)):
+            cv2.polylines(
+                target, list(segment), False, value, GUIDELINE_THICKNESS, cv2.LINE_AA, DRAW_SHIFT
+            )
+            cv2.line(
+                target, tuple(bar[0]), tuple(bar[1]), value, GUIDELINE_THICKNESS, cv2.LINE_AA,
+                DRAW_SHIFT,
+            )
+    return crop_sprite(image, alpha)
+
+
+def guideline_sprites(max_steer, steer_step, *args):
+    """Pre-render the guideline sprite of every steering bin: {angle: sprite}."""
+    return {
+        angle: guideline_sprite(angle, *args) for angle in steer_bins(max_steer, steer_step)
+    }
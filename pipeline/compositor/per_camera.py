@@ -0,0 +1,171 @@
+"""
+Module: per_camera.py
+
+This module provides a per-camera asynchronous compositor for cameras that are not
+hardware-synchronized.
+
+Every camera keeps its weighted contribution cached in the sparse (covered pixels only)
+layout. When a single camera delivers a frame, only that camera is remapped, and only the
+canvas pixels where it has nonzero weight are re-summed from the cached contributions of
+all cameras covering them, in camera order, so the result stays bit-exact with the float
+path. Display latency is therefore bounded by the freshest camera instead of waiting for
+the slowest one, and staleness() reports how old each camera's contribution is.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import sparse_lut
+
+# The caller's output buffer is the persistent canvas (cameras without a new frame keep their
+# pixels), so UI overlays go on a copy (backends.overlay_canvas)
+KEEPS_CANVAS = True
+
+
+def prepare_luts(luts, cameras):
+    packed = sparse_lut.prepare_luts(luts, cameras)
+    sparse = packed["cameras"]
+    height, width = packed["shape"]
+
+    # For every camera: which cached contributions land inside its support, and where.
+    # The list follows camera order so re-summing reproduces the reference accumulation.
+    overlaps = {}
+    for cam in cameras:
+        overlaps[cam] = []
+        for other in cameras:
+            _, pos_cam, pos_other = np.intersect1d(
+                sparse[cam]["index"],
+                sparse[other]["index"],
+                assume_unique=True,
+                return_indices=True,
+            )
+            if pos_cam.size:
+                overlaps[cam].append((other, pos_cam, pos_other))
+
+    return {
+        "shape": (height, width),
+        "clamp": packed["clamp"],
+        "luts": sparse,
+        "pixels": {cam: np.divmod(sparse[cam]["index"], width) for cam in cameras},
+        "overlaps": overlaps,
+        "contrib": {
+            cam: np.zeros((sparse[cam]["count"], 3), dtype=np.float32) for cam in cameras
+        },
+        "timestamps": {cam: None for cam in cameras},
+        "updates": {cam: 0 for cam in cameras},
+        "canvas": None,
+        "scratch": None,
+    }
+
+
+def allocate_buffers(prepared, cameras):
+    # The output doubles as the persistent canvas other cameras' pixels are kept in
+    height, width = prepared["shape"]
+    luts = prepared["luts"]
+    count = max(luts[cam]["count"] for cam in cameras)
+    overlap = max(
+        (pos_cam.size for cam in cameras for _, pos_cam, _ in prepared["overlaps"][cam]),
+        default=0,
+    )
+    scratch = {
+        "warped": np.empty(
+            (max(luts[cam]["map_x"].shape[0] for cam in cameras), sparse_lut.PACK_WIDTH, 3),
+            dtype=np.uint8,
+        ),
+        "acc": np.empty((count, 3), dtype=np.float32),
+        "result": np.empty((count, 3), dtype=np.uint8),
+        "summed": np.empty((overlap, 3), dtype=np.float32),
+        "other": np.empty((overlap, 3), dtype=np.float32),
+    }
+    return np.zeros((height, width, 3), dtype=np.uint8), scratch
+
+
+def _pixels(array):
+    # View each BGR triplet as one opaque item so gather / scatter move whole pixels
+    return array.view(np.dtype((np.void, array.itemsize * 3))).reshape(-1)
+
+
+def update(prepared, cam, frame, out, timestamp=None, scratch=None):
+    """
+    Fold a newly arrived frame of one camera into the canvas out (in place).
+    timestamp defaults to time.perf_counter() and feeds staleness(); scratch comes from
+    allocate_buffers() (fresh allocations without it).
+    """
+    if scratch is None:
+        _, scratch = allocate_buffers(prepared, list(prepared["luts"]))
+
+    lut = prepared["luts"][cam]
+    count = lut["count"]
+    if count:
+        warped = cv2.remap(
+            frame,
+            lut["map_x"],
+            lut["map_y"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"][: lut["map_x"].shape[0]],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        ).reshape(-1, 3)[:count]
+        np.multiply(warped, lut["weight"], out=prepared["contrib"][cam])
+
+        acc = scratch["acc"][:count]
+        acc.fill(0)
+        acc_px = _pixels(acc)
+        for other, pos_cam, pos_other in prepared["overlaps"][cam]:
+            if other == cam:
+                acc += prepared["contrib"][cam]
+                continue
+            # mode="clip" writes straight into out (indices are in range by construction)
+            summed = np.take(
+                acc, pos_cam, axis=0, out=scratch["summed"][: pos_cam.size], mode="clip"
+            )
+            summed += np.take(
+                prepared["contrib"][other],
+                pos_other,
+                axis=0,
+                out=scratch["other"][: pos_other.size],
+                mode="clip",
+            )
+            acc_px[pos_cam] = _pixels(summed)
+
+        if prepared["clamp"]:
+            np.minimum(acc, 255, out=acc)
+        result = scratch["result"][:count]
+        np.copyto(result, acc, casting="unsafe")
+        if out.flags.c_contiguous:
+            _pixels(out.reshape(-1, 3))[lut["index"]] = _pixels(result)
+        else:
+            # e.g. the BGR channels of a BGRA frame
+            rows, cols = prepared["pixels"][cam]
+            out[rows, cols] = result
+
+    prepared["timestamps"][cam] = time.perf_counter() if timestamp is None else timestamp
+    prepared["updates"][cam] += 1
+    return out
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Only the cameras present in frames are refreshed, the others keep their cached
+    # contribution. Without a caller buffer a copy of the internal canvas is handed out.
+    hand_out_copy = out is None
+    if out is None:
+        if prepared["canvas"] is None:
+            prepared["canvas"], prepared["scratch"] = allocate_buffers(prepared, cameras)
+        out, scratch = prepared["canvas"], prepared["scratch"]
+
+    for cam in cameras:
+        if cam in frames:
+            update(prepared, cam, frames[cam], out, scratch=scratch)
+
+    return out.copy() if hand_out_copy else out
+
+
+def staleness(prepared, now=None):
+    """Return seconds since each camera last updated the canvas (inf if it never did)."""
+    now = time.perf_counter() if now is None else now
+    return {
+        cam: float("inf") if stamp is None else now - stamp
+        for cam, stamp in prepared["timestamps"].items()
+    }
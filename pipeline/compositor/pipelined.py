@@ -0,0 +1,101 @@
+"""
+Module: pipelined.py
+
+This module provides a staged, double-buffered render loop.
+
+Frame acquisition/decode, LUT compositing and output/encode each run on their own
+thread, connected by bounded queues. While frame N is being composited, frame N+1 is
+already decoding and frame N-1 is being encoded, so sustained throughput approaches the
+slowest stage instead of the sum of all three. The queue depth bounds how many frames
+can be in flight (2 = classic double buffering) and therefore the worst-case latency.
+"""
+
+import queue
+import threading
+import time
+
+# Marks the end of the stream (or an upstream failure) as it flows down the queues
+_STOP = object()
+
+
+def run_pipeline(acquire, composite, emit, num_frames, queue_depth=2):
+    """
+    Run num_frames through acquire(i) -> composite(frames) -> emit(i, image).
+
+    Returns a dict with the per-frame end-to-end latency (acquire start to emit end) and
+    the per-stage busy time, all in seconds, plus the total wall time.
+    """
+    decoded = queue.Queue(maxsize=queue_depth)
+    composed = queue.Queue(maxsize=queue_depth)
+    errors = []
+
+    stats = {
+        "latency": [0.0] * num_frames,
+        "acquire": [0.0] * num_frames,
+        "composite": [0.0] * num_frames,
+        "emit": [0.0] * num_frames,
+    }
+
+    def acquire_stage():
+        try:
+            for i in range(num_frames):
+                t0 = time.perf_counter()
+                frames = acquire(i)
+                stats["acquire"][i] = time.perf_counter() - t0
+                decoded.put((i, t0, frames))
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            decoded.put(_STOP)
+
+    def composite_stage():
+        try:
+            while True:
+                item = decoded.get()
+                if item is _STOP:
+                    break
+                i, t0, frames = item
+                start = time.perf_counter()
+                image = composite(frames)
+                stats["composite"][i] = time.perf_counter() - start
+                composed.put((i, t0, image))
+        except BaseException as exc:
+            errors.append(exc)
+            # Drain upstream so the acquire thread can never block forever on a full queue
+            while decoded.get() is not _STOP:
+                pass
+        finally:
+            composed.put(_STOP)
+
+    def emit_stage():
+        try:
+            while True:
+                item = composed.get()
+                if item is _STOP:
+                    break
+                i, t0, image = item
+                start = time.perf_counter()
+                emit(i, image)
+                end = time.perf_counter()
+                stats["emit"][i] = end - start
+                stats["latency"][i] = end - t0
+        except BaseException as exc:
+            errors.append(exc)
+            while composed.get() is not _STOP:
+                pass
+
+    threads = [
+        threading.Thread(target=stage, name=f"svm-{stage.__name__}", daemon=True)
+        for stage in (acquire_stage, composite_stage, emit_stage)
+    ]
+
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats["wall"] = time.perf_counter() - wall_start
+
+    if errors:
+        raise errors[0]
+    return stats
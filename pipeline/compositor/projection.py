@@ -0,0 +1,118 @@
+"""
+Module: projection.py
+
+This module provides the projection of world points into the fisheye cameras shared by every
+LUT generator.
+
+The stitching scripts (BEV, bowl, panorama), the LUT pyramid, the zoomed ROI views and the
+free-view renderer all sample the cameras the same way: world points projected with the
+calibrated fisheye model, culled behind the lens and off the sensor, and weighted with the same
+radial feathering before the weights are pre-divided into a LUT set (map_x, map_y, weight,
+src_crop).
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import source_crop
+
+
+def project_grid(points, rvec, tvec, K, D):
+    """
+    Project a stitching grid of world points (height, width, 3) into one camera:
+    (map_x, map_y, z_cam), each (height, width). Shared by the stitching scripts and the
+    LUT pyramid so every level samples the cameras exactly like the base level.
+    """
+    height, width = points.shape[:2]
+    pts_3d = points.reshape(-1, 1, 3).astype(np.float32)
+
+    # Camera-frame depth, to cull points behind the lens
+    rot, _ = cv2.Rodrigues(rvec)
+    z_cam = (rot @ pts_3d.reshape(-1, 3).T + tvec)[2].reshape(height, width)
+
+    pts_2d, _ = cv2.fisheye.projectPoints(pts_3d, rvec, tvec, K, D)
+    pts_2d = pts_2d.reshape(height, width, 2)
+    return pts_2d[..., 0].astype(np.float32), pts_2d[..., 1].astype(np.float32), z_cam
+
+
+def valid_mask(map_x, map_y, z_cam, frame_shape):
+    """Samples in front of the lens whose bilinear footprint lies on the sensor."""
+    img_h, img_w = frame_shape[:2]
+    return (
+        (z_cam > 0)
+        & (map_x >= 0)
+        & (map_x < img_w - 1)
+        & (map_y >= 0)
+        & (map_y < img_h - 1)
+    )
+
+
+def feather_weight(map_x, map_y, z_cam, frame_shape, mask_radius_scale):
+    """Radial feathering of the stitching stage: 1 at the image centre, 0 at the mask edge."""
+    img_h, img_w = frame_shape[:2]
+    max_radius = (min(img_w, img_h) / 2.0) * mask_radius_scale
+    radial_dist = np.sqrt((map_x - img_w / 2.0) ** 2 + (map_y - img_h / 2.0) ** 2) / max_radius
+    weight = np.clip(1.0 - radial_dist**2, 0.0, 1.0)
+    return (weight * valid_mask(map_x, map_y, z_cam, frame_shape)).astype(np.float32)
+
+
+def project_points(points, cameras, calibration, K, D, frame_shapes, mask_radius_scale=1.0):
+    """
+    Project world points (N, 3) into the cameras with the stitching stage's feathering:
+    {camera: (map_x, map_y, weight)}. calibration maps each camera to its (rvec, tvec).
+    """
+    views = {}
+    for cam in cameras:
+        rvec, tvec = calibration[cam]
+        rot, _ = cv2.Rodrigues(rvec)
+        z_cam = points @ rot[2] + float(np.ravel(tvec)[2])
+        # Points behind the lens get no weight, so skip projecting them
+        front = np.flatnonzero(z_cam > 0)
+        map_x = np.full(len(points), -1.0, dtype=np.float32)
+        map_y = np.full(len(points), -1.0, dtype=np.float32)
+        if front.size:
+            pts_2d, _ = cv2.fisheye.projectPoints(
+                np.ascontiguousarray(points[front], dtype=np.float64).reshape(-1, 1, 3),
+                rvec,
+                tvec,
+                K,
+                D,
+            )
+            map_x[front] = pts_2d[:, 0, 0]
+            map_y[front] = pts_2d[:, 0, 1]
+        weight = feather_weight(map_x, map_y, z_cam, frame_shapes[cam], mask_radius_scale)
+        views[cam] = (map_x, map_y, weight)
+    return views
+
+
+def blend_luts(views, size, frame_shapes, index=None):
+    """
+    Turn projected points into per-camera LUTs of size (width, height) with pre-divided weights
+    and src_crop. index places the points in the flattened output (default: every pixel).
+    """
+    width, height = size
+    total = sum(weight for _, _, weight in views.values())
+    # Pre-divide the weights, as the stitching stage does
+    safe_total = np.maximum(total, 1e-6)
+    luts = {}
+    for cam, (map_x, map_y, weight) in views.items():
+        lut = {
+            # Pixels without a point get -1, outside every frame, with no weight
+            "map_x": np.full(height * width, -1.0, dtype=np.float32),
+            "map_y": np.full(height * width, -1.0, dtype=np.float32),
+            "weight": np.zeros(height * width, dtype=np.float32),
+        }
+        target = slice(None) if index is None else index
+        lut["map_x"][target] = map_x
+        lut["map_y"][target] = map_y
+        lut["weight"][target] = np.where(weight > 0, weight / safe_total, 0.0)
+        lut = {key: value.reshape(height, width) for key, value in lut.items()}
+
+        lut["src_crop"] = source_crop.footprint_crop(
+            lut["map_x"], lut["map_y"], lut["weight"], frame_shapes[cam]
+        )
+        lut["map_x"], lut["map_y"] = source_crop.offset_maps(
+            lut["map_x"], lut["map_y"], lut["src_crop"]
+        )
+        luts[cam] = lut
+    return luts
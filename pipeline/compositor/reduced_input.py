@@ -0,0 +1,81 @@
+"""
+Module: reduced_input.py
+
+This module provides the reduced-resolution input mode of the real-time render loops.
+
+Camera frames are decoded at 1/2, 1/4 or 1/8 scale (cv2.IMREAD_REDUCED_COLOR_*, or a V4L2
+downscale on a real device) and the stored full-resolution LUTs are rescaled once at load
+time to match, so decode, frame memory and remap bandwidth shrink with the square of the
+scale. quality_report() quantifies what that costs against full-resolution input.
+"""
+
+import cv2
+import numpy as np
+
+IMREAD_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def check_scale(scale):
+    if scale not in IMREAD_FLAGS:
+        raise ValueError(f"Unsupported input scale {scale}, expected one of {list(IMREAD_FLAGS)}")
+
+
+def read_frame(path, scale=1):
+    """Decode a camera frame at 1/scale resolution."""
+    check_scale(scale)
+    return cv2.imread(path, IMREAD_FLAGS[scale])
+
+
+def rescale_coords(coords, scale):
+    # Pixel centres stay aligned: full-res x maps to (x + 0.5) / scale - 0.5 when downscaled
+    return ((coords + 0.5) / scale - 0.5).astype(np.float32)
+
+
+def rescale_lut(lut, scale):
+    """Return a copy of a LUT (dense, sparse or top-K) whose source coordinates match 1/scale frames."""
+    check_scale(scale)
+    if scale == 1:
+        return lut
+    rescaled = dict(lut)
+    rescaled["map_x"] = rescale_coords(lut["map_x"], scale)
+    rescaled["map_y"] = rescale_coords(lut["map_y"], scale)
+    # Source crops (see source_crop.py) start on multiples of the scale, so crop-relative
+    # coordinates rescale with the same formula; only the box itself shrinks
+    for key in ("src_crop", "src_crops"):
+        if key in lut:
+            # [y0, y1, x0, x1]: round starts down and ends up
+            crop = np.array(lut[key], dtype=np.int32)
+            crop[..., 0::2] //= scale
+            crop[..., 1::2] = -(-crop[..., 1::2] // scale)
+            rescaled[key] = crop
+    return rescaled
+
+
+def rescale_luts(luts, prepare_kwargs, scale):
+    """
+    Rescale the per-camera LUTs and every combined table in prepare_kwargs that carries
+    source coordinates (e.g. the top-K LUT); partitions and other tables pass through.
+    """
+    luts = {cam: rescale_lut(lut, scale) for cam, lut in luts.items()}
+    prepare_kwargs = {
+        key: rescale_lut(value, scale)
+        if isinstance(value, dict) and "map_x" in value
+        else value
+        for key, value in prepare_kwargs.items()
+    }
+    return luts, prepare_kwargs
+
+
+def quality_report(reference, reduced, valid=None):
+    """Mean / max absolute error and PSNR (dB) of a reduced-input render against full resolution."""
+    diff = np.abs(reduced.astype(np.float32) - reference.astype(np.float32))
+    if valid is not None:
+        diff = diff[valid]
+    mse = float(np.mean(diff**2))
+    psnr = float("inf") if mse == 0 else 10.0 * np.log10(255.0**2 / mse)
+    return {"mean_error": float(diff.mean()), "max_error": float(diff.max()), "psnr": psnr}
@@ -0,0 +1,205 @@
+"""
+Module: regions.py
+
+This module provides the region-partitioned LUT compositor.
+
+The LUT stage labels every output pixel with the set of cameras contributing to it.
+Pixels seen by exactly one camera at full weight form that camera's exclusive region and
+are filled with a straight remap-copy. Pixels seen by one camera at any other weight (a
+feathered edge without a partner, or a weight scaled by gain or vignetting correction) are a
+single scaled copy with nothing to accumulate. Only the overlap bands (usually the four corner
+seams) go through the weighted multiply-add, so most of the canvas never touches float.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+from pipeline.compositor.sparse_lut import fold_packed
+
+
+def partition_regions(weights, cameras):
+    """Label each canvas pixel with a region id. Region 0 is always 'no camera'."""
+    stack = np.stack([weights[cam] for cam in cameras], axis=0)
+    contrib = stack > 0
+    num_cams = len(cameras)
+
+    # One bit per contributing camera
+    cam_bits = (contrib * (1 << np.arange(num_cams))[:, None, None]).sum(axis=0)
+    # Only a weight of exactly 1 is a plain copy; gain-scaled weights above 1 still multiply
+    exclusive = (contrib.sum(axis=0) == 1) & (stack.max(axis=0) == 1.0)
+
+    # Blend regions are offset past every exclusive key so a lone camera with a partial
+    # weight (feathered edge with no partner) still gets multiplied, not copied.
+    key = np.where(exclusive, cam_bits, cam_bits + (1 << num_cams))
+    key[cam_bits == 0] = 0
+
+    keys = np.union1d([0], np.unique(key))
+    labels = np.searchsorted(keys, key).astype(np.uint8 if keys.size <= 256 else np.uint16)
+
+    cam_mask = keys & ((1 << num_cams) - 1)
+    group_cams = ((cam_mask[:, None] >> np.arange(num_cams)) & 1).astype(bool)
+    group_copy = (keys > 0) & (keys < (1 << num_cams))
+
+    return {
+        "labels": labels,
+        "group_cams": group_cams,
+        "group_copy": group_copy,
+        "cameras": np.array(cameras),
+    }
+
+
+def region_shares(partition):
+    """Canvas shares of the (copy, scaled copy, blend) pixels of a partition."""
+    labels = partition["labels"]
+    lone = partition["group_cams"].sum(axis=1) == 1
+    copy_px = np.isin(labels, np.flatnonzero(partition["group_copy"])).mean()
+    scaled_px = np.isin(labels, np.flatnonzero(lone & ~partition["group_copy"])).mean()
+    return copy_px, scaled_px, (labels > 0).mean() - copy_px - scaled_px
+
+
+def prepare_luts(luts, cameras, partition=None):
+    if partition is None:
+        partition = partition_regions({cam: luts[cam]["weight"] for cam in cameras}, cameras)
+
+    if list(partition["cameras"]) != list(cameras):
+        raise ValueError(
+            f"Region partition was built for {list(partition['cameras'])}, not {cameras}"
+        )
+
+    labels = partition["labels"].ravel()
+    height, width = partition["labels"].shape
+
+    # Sort once so every region's indices come out grouped and ascending
+    order = np.argsort(labels, kind="stable").astype(np.int32)
+    bounds = np.searchsorted(labels[order], np.arange(len(partition["group_copy"]) + 1))
+
+    segments = {cam: [] for cam in cameras}
+    copy_regions = []
+    scaled_regions = []
+    blend_regions = []
+    for group, is_copy in enumerate(partition["group_copy"]):
+        index = order[bounds[group] : bounds[group + 1]]
+        if group == 0 or index.size == 0:
+            continue
+        # A lone camera needs no accumulator even when its weight is not exactly 1
+        lone = np.count_nonzero(partition["group_cams"][group]) == 1
+
+        parts = []
+        for c, cam in enumerate(cameras):
+            if not partition["group_cams"][group, c]:
+                continue
+            start = sum(seg.size for seg in segments[cam])
+            segments[cam].append(index)
+            seg = slice(start, start + index.size)
+            if is_copy:
+                copy_regions.append((cam, index, seg))
+                continue
+            weight = luts[cam]["weight"].ravel()[index].astype(np.float32)
+            weight = np.repeat(weight[:, np.newaxis], 3, axis=1)
+            if lone:
+                scaled_regions.append((cam, index, seg, weight))
+            else:
+                parts.append((cam, seg, weight))
+        if parts:
+            blend_regions.append((index, parts))
+
+    # One remap per camera covers its exclusive region and all its overlap bands
+    remaps = {}
+    for cam in cameras:
+        index = np.concatenate(segments[cam]) if segments[cam] else np.zeros(0, np.int32)
+        remaps[cam] = {
+            "map_x": fold_packed(luts[cam]["map_x"].ravel()[index], -1.0),
+            "map_y": fold_packed(luts[cam]["map_y"].ravel()[index], -1.0),
+            "count": index.size,
+        }
+
+    return {
+        "shape": (height, width),
+        "clamp": saturation.needs_clamp(saturation.weight_total(luts, cameras)),
+        # Never written by any region, cleared every frame since callers draw on the canvas
+        "uncovered": order[: bounds[1]],
+        "remaps": remaps,
+        "copy": copy_regions,
+        "scaled": scaled_regions,
+        "blend": blend_regions,
+    }
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared["shape"]
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    remaps = prepared["remaps"]
+    blend_size = max((index.size for index, _ in prepared["blend"]), default=0)
+    term_size = max([index.size for _, index, _, _ in prepared["scaled"]] + [blend_size])
+    scratch = {
+        # The whole-pixel scatters need a contiguous canvas; a strided out (the BGR channels
+        # of a BGRA frame) is filled from it at the end
+        "canvas": out,
+        "warped": {
+            cam: np.empty(remaps[cam]["map_x"].shape + (3,), dtype=np.uint8)
+            for cam in cameras
+            if remaps[cam]["count"]
+        },
+        "acc": np.empty((blend_size, 3), dtype=np.float32),
+        "term": np.empty((term_size, 3), dtype=np.float32),
+        "pixels": np.empty((term_size, 3), dtype=np.uint8),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    canvas = scratch["canvas"].reshape(-1, 3)
+    pixel = np.dtype((np.void, 3))
+    canvas_px = canvas.view(pixel).reshape(-1)
+    canvas[prepared["uncovered"]] = 0
+
+    warped = {}
+    for cam in cameras:
+        remap = prepared["remaps"][cam]
+        if remap["count"] == 0:
+            continue
+        warped[cam] = cv2.remap(
+            frames[cam],
+            remap["map_x"],
+            remap["map_y"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"][cam],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        ).reshape(-1, 3)[: remap["count"]]
+
+    # 1. Exclusive regions: weight is exactly 1.0, so the remapped pixel IS the output
+    for cam, index, seg in prepared["copy"]:
+        canvas_px[index] = warped[cam][seg].view(pixel).reshape(-1)
+
+    # 2. Lone-camera regions with a partial or gain-scaled weight: one multiply, no accumulate
+    for cam, index, seg, weight in prepared["scaled"]:
+        term = np.multiply(warped[cam][seg], weight, out=scratch["term"][: index.size])
+        if prepared["clamp"]:
+            np.minimum(term, 255, out=term)
+        pixels = scratch["pixels"][: index.size]
+        np.copyto(pixels, term, casting="unsafe")
+        canvas_px[index] = pixels.view(pixel).reshape(-1)
+
+    # 3. Overlap bands: weighted multiply-add, accumulated in camera order like the float path
+    for index, parts in prepared["blend"]:
+        acc = scratch["acc"][: index.size]
+        term = scratch["term"][: index.size]
+        acc.fill(0)
+        for cam, seg, weight in parts:
+            acc += np.multiply(warped[cam][seg], weight, out=term)
+        if prepared["clamp"]:
+            np.minimum(acc, 255, out=acc)
+        pixels = scratch["pixels"][: index.size]
+        np.copyto(pixels, acc, casting="unsafe")
+        canvas_px[index] = pixels.view(pixel).reshape(-1)
+
+    if scratch["canvas"] is not out:
+        np.copyto(out, scratch["canvas"])
+    return out
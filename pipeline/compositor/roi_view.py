@@ -0,0 +1,138 @@
+"""
+Module: roi_view.py
+
+This module provides on-demand zoomed ground views (ROI LUTs) for parking manoeuvres.
+
+A zoom request is a ground rectangle (x_min, x_max, y_min, y_max) in meters, automotive frame
+(X forward, Y left), and a density in pixels per meter, typically several times the global
+BEV's. Only that rectangle is projected, with the stitching stage's projection and feathering
+(projection.project_points / blend_luts), into a LUT set in the usual format; regenerating the
+whole BEV grid at the zoom density is never needed. RoiViews caches the results in a ViewCache
+(view_cache.py) keyed by (rectangle, density, calibration hash), LRU within a memory budget, so
+a repeated zoom is free and, once a recalibration is handed to RoiViews.recalibrate(), no stale
+table is served.
+"""
+
+import hashlib
+
+import numpy as np
+
+from pipeline.compositor import projection, view_cache
+
+# Request quantization: rectangles snap to 1 cm, densities to whole pixels per meter
+RECT_STEP = 0.01
+
+
+def calibration_hash(K, D, calibration):
+    """Short digest of the intrinsics and every camera's extrinsics."""
+    digest = hashlib.sha1()
+    for array in (K, D):
+        digest.update(np.asarray(array, dtype=np.float64).tobytes())
+    for cam in sorted(calibration):
+        digest.update(cam.encode())
+        for array in calibration[cam]:
+            digest.update(np.asarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def roi_size(rect, pixels_per_meter):
+    """(width, height) in pixels of a ground rectangle at a density."""
+    x_min, x_max, y_min, y_max = rect
+    if x_max <= x_min or y_max <= y_min or pixels_per_meter <= 0:
+        raise ValueError(f"Invalid zoom rectangle {rect} at {pixels_per_meter} px/m")
+    return (
+        int(round((y_max - y_min) * pixels_per_meter)),
+        int(round((x_max - x_min) * pixels_per_meter)),
+    )
+
+
+def build_roi_luts(rect, pixels_per_meter, cameras, calibration, K, D, frame_shapes,
+                   mask_radius_scale=1.0):
+    """
+    LUT set {camera: {map_x, map_y, weight, src_crop}} of a ground rectangle, oriented like the
+    BEV canvas (front up, left on the left).
+    """
+    x_min, x_max, y_min, y_max = rect
+    width, height = roi_size(rect, pixels_per_meter)
+    u, v = np.meshgrid(np.arange(width), np.arange(height))
+    points = np.stack(
+        (
+            (x_max - v / pixels_per_meter).ravel(),
+            (y_max - u / pixels_per_meter).ravel(),
+            np.zeros(width * height),
+        ),
+        axis=1,
+    )
+    views = projection.project_points(
+        points, cameras, calibration, K, D, frame_shapes, mask_radius_scale
+    )
+    return projection.blend_luts(views, (width, height), frame_shapes)
+
+
+class RoiViews:
+    """
+    Zoomed ground views built on first request and cached afterwards.
+
+    prepare(luts) turns a built LUT set into the cached value (e.g. a prepared compositor
+    backend, released with release(value) on eviction); by default the LUTs are cached as is.
+    After a recalibration, recalibrate() swaps in the new parameters: later requests are keyed
+    by the new calibration hash and built from it, and the tables of the old one are released.
+    """
+
+    def __init__(self, cameras, calibration, K, D, frame_shapes, mask_radius_scale=1.0,
+                 budget_mb=128, prepare=None, release=None):
+        self.cameras = cameras
+        self.frame_shapes = frame_shapes
+        self.mask_radius_scale = mask_radius_scale
+        self.prepare = prepare
+        # (calibration, K, D, digest), swapped as a whole so a request never mixes two of them
+        self.state = (calibration, K, D, calibration_hash(K, D, calibration))
+        self.cache = view_cache.ViewCache(
+            self._build, budget_mb, release=release, keep=1, quantize=self._quantize
+        )
+
+    @property
+    def digest(self):
+        return self.state[3]
+
+    def recalibrate(self, calibration, K=None, D=None):
+        """Use new extrinsics (and optionally intrinsics) for every later request."""
+        _, old_K, old_D, _ = self.state
+        K = old_K if K is None else K
+        D = old_D if D is None else D
+        digest = calibration_hash(K, D, calibration)
+        self.state = (calibration, K, D, digest)
+        self.cache.discard(lambda key: key[2] != digest)
+
+    def _quantize(self, request):
+        rect = tuple(round(round(v / RECT_STEP) * RECT_STEP, 6) for v in request["rect"])
+        pixels_per_meter = int(round(request["pixels_per_meter"]))
+        state = self.state
+        key = (rect, pixels_per_meter, state[3])
+        return key, {"rect": rect, "pixels_per_meter": pixels_per_meter, "state": state}
+
+    def _build(self, request):
+        # Built from the calibration the request was keyed with, even if it changed since
+        calibration, K, D, _ = request["state"]
+        luts = build_roi_luts(
+            request["rect"],
+            request["pixels_per_meter"],
+            self.cameras,
+            calibration,
+            K,
+            D,
+            self.frame_shapes,
+            self.mask_radius_scale,
+        )
+        return luts if self.prepare is None else self.prepare(luts)
+
+    def get(self, rect, pixels_per_meter):
+        """Cached value of a zoom request, built now on a miss."""
+        return self.cache.get({"rect": rect, "pixels_per_meter": pixels_per_meter})
+
+    def prefetch(self, rect, pixels_per_meter):
+        """Build a zoom in the background, e.g. as the car slows down for parking."""
+        self.cache.prefetch([{"rect": rect, "pixels_per_meter": pixels_per_meter}])
+
+    def close(self):
+        self.cache.close()
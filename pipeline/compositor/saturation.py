@@ -0,0 +1,35 @@
+"""
+Module: saturation.py
+
+This module provides the uint8 overflow guard of the compositors.
+
+Pre-normalized blend weights sum to at most 1 per pixel, so a compositor can cast its
+accumulator straight to uint8. Gain compensation (gain_comp.py) and vignetting correction
+(vignetting.py) scale weights above 1, and a bright sample would then wrap around to black.
+Compositors check the weight totals once when preparing (needs_clamp) and only then clamp the
+accumulator before the cast, so normalized LUTs keep their exact per-frame cost.
+"""
+
+import numpy as np
+
+# Below this total even a 255 sample stays under 256, so the plain cast cannot wrap
+WEIGHT_LIMIT = 256.0 / 255.0
+
+
+def weight_total(luts, cameras):
+    """Flat per-pixel total of the cameras' weights (dense or packed sparse LUTs)."""
+    total = None
+    for cam in cameras:
+        lut = luts[cam]
+        if "index" in lut:
+            height, width = (int(s) for s in lut["shape"])
+            weight = np.bincount(lut["index"], weights=lut["weight"], minlength=height * width)
+        else:
+            weight = lut["weight"].ravel().astype(np.float64)
+        total = weight if total is None else total + weight
+    return total
+
+
+def needs_clamp(total):
+    """Whether weight totals this large can push a uint8 sample past 255."""
+    return total is not None and total.size > 0 and float(total.max()) >= WEIGHT_LIMIT
@@ -0,0 +1,82 @@
+"""
+Module: source_crop.py
+
+This module provides source-footprint cropping of the camera frames.
+
+Every LUT only ever reads a bounded region of its fisheye frame (the black corners outside
+the image circle and the sky above the horizon are never sampled), so the stitching stage
+stores that bounding box with the LUT as src_crop = [y0, y1, x0, x1] and shifts the source
+coordinates to be relative to it. The renderers then remap (and the OpenGL viewer uploads)
+only the cropped view of each frame, shrinking copy, cache and upload bandwidth without
+changing a single output pixel. LUTs without src_crop keep working on full frames.
+"""
+
+import numpy as np
+
+# Crop edges snap to this many pixels: keeps rows aligned for SIMD / DMA, keeps 4:2:0 chroma
+# sites intact and stays an integer number of pixels at every reduced input scale
+CROP_ALIGN = 16
+
+
+def footprint_crop(map_x, map_y, weight, frame_shape, align=CROP_ALIGN):
+    """Return the aligned [y0, y1, x0, x1] source box read by all pixels with nonzero weight."""
+    frame_h, frame_w = frame_shape[:2]
+    valid = weight > 0
+    if not np.any(valid):
+        # Camera contributes nothing: keep one aligned block so remap still has a source
+        return np.array([0, min(align, frame_h), 0, min(align, frame_w)], dtype=np.int32)
+
+    # Bilinear sampling reads floor(x) and floor(x) + 1
+    x0 = int(np.floor(map_x[valid].min()))
+    y0 = int(np.floor(map_y[valid].min()))
+    x1 = int(np.floor(map_x[valid].max())) + 2
+    y1 = int(np.floor(map_y[valid].max())) + 2
+
+    x0 = max(x0, 0) // align * align
+    y0 = max(y0, 0) // align * align
+    x1 = min(-(-x1 // align) * align, frame_w)
+    y1 = min(-(-y1 // align) * align, frame_h)
+    return np.array([y0, y1, x0, x1], dtype=np.int32)
+
+
+def offset_maps(map_x, map_y, crop):
+    """
+    Shift source coordinates into the crop. The offsets are integers, so the fractional
+    part (and therefore every bilinear tap) is reproduced exactly.
+    """
+    y0, _, x0, _ = (int(v) for v in crop)
+    shifted_x = np.asarray(map_x, dtype=np.float32) - np.float32(x0)
+    shifted_y = np.asarray(map_y, dtype=np.float32) - np.float32(y0)
+    return shifted_x, shifted_y
+
+
+def crop_frame(frame, crop):
+    """Return the cropped view of a frame (no copy)."""
+    y0, y1, x0, x1 = (int(v) for v in crop)
+    return frame[y0:y1, x0:x1]
+
+
+def crop_fraction(crop, frame_shape):
+    """Share of the full frame's pixels that is kept."""
+    y0, y1, x0, x1 = (int(v) for v in crop)
+    return (y1 - y0) * (x1 - x0) / float(frame_shape[0] * frame_shape[1])
+
+
+def lut_crops(luts, prepare_kwargs, cameras):
+    """
+    Return {camera: src_crop} for the loaded tables (per-camera LUTs or a combined top-K
+    LUT in prepare_kwargs), or None when they predate source cropping.
+    """
+    for table in prepare_kwargs.values():
+        if isinstance(table, dict) and "src_crops" in table:
+            return dict(zip(cameras, table["src_crops"]))
+    if luts and all("src_crop" in luts.get(cam, {}) for cam in cameras):
+        return {cam: luts[cam]["src_crop"] for cam in cameras}
+    return None
+
+
+def crop_frames(frames, crops):
+    """Apply lut_crops() output to a frame set; None passes the full frames through."""
+    if crops is None:
+        return frames
+    return {cam: crop_frame(frame, crops[cam]) for cam, frame in frames.items()}
@@ -0,0 +1,188 @@
+"""
+Module: sparse_lut.py
+
+This module provides the sparse per-camera LUT format and its compositor.
+
+A sparse LUT only keeps the output pixels where the camera has a nonzero blend weight:
+a bounding box, the packed flat canvas indices of those pixels, and their packed
+map_x / map_y / weight values. Each frame only remaps and accumulates those pixels,
+so both the per-frame work and the resident LUT memory scale with camera coverage.
+
+The accumulator only spans the union of the camera bounding boxes. Every camera's pixels are
+split at preparation time into the ones no earlier camera covers, which are plainly scattered,
+and the overlap pixels, which are gathered, added and scattered back, so exclusive pixels
+never pay for an accumulate and the accumulator never needs clearing between frames.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+# cv2.remap refuses maps wider or taller than SHRT_MAX, so the packed coordinates are
+# folded into rows of this width before remapping.
+PACK_WIDTH = 1024
+
+
+def pack_sparse_lut(map_x, map_y, weight):
+    height, width = weight.shape
+    index = np.flatnonzero(weight > 0).astype(np.int32)
+
+    if index.size:
+        rows, cols = np.divmod(index, width)
+        bbox = np.array(
+            [rows.min(), rows.max() + 1, cols.min(), cols.max() + 1], dtype=np.int32
+        )
+    else:
+        bbox = np.zeros(4, dtype=np.int32)
+
+    return {
+        "shape": np.array([height, width], dtype=np.int32),
+        "bbox": bbox,  # y0, y1, x0, x1 (half-open) of the covered area
+        "index": index,  # Flat canvas indices, sorted for cache-friendly scatter
+        "map_x": map_x.ravel()[index].astype(np.float32),
+        "map_y": map_y.ravel()[index].astype(np.float32),
+        "weight": weight.ravel()[index].astype(np.float32),
+    }
+
+
+def fold_packed(values, fill):
+    rows = max(-(-values.size // PACK_WIDTH), 1)
+    folded = np.full(rows * PACK_WIDTH, fill, dtype=np.float32)
+    folded[: values.size] = values
+    return folded.reshape(rows, PACK_WIDTH)
+
+
+def union_bbox(boxes, shape):
+    """Smallest [y0, y1, x0, x1] holding every nonempty box (an empty box if there is none)."""
+    boxes = [box for box in boxes if box[1] > box[0] and box[3] > box[2]]
+    if not boxes:
+        return (0, 0, 0, 0)
+    boxes = np.array(boxes)
+    return (
+        int(boxes[:, 0].min()),
+        int(min(boxes[:, 1].max(), shape[0])),
+        int(boxes[:, 2].min()),
+        int(min(boxes[:, 3].max(), shape[1])),
+    )
+
+
+def prepare_luts(luts, cameras):
+    packed = {}
+    for cam in cameras:
+        lut = luts[cam]
+        if "index" not in lut:
+            # Dense LUT handed in, derive the sparse form on the fly
+            lut = pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"])
+        packed[cam] = lut
+
+    shape = tuple(int(s) for s in packed[cameras[0]]["shape"])
+    y0, y1, x0, x1 = union_bbox([tuple(packed[cam]["bbox"]) for cam in cameras], shape)
+    bbox_width = x1 - x0
+
+    prepared = {
+        "shape": shape,
+        "bbox": (y0, y1, x0, x1),
+        "clamp": saturation.needs_clamp(saturation.weight_total(packed, cameras)),
+        "cameras": {},
+    }
+    covered = np.zeros((y1 - y0) * bbox_width, dtype=bool)
+    for cam in cameras:
+        lut = packed[cam]
+        # Canvas indices re-based onto the accumulator box
+        rows, cols = np.divmod(lut["index"].astype(np.intp), shape[1])
+        local = (rows - y0) * bbox_width + (cols - x0)
+        first = ~covered[local]
+        covered[local] = True
+        # Pixels this camera writes first go ahead of the ones it adds to, so both are
+        # contiguous slices of the remapped samples
+        order = np.concatenate((np.flatnonzero(first), np.flatnonzero(~first)))
+
+        prepared["cameras"][cam] = {
+            "index": lut["index"][order],  # Canvas indices, as used by per_camera.py
+            "count": order.size,
+            "first": int(np.count_nonzero(first)),
+            "local_index": local[order],
+            # Padding samples land at (-1, -1) and are dropped again after the remap
+            "map_x": fold_packed(lut["map_x"][order], -1.0),
+            "map_y": fold_packed(lut["map_y"][order], -1.0),
+            "weight": np.repeat(lut["weight"][order, np.newaxis], 3, axis=1),
+        }
+    return prepared
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared["shape"]
+    y0, y1, x0, x1 = prepared["bbox"]
+    luts = [prepared["cameras"][cam] for cam in cameras]
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    scratch = {
+        # Pixels no camera covers are never written, so the accumulator is cleared only here
+        "acc": np.zeros(((y1 - y0) * (x1 - x0), 3), dtype=np.float32),
+        "warped": np.empty(
+            (max(lut["map_x"].shape[0] for lut in luts), PACK_WIDTH, 3), dtype=np.uint8
+        ),
+        "term": np.empty((max(lut["count"] for lut in luts), 3), dtype=np.float32),
+        "gathered": np.empty(
+            (max(lut["count"] - lut["first"] for lut in luts), 3), dtype=np.float32
+        ),
+    }
+    return out, scratch
+
+
+def pixels(array):
+    """View each BGR float triplet as one opaque 12-byte item for whole-pixel gather/scatter."""
+    return array.view(np.dtype((np.void, array.itemsize * 3))).reshape(-1)
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    y0, y1, x0, x1 = prepared["bbox"]
+    acc = scratch["acc"]
+    acc_px = pixels(acc)
+
+    for cam in cameras:
+        lut = prepared["cameras"][cam]
+        count, first = lut["count"], lut["first"]
+        if count == 0:
+            continue
+
+        warped = cv2.remap(
+            frames[cam],
+            lut["map_x"],
+            lut["map_y"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"][: lut["map_x"].shape[0]],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        ).reshape(-1, 3)[:count]
+
+        term = scratch["term"][:count]
+        np.multiply(warped, lut["weight"], out=term)
+
+        # First writers store their term, the others accumulate onto it; pixels are unique
+        # per camera, so a gather / add / scatter is an exact accumulate
+        acc_px[lut["local_index"][:first]] = pixels(term[:first])
+        if first < count:
+            overlap_index = lut["local_index"][first:]
+            gathered = scratch["gathered"][: count - first]
+            # mode="clip" writes straight into out (indices are in range by construction)
+            np.take(acc, overlap_index, axis=0, out=gathered, mode="clip")
+            gathered += term[first:]
+            acc_px[overlap_index] = pixels(gathered)
+
+    # Weights above 1 saturate instead of wrapping; every covered pixel is rewritten next frame
+    if prepared["clamp"]:
+        np.minimum(acc, 255, out=acc)
+
+    # Outside the box nothing is covered; caller-provided canvases start uninitialized
+    out[:y0] = 0
+    out[y1:] = 0
+    out[y0:y1, :x0] = 0
+    out[y0:y1, x1:] = 0
+    np.copyto(out[y0:y1, x0:x1], acc.reshape(y1 - y0, x1 - x0, 3), casting="unsafe")
+    return out
@@ -0,0 +1,163 @@
+"""
+Module: tiled.py
+
+This module provides a tile-parallel LUT compositor.
+
+The output canvas is split into horizontal tiles, and each tile's remap + blend is
+dispatched to a thread pool. cv2.remap and the NumPy multiply-adds release the GIL, so
+the tiles genuinely run in parallel. Per-tile wall time is recorded every frame so load
+imbalance between tiles (e.g. empty sky rows vs. dense overlap rows) is easy to spot.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+# OpenCV's thread count is process-wide, while tiled backends may overlap (a gain-compensation
+# rebuild, view cache entries). The first live backend saves the setting and forces 1, the last
+# one released restores it.
+_cv2_threads = {"lock": threading.Lock(), "users": 0, "saved": None}
+
+
+def _pin_worker(cpus, counter):
+    # Linux applies sched_setaffinity(0, ...) to the calling thread only, so each
+    # worker grabs the next CPU from the list in round-robin order.
+    with counter["lock"]:
+        cpu = cpus[counter["next"] % len(cpus)]
+        counter["next"] += 1
+    os.sched_setaffinity(0, {cpu})
+
+
+def prepare_luts(luts, cameras, num_tiles=16, workers=4, cpu_affinity=None):
+    height, width = luts[cameras[0]]["map_x"].shape
+    num_tiles = max(1, min(num_tiles, height))
+    edges = np.linspace(0, height, num_tiles + 1).astype(int)
+
+    tiles = []
+    for y0, y1 in zip(edges[:-1], edges[1:]):
+        tile_cams = []
+        for cam in cameras:
+            weight = luts[cam]["weight"][y0:y1]
+            # Cameras with no weight anywhere in the tile are skipped entirely
+            if not np.any(weight > 0):
+                continue
+            tile_cams.append(
+                (
+                    cam,
+                    luts[cam]["map_x"][y0:y1],
+                    luts[cam]["map_y"][y0:y1],
+                    np.stack([weight] * 3, axis=-1).astype(np.float32),
+                )
+            )
+        tiles.append((y0, y1, tile_cams))
+
+    # Our own threads already saturate the cores; nested OpenCV threading only adds contention.
+    # The previous setting is restored once the last tiled backend is shut down.
+    with _cv2_threads["lock"]:
+        if _cv2_threads["users"] == 0:
+            _cv2_threads["saved"] = cv2.getNumThreads()
+            cv2.setNumThreads(1)
+        _cv2_threads["users"] += 1
+
+    initializer, initargs = None, ()
+    if cpu_affinity and hasattr(os, "sched_setaffinity"):
+        initializer = _pin_worker
+        initargs = (list(cpu_affinity), {"lock": threading.Lock(), "next": 0})
+
+    pool = ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="svm-tile",
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+    return {
+        "shape": (height, width),
+        "tiles": tiles,
+        "clamp": saturation.needs_clamp(saturation.weight_total(luts, cameras)),
+        "pool": pool,
+        "workers": workers,
+        "tile_time": np.zeros(len(tiles), dtype=np.float64),
+        "frames": 0,
+    }
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and per-tile scratch buffers once, to be reused every frame."""
+    height, width = prepared["shape"]
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    # One set per tile: the tiles run concurrently
+    scratch = [
+        {
+            "acc": np.empty((y1 - y0, width, 3), dtype=np.float32),
+            "term": np.empty((y1 - y0, width, 3), dtype=np.float32),
+            "warped": np.empty((y1 - y0, width, 3), dtype=np.uint8),
+        }
+        for y0, y1, _ in prepared["tiles"]
+    ]
+    return out, scratch
+
+
+def _composite_tile(frames, tile, out, scratch, clamp):
+    y0, y1, tile_cams = tile
+    start = time.perf_counter()
+
+    acc = scratch["acc"]
+    acc.fill(0)
+    for cam, map_x, map_y, weight in tile_cams:
+        warped = cv2.remap(
+            frames[cam],
+            map_x,
+            map_y,
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+        acc += np.multiply(warped, weight, out=scratch["term"])
+    if clamp:
+        np.minimum(acc, 255, out=acc)
+    np.copyto(out[y0:y1], acc, casting="unsafe")
+
+    return time.perf_counter() - start
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    futures = [
+        prepared["pool"].submit(
+            _composite_tile, frames, tile, out, tile_scratch, prepared["clamp"]
+        )
+        for tile, tile_scratch in zip(prepared["tiles"], scratch)
+    ]
+    for t, future in enumerate(futures):
+        prepared["tile_time"][t] += future.result()
+    prepared["frames"] += 1
+
+    return out
+
+
+def tile_report(prepared):
+    """Return (y0, y1, mean_ms, active_cameras) per tile over all frames composited so far."""
+    frames = max(prepared["frames"], 1)
+    return [
+        (y0, y1, prepared["tile_time"][t] / frames * 1000.0, len(tile_cams))
+        for t, (y0, y1, tile_cams) in enumerate(prepared["tiles"])
+    ]
+
+
+def shutdown(prepared):
+    prepared["pool"].shutdown(wait=True)
+    with _cv2_threads["lock"]:
+        _cv2_threads["users"] -= 1
+        if _cv2_threads["users"] == 0:
+            cv2.setNumThreads(_cv2_threads["saved"])
@@ -0,0 +1,176 @@
+"""
+Module: topk.py
+
+This module provides the top-K camera-per-pixel LUT format and its compositor.
+
+Instead of one dense LUT per camera, a single LUT stores for every output pixel only the K
+cameras with the largest blend weight: their camera index, source coordinates and weight
+(renormalized so the kept weights still sum to the pixel's total). All camera frames are
+packed into one vertically stacked atlas, so each slot becomes a single remap over the
+atlas and the per-frame cost is K remaps no matter how many cameras the vehicle carries.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+# Camera index stored in empty slots (pixel seen by fewer than K cameras)
+NO_CAMERA = 255
+
+# Zero rows between the atlas bands: a bilinear tap just past a band's first or last row reads
+# black like cv2.remap's constant border on the camera's own frame, not the neighbouring camera
+BAND_GAP = 2
+
+
+def build_topk_lut(luts, cameras, k=2):
+    if len(cameras) >= NO_CAMERA:
+        raise ValueError(f"Top-K LUTs support at most {NO_CAMERA - 1} cameras")
+
+    weights = np.stack([luts[cam]["weight"] for cam in cameras]).astype(np.float32)
+    map_x = np.stack([luts[cam]["map_x"] for cam in cameras]).astype(np.float32)
+    map_y = np.stack([luts[cam]["map_y"] for cam in cameras]).astype(np.float32)
+    k = min(k, len(cameras))
+
+    # Strongest cameras first; ties resolve to the lower camera index
+    order = np.argsort(-weights, axis=0, kind="stable")[:k]
+    top_w = np.take_along_axis(weights, order, axis=0)
+    top_x = np.take_along_axis(map_x, order, axis=0)
+    top_y = np.take_along_axis(map_y, order, axis=0)
+
+    # Hand the weight of dropped cameras back to the kept ones, proportionally
+    total = weights.sum(axis=0)
+    kept = top_w.sum(axis=0)
+    scale = np.divide(total, kept, out=np.zeros_like(total), where=kept > 0)
+    top_w *= scale[np.newaxis]
+
+    empty = top_w <= 0
+    cam_ids = order.astype(np.uint8)
+    cam_ids[empty] = NO_CAMERA
+    top_w[empty] = 0.0
+    top_x[empty] = -1.0
+    top_y[empty] = -1.0
+
+    topk_lut = {
+        "cameras": np.array(cameras),
+        "cam_ids": cam_ids,  # K x H x W camera indices into "cameras"
+        "map_x": top_x,
+        "map_y": top_y,
+        "weight": top_w,
+    }
+    if all("src_crop" in luts[cam] for cam in cameras):
+        # Maps are relative to each camera's source crop (see source_crop.py)
+        topk_lut["src_crops"] = np.stack([luts[cam]["src_crop"] for cam in cameras])
+    return topk_lut
+
+
+def prepare_luts(luts, cameras, k=2, topk_lut=None):
+    if topk_lut is None:
+        topk_lut = build_topk_lut(luts, cameras, k)
+    elif list(topk_lut["cameras"]) != list(cameras):
+        raise ValueError(
+            f"Top-K LUT was built for {list(topk_lut['cameras'])}, not {cameras}"
+        )
+
+    return {
+        "shape": topk_lut["weight"].shape[1:],
+        "cam_ids": topk_lut["cam_ids"],
+        "map_x": topk_lut["map_x"],
+        "map_y": topk_lut["map_y"],
+        "weight": topk_lut["weight"],
+        "clamp": saturation.needs_clamp(topk_lut["weight"].sum(axis=0, dtype=np.float64)),
+        # Atlas-space maps are built on the first frame, once the frame sizes are known
+        "frame_shape": None,
+        "row_offsets": None,
+        "slots": None,
+        "atlas": None,
+    }
+
+
+def _build_slots(prepared, row_offsets):
+    slots = []
+    for s in range(prepared["weight"].shape[0]):
+        cam_ids = prepared["cam_ids"][s]
+        valid = cam_ids != NO_CAMERA
+        map1, map2 = cv2.convertMaps(
+            prepared["map_x"][s], prepared["map_y"][s], cv2.CV_16SC2
+        )
+        # Shift each pixel's integer source row into its camera's band of the atlas.
+        # Offsetting after the fixed-point conversion keeps the sub-pixel phase exact.
+        map1[..., 1] += np.where(
+            valid, row_offsets[np.where(valid, cam_ids, 0)], 0
+        ).astype(np.int16)
+        weight = np.stack([prepared["weight"][s]] * 3, axis=-1)
+        slots.append((map1, map2, weight))
+    return slots
+
+
+def atlas_views(prepared, cameras, frame_shapes):
+    """
+    Return per-camera views into the frame atlas so a capture stage can decode straight into
+    it; composite() then skips its own copy for frames that already live there.
+    frame_shapes maps each camera to its (possibly cropped) frame shape; bands are stacked
+    vertically, BAND_GAP zero rows apart, and the atlas is as wide as the widest camera.
+    """
+    shapes = tuple(tuple(frame_shapes[cam]) for cam in cameras)
+    if prepared["frame_shape"] != shapes:
+        heights = np.array([shape[0] for shape in shapes], dtype=np.int64)
+        row_offsets = np.concatenate(([0], np.cumsum(heights + BAND_GAP)[:-1]))
+        atlas_height = int(row_offsets[-1] + heights[-1])
+        if atlas_height > np.iinfo(np.int16).max:
+            raise ValueError("Frame atlas exceeds cv2.remap's 32767-row limit")
+        prepared["frame_shape"] = shapes
+        prepared["row_offsets"] = row_offsets
+        prepared["slots"] = _build_slots(prepared, row_offsets)
+        width = max(shape[1] for shape in shapes)
+        # The gaps and the padding right of narrower cameras stay zero, like cv2.remap's
+        # constant border
+        prepared["atlas"] = np.zeros((atlas_height, width) + tuple(shapes[0][2:]), dtype=np.uint8)
+    return {
+        cam: prepared["atlas"][
+            prepared["row_offsets"][c] : prepared["row_offsets"][c] + shape[0], : shape[1]
+        ]
+        for c, (cam, shape) in enumerate(zip(cameras, shapes))
+    }
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared["shape"]
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch = {
+        "acc": np.empty((height, width, 3), dtype=np.float32),
+        "term": np.empty((height, width, 3), dtype=np.float32),
+        "warped": np.empty((height, width, 3), dtype=np.uint8),
+    }
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    views = atlas_views(prepared, cameras, {cam: frames[cam].shape for cam in cameras})
+    for cam in cameras:
+        if not np.shares_memory(frames[cam], views[cam]):
+            views[cam][...] = frames[cam]
+
+    bev = scratch["acc"]
+    bev.fill(0)
+    for map1, map2, weight in prepared["slots"]:
+        warped = cv2.remap(
+            prepared["atlas"],
+            map1,
+            map2,
+            cv2.INTER_LINEAR,
+            dst=scratch["warped"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(0, 0, 0),
+        )
+        bev += np.multiply(warped, weight, out=scratch["term"])
+
+    if prepared["clamp"]:
+        np.minimum(bev, 255, out=bev)
+    np.copyto(out, bev, casting="unsafe")
+    return out
@@ -0,0 +1,172 @@
+"""
+Module: view_cache.py
+
+This module provides the viewpoint cache of the CPU free-view renderer.
+
+Compiling the LUTs of a free-view pose (free_view.py) takes a fraction of a second, far too long
+for a frame, while compositing a compiled view is as cheap as a BEV frame. ViewCache keeps
+compiled views keyed by quantized pose in LRU order within a memory budget, compiles likely-next
+poses on a background thread (prefetch), and crossfade() blends the two nearest cached poses of
+an animated transition, so turntable spins and preset-to-preset moves stay smooth without a GPU.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Pose quantization grid (degrees / meters): poses closer than a step share a cache entry
+POSE_STEPS = {"azimuth": 1.0, "elevation": 1.0, "distance": 0.1, "fov": 1.0, "target": 0.05}
+
+
+def quantize_pose(pose, steps=POSE_STEPS):
+    """Snap a pose to the cache grid: (hashable key, snapped pose)."""
+
+    def snap(value, step):
+        return round(round(float(value) / step) * step, 6)
+
+    snapped = {
+        "azimuth": snap(pose["azimuth"] % 360.0, steps["azimuth"]) % 360.0,
+        "elevation": snap(pose["elevation"], steps["elevation"]),
+        "distance": snap(pose["distance"], steps["distance"]),
+        "fov": snap(pose.get("fov", 60.0), steps["fov"]),
+        "target": tuple(snap(v, steps["target"]) for v in pose.get("target", (0.0, 0.0, 0.0))),
+    }
+    key = (
+        snapped["azimuth"], snapped["elevation"], snapped["distance"], snapped["fov"]
+    ) + snapped["target"]
+    return key, snapped
+
+
+def array_nbytes(value):
+    """Bytes held by the NumPy arrays of a nested dict / list / tuple."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(array_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(array_nbytes(v) for v in value)
+    return 0
+
+
+def crossfade(first, second, fraction, out=None):
+    """Blend two rendered views: fraction 0 gives first, 1 gives second."""
+    if fraction <= 0.0:
+        return first
+    if fraction >= 1.0:
+        return second
+    return cv2.addWeighted(first, 1.0 - fraction, second, fraction, 0.0, dst=out)
+
+
+class ViewCache:
+    """
+    LRU cache of compiled views keyed by quantized pose, bounded by budget_mb.
+
+    build(pose) compiles a snapped pose into a cache value (e.g. a prepared compositor backend),
+    release(value) frees an evicted one. quantize(request) maps a request to its (key, snapped
+    request); other on-demand LUT caches (roi_view.py) plug their own key in here. The `keep`
+    most recently used or compiled entries are never evicted, so the two views of a running
+    crossfade and the pose prefetched next stay valid even with a tight budget.
+    """
+
+    def __init__(self, build, budget_mb, release=None, workers=1, keep=3, quantize=quantize_pose):
+        self.build = build
+        self.release = release
+        self.quantize = quantize
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.keep = keep
+        self.entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self.pending = {}  # key -> Future of a background compile
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "prefetched": 0, "evictions": 0}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="view-cache")
+
+    def get(self, pose):
+        """Return the view of a pose, compiling it now if it is neither cached nor pending."""
+        key, snapped = self.quantize(pose)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.entries[key][0]
+            future = self.pending.get(key)
+            self.stats["waits" if future is not None else "misses"] += 1
+
+        if future is not None:
+            # Already compiling in the background: wait for it rather than compiling twice
+            return future.result()
+        return self._insert(key, self.build(snapped))
+
+    def put(self, pose, value):
+        """Store a view compiled outside the cache (e.g. pre-warmed before sizing it)."""
+        key, _ = self.quantize(pose)
+        return self._insert(key, value)
+
+    def prefetch(self, poses):
+        """Compile poses in the background unless they are cached or already pending."""
+        for pose in poses:
+            key, snapped = self.quantize(pose)
+            with self.lock:
+                if key in self.entries or key in self.pending:
+                    continue
+                self.pending[key] = self.executor.submit(self._compile, key, snapped)
+
+    def _compile(self, key, snapped):
+        try:
+            value = self._insert(key, self.build(snapped))
+            with self.lock:
+                self.stats["prefetched"] += 1
+            return value
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def _insert(self, key, value):
+        """Store a compiled value, evict down to the budget and return the cached value."""
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                # Lost a race against another compile of the same pose
+                evicted.append(value)
+                self.entries.move_to_end(key)
+            else:
+                nbytes = array_nbytes(value)
+                self.entries[key] = (value, nbytes)
+                self.nbytes += nbytes
+            while self.nbytes > self.budget and len(self.entries) > self.keep:
+                _, (old, old_nbytes) = self.entries.popitem(last=False)
+                self.nbytes -= old_nbytes
+                self.stats["evictions"] += 1
+                evicted.append(old)
+            value = self.entries[key][0]
+        if self.release is not None:
+            for old in evicted:
+                self.release(old)
+        return value
+
+    def discard(self, stale):
+        """Release every cached value whose key stale(key) flags, e.g. after a recalibration."""
+        with self.lock:
+            keys = [key for key in self.entries if stale(key)]
+            values = []
+            for key in keys:
+                value, nbytes = self.entries.pop(key)
+                self.nbytes -= nbytes
+                values.append(value)
+        if self.release is not None:
+            for value in values:
+                self.release(value)
+
+    def close(self):
+        """Finish background compiles and release every cached value."""
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            values = [value for value, _ in self.entries.values()]
+            self.entries.clear()
+            self.nbytes = 0
+        if self.release is not None:
+            for value in values:
+                self.release(value)
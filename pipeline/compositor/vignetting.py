@@ -0,0 +1,130 @@
+"""
+Module: vignetting.py
+
+This module provides the radial lens-shading (vignetting) profile of the fisheye cameras.
+
+calibrate_vignetting.py estimates the profile once from the extrinsic calibration images, using
+the camera overlaps: a ground point seen by two cameras is the same surface, so the ratio of its
+two observations is the ratio of the lens shading at its two image radii (times the exposure
+ratio of the cameras). With the shading modelled as V(r) = exp(b1 r^2 + b2 r^4 + b3 r^6) of
+the normalized radius, every such pair is one linear equation in log space; a robust least-
+squares fit over all pairs gives the coefficients and the per-camera exposures.
+
+The stitching stage multiplies every LUT weight by correction(), the inverse of V at the source
+pixel, so brightness is flattened with zero per-frame cost. The correction is 1 at the optical
+centre and brightens towards the edge (up to max_gain); the compositors saturate the weight
+totals above 1 this produces (saturation.py). Colour shading is not corrected: a LUT weight is
+one scalar shared by the B, G and R channels, so only the luminance profile is fitted.
+"""
+
+import numpy as np
+
+# Observations outside this range (clipped or near black) carry no shading information
+SATURATED = 250
+DARK = 16
+
+# Robust fit: samples further than this many median absolute deviations are dropped, and refit
+OUTLIER_MADS = 3.0
+FIT_ITERATIONS = 3
+
+
+def normalized_radius(map_x, map_y, center, radius):
+    """Distance of source pixels from the principal point in units of radius."""
+    return np.hypot(map_x - center[0], map_y - center[1]) / radius
+
+
+def sample_overlaps(frames, views, cameras, center, radius):
+    """
+    Observations of ground points seen by two cameras, from project_points-style views
+    {camera: (map_x, map_y, weight)} of the same points: camera index pairs (N, 2), normalized
+    radii (N, 2) and gray values (N, 2).
+    """
+    observed = {}
+    for cam in cameras:
+        map_x, map_y, weight = (array.ravel() for array in views[cam])
+        frame = frames[cam]
+        x = np.clip(np.rint(map_x).astype(np.int64), 0, frame.shape[1] - 1)
+        y = np.clip(np.rint(map_y).astype(np.int64), 0, frame.shape[0] - 1)
+        bgr = frame[y, x].astype(np.float64)
+        usable = (weight > 0) & (bgr.max(axis=-1) < SATURATED) & (bgr.min(axis=-1) > DARK)
+        radii = normalized_radius(map_x, map_y, center, radius)
+        observed[cam] = (usable, radii, bgr.mean(axis=-1))
+
+    pairs, radii, values = [], [], []
+    for a, cam_a in enumerate(cameras):
+        for b in range(a + 1, len(cameras)):
+            usable_a, r_a, v_a = observed[cam_a]
+            usable_b, r_b, v_b = observed[cameras[b]]
+            select = usable_a & usable_b
+            pairs.append(np.tile((a, b), (np.count_nonzero(select), 1)))
+            radii.append(np.stack((r_a[select], r_b[select]), axis=-1))
+            values.append(np.stack((v_a[select], v_b[select]), axis=-1))
+    pairs, radii, values = np.concatenate(pairs), np.concatenate(radii), np.concatenate(values)
+    if len(pairs) == 0:
+        raise ValueError("No ground point is usable in two cameras, cannot estimate vignetting")
+    return pairs, radii, values
+
+
+def fit_profile(pairs, radii, values, num_cameras):
+    """
+    Robust fit of log V coefficients (b1, b2, b3) and per-camera log exposures (camera 0 fixed
+    at 0) to the log ratios of paired gray observations (N, 2).
+    """
+    powers = radii[..., np.newaxis] ** np.array([2, 4, 6])
+    exposure = np.zeros((len(pairs), num_cameras))
+    rows = np.arange(len(pairs))
+    exposure[rows, pairs[:, 0]] += 1.0
+    exposure[rows, pairs[:, 1]] -= 1.0
+    design = np.concatenate((powers[:, 0] - powers[:, 1], exposure[:, 1:]), axis=-1)
+    target = np.log(values[:, 0]) - np.log(values[:, 1])
+
+    keep = np.ones(len(pairs), dtype=bool)
+    for _ in range(FIT_ITERATIONS):
+        solution, *_ = np.linalg.lstsq(design[keep], target[keep], rcond=None)
+        residual = np.abs(design @ solution - target)
+        mad = np.median(residual[keep]) + 1e-9
+        keep = residual < OUTLIER_MADS * mad / 0.6745
+    return solution[:3], np.concatenate(([0.0], solution[3:])), int(keep.sum())
+
+
+def estimate_profile(frames, views, cameras, center, radius):
+    """Vignetting profile of the lens from paired overlap observations, as saved by calibration."""
+    pairs, radii, values = sample_overlaps(frames, views, cameras, center, radius)
+    coeffs, exposures, inliers = fit_profile(pairs, radii, values, len(cameras))
+    return {
+        "coeffs": coeffs,
+        "exposures": np.exp(exposures),
+        "center": np.asarray(center, dtype=np.float64),
+        "radius": float(radius),
+        # The fit is only trusted up to the radii it has seen
+        "r_max": float(np.percentile(radii, 99)),
+        "samples": len(pairs),
+        "inliers": inliers,
+    }
+
+
+def load_profile(path):
+    """Profile saved by calibrate_vignetting.py."""
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def shading(r, coeffs):
+    """Relative brightness V(r) of the lens at normalized radius r (1 at the centre)."""
+    r2 = np.asarray(r, dtype=np.float64) ** 2
+    return np.exp(coeffs[0] * r2 + coeffs[1] * r2**2 + coeffs[2] * r2**3)
+
+
+def profile_gain(r, coeffs, r_max, max_gain):
+    """Inverse shading 1 / V(r), clamped to [1 / max_gain, max_gain] and constant past r_max."""
+    return np.clip(1.0 / shading(np.minimum(r, r_max), coeffs), 1.0 / max_gain, max_gain)
+
+
+def correction(map_x, map_y, profile, max_gain):
+    """
+    Weight factor of every LUT pixel reading full-frame source pixel (map_x, map_y): the
+    inverse shading, 1 at the optical centre.
+    """
+    r_max = float(profile["r_max"])
+    r = normalized_radius(map_x, map_y, profile["center"], float(profile["radius"]))
+    return profile_gain(r, profile["coeffs"], r_max, max_gain).astype(np.float32)
@@ -0,0 +1,131 @@
+"""
+Module: virtual_view.py
+
+This module provides rectified virtual pinhole views of the fisheye cameras (rear view, curb
+view, front cross-traffic split view, undistortion debug views).
+
+A view is described by a dict:
+    {"camera": "Cam_Back", "size": (640, 400), "mirror": True,
+     "panes": [{"yaw": 0, "pitch": 20, "fov": 100}]}
+Each pane is a pinhole camera rotated by yaw (degrees, positive turns right) and pitch
+(degrees, positive tilts down) away from the physical optical axis, with a horizontal field
+of view of fov degrees. Several panes split the view horizontally, so a cross-traffic view
+looking left and right is still a single remap. Maps are built once as CV_16SC2 and cached on
+disk keyed by the view, the intrinsics and the input scale; streaming a view then costs one
+fixed-point remap per frame.
+"""
+
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Bump when the map construction changes so stale cache entries are not picked up
+CACHE_VERSION = 1
+
+
+def rotation(yaw=0.0, pitch=0.0, roll=0.0):
+    """Rotation taking virtual camera rays to physical camera rays (x right, y down, z forward)."""
+    yaw, pitch, roll = np.radians([yaw, pitch, roll])
+    rot_yaw = np.array(
+        [[np.cos(yaw), 0.0, np.sin(yaw)], [0.0, 1.0, 0.0], [-np.sin(yaw), 0.0, np.cos(yaw)]]
+    )
+    rot_pitch = np.array(
+        [[1.0, 0.0, 0.0], [0.0, np.cos(pitch), np.sin(pitch)], [0.0, -np.sin(pitch), np.cos(pitch)]]
+    )
+    rot_roll = np.array(
+        [[np.cos(roll), -np.sin(roll), 0.0], [np.sin(roll), np.cos(roll), 0.0], [0.0, 0.0, 1.0]]
+    )
+    return rot_yaw @ rot_pitch @ rot_roll
+
+
+def pinhole_matrix(size, fov):
+    """Square-pixel camera matrix of a (width, height) image with a horizontal fov in degrees."""
+    width, height = size
+    focal = (width / 2.0) / np.tan(np.radians(fov) / 2.0)
+    return np.array(
+        [[focal, 0.0, (width - 1) / 2.0], [0.0, focal, (height - 1) / 2.0], [0.0, 0.0, 1.0]]
+    )
+
+
+def scaled_intrinsics(K, input_scale=1):
+    """Camera matrix of frames decoded at 1/input_scale (pixel centres aligned)."""
+    if input_scale == 1:
+        return K
+    scaled = np.array(K, dtype=np.float64)
+    scaled[0, 0] /= input_scale
+    scaled[1, 1] /= input_scale
+    scaled[0, 2] = (K[0, 2] + 0.5) / input_scale - 0.5
+    scaled[1, 2] = (K[1, 2] + 0.5) / input_scale - 0.5
+    return scaled
+
+
+def pane_maps(K, D, size, pane):
+    """Float (map_x, map_y) of one pinhole pane of size (width, height) into the fisheye frame."""
+    # initUndistortRectifyMap expects the inverse of the virtual-to-physical rotation
+    rectify = rotation(pane.get("yaw", 0.0), pane.get("pitch", 0.0), pane.get("roll", 0.0)).T
+    return cv2.fisheye.initUndistortRectifyMap(
+        K, D, rectify, pinhole_matrix(size, pane.get("fov", 90.0)), size, cv2.CV_32FC1
+    )
+
+
+def view_float_maps(K, D, view, input_scale=1):
+    """Float (map_x, map_y) of a whole view: panes side by side, optionally mirrored."""
+    width, height = view["size"]
+    K = scaled_intrinsics(K, input_scale)
+    panes = view.get("panes", [{}])
+    edges = [width * i // len(panes) for i in range(len(panes) + 1)]
+    maps = [
+        pane_maps(K, D, (x1 - x0, height), pane)
+        for pane, x0, x1 in zip(panes, edges[:-1], edges[1:])
+    ]
+    map_x = np.hstack([m[0] for m in maps])
+    map_y = np.hstack([m[1] for m in maps])
+    if view.get("mirror", False):
+        # Rear-view convention: shown as in a mirror
+        map_x, map_y = map_x[:, ::-1], map_y[:, ::-1]
+    return np.ascontiguousarray(map_x), np.ascontiguousarray(map_y)
+
+
+def build_view_maps(K, D, view, input_scale=1):
+    """CV_16SC2 fixed-point maps of a view, ready for cv2.remap."""
+    map_x, map_y = view_float_maps(K, D, view, input_scale)
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+
+def cache_key(K, D, view, input_scale=1):
+    digest = hashlib.sha1()
+    digest.update(json.dumps(view, sort_keys=True).encode())
+    digest.update(np.asarray(K, dtype=np.float64).tobytes())
+    digest.update(np.asarray(D, dtype=np.float64).tobytes())
+    digest.update(f"{input_scale}:{CACHE_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_view_maps(cache_dir, K, D, view, input_scale=1):
+    """Return the cached maps of a view, building and storing them on a cache miss."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"view_{cache_key(K, D, view, input_scale)}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            return data["map1"], data["map2"]
+
+    map1, map2 = build_view_maps(K, D, view, input_scale)
+    np.savez(cache_path, map1=map1, map2=map2)
+    return map1, map2
+
+
+def render_view(frame, maps, out=None):
+    """Remap a camera frame through view maps (border pixels black, like the compositors)."""
+    map1, map2 = maps
+    return cv2.remap(
+        frame,
+        map1,
+        map2,
+        cv2.INTER_LINEAR,
+        dst=out,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(0, 0, 0),
+    )
@@ -0,0 +1,227 @@
+"""
+Module: yuv.py
+
+This module provides a native YUV LUT compositor for cameras delivering NV12 or YUYV.
+
+Instead of converting every camera frame to BGR before the remap, the luma plane is remapped
+with the full-resolution LUT and the interleaved chroma plane with a derived half-resolution
+LUT (one chroma sample per 2x2 output block, i.e. a 4:2:0 canvas). The canvas is emitted as
+NV12 or converted to BGR once at the end, so N per-camera colour conversions become one and
+every remap moves 1.5 instead of 3 bytes per output pixel.
+
+Frame layouts follow OpenCV's cvtColor conventions:
+    nv12: (H * 3 / 2, W) uint8, Y plane followed by interleaved UV rows at half resolution
+    yuyv: (H, W, 2) uint8, Y0 U0 Y1 V0 ... (chroma at half horizontal resolution)
+Values are BT.601 limited range, so uncovered canvas pixels are filled with video black
+(Y = 16, U = V = 128) to match the black background of the BGR compositors.
+"""
+
+import cv2
+import numpy as np
+
+from pipeline.compositor import saturation
+
+INPUT_FORMATS = ("nv12", "yuyv")
+OUTPUT_FORMATS = ("nv12", "bgr")
+
+# Limited-range video black
+LUMA_BLACK = 16.0
+CHROMA_NEUTRAL = 128.0
+
+# Chroma subsampling (horizontal, vertical) of each input format
+CHROMA_SCALE = {"nv12": (2, 2), "yuyv": (2, 1)}
+
+
+def from_bgr(image, pixel_format):
+    """Convert a BGR image to the given camera pixel format (test input / file playback)."""
+    height, width = image.shape[:2]
+    if pixel_format == "yuyv":
+        return cv2.cvtColor(image, cv2.COLOR_BGR2YUV_YUYV)
+    if pixel_format == "nv12":
+        # OpenCV has no BGR -> NV12, so interleave the planar I420 chroma
+        i420 = cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420)
+        quarter = (height // 2) * (width // 2)
+        chroma = i420[height:].reshape(-1)
+        uv = np.stack((chroma[:quarter], chroma[quarter:]), axis=-1)
+        return np.vstack((i420[:height], uv.reshape(height // 2, width)))
+    raise ValueError(f"Unsupported pixel format '{pixel_format}', expected {INPUT_FORMATS}")
+
+
+def nv12_mask(mask):
+    """Expand a per-pixel (H, W) boolean mask to the NV12 layout of the same canvas."""
+    height, width = mask.shape
+    chroma = mask.reshape(height // 2, 2, width // 2, 2).any(axis=(1, 3))
+    return np.vstack((mask, np.repeat(chroma, 2, axis=1)))
+
+
+def _block_mean(values):
+    height, width = values.shape
+    return values.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3), dtype=np.float64)
+
+
+def derive_chroma_lut(map_x, map_y, weight, chroma_scale):
+    """
+    Derive the half-resolution chroma LUT of one camera from its full-resolution LUT.
+
+    Each chroma output sample covers a 2x2 block of luma output pixels: its weight is the
+    block mean (so the weights of all cameras still sum to the same total) and its source
+    position the weight-averaged block position, moved into the subsampled chroma plane.
+    """
+    block_w = _block_mean(weight)
+    block_x = _block_mean(map_x * weight)
+    block_y = _block_mean(map_y * weight)
+    covered = block_w > 0
+    # Uncovered blocks fall back to the plain block centre, their weight is zero anyway
+    src_x = np.where(covered, block_x / np.where(covered, block_w, 1.0), _block_mean(map_x))
+    src_y = np.where(covered, block_y / np.where(covered, block_w, 1.0), _block_mean(map_y))
+
+    # Chroma sample j sits at the centre of the luma samples it covers
+    scale_x, scale_y = chroma_scale
+    return {
+        "map_x": ((src_x - (scale_x - 1) / 2.0) / scale_x).astype(np.float32),
+        "map_y": ((src_y - (scale_y - 1) / 2.0) / scale_y).astype(np.float32),
+        "weight": block_w.astype(np.float32),
+    }
+
+
+def prepare_luts(luts, cameras, input_format="nv12", output_format="bgr"):
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported YUV input '{input_format}', expected {INPUT_FORMATS}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported YUV output '{output_format}', expected {OUTPUT_FORMATS}")
+
+    height, width = luts[cameras[0]]["map_x"].shape
+    if height % 2 or width % 2:
+        raise ValueError("The YUV compositor needs an even canvas size for 4:2:0 output")
+
+    prepared = {
+        "shape": (height, width),
+        "input_format": input_format,
+        "output_format": output_format,
+    }
+    luma_total = np.zeros((height, width), dtype=np.float32)
+    chroma_total = np.zeros((height // 2, width // 2), dtype=np.float32)
+    for cam in cameras:
+        lut = luts[cam]
+        chroma = derive_chroma_lut(
+            lut["map_x"], lut["map_y"], lut["weight"], CHROMA_SCALE[input_format]
+        )
+        # Fixed-point maps: same taps cv2.remap derives from float maps, minus the per-call conversion
+        luma_map1, luma_map2 = cv2.convertMaps(
+            lut["map_x"].astype(np.float32), lut["map_y"].astype(np.float32), cv2.CV_16SC2
+        )
+        chroma_map1, chroma_map2 = cv2.convertMaps(
+            chroma["map_x"], chroma["map_y"], cv2.CV_16SC2
+        )
+        prepared[cam] = {
+            "map1": luma_map1,
+            "map2": luma_map2,
+            "weight": lut["weight"].astype(np.float32),
+            "chroma_map1": chroma_map1,
+            "chroma_map2": chroma_map2,
+            # Expand to the U / V pair for one vectorized multiply
+            "chroma_weight": np.stack([chroma["weight"]] * 2, axis=-1),
+        }
+        luma_total += prepared[cam]["weight"]
+        chroma_total += chroma["weight"]
+
+    # Accumulators start from the share of video black not covered by any camera. Totals above
+    # 1 (gain / vignetting correction) make it negative, so the gain applies around video black
+    # and neutral chroma (16 + g * (Y - 16), 128 + g * (U - 128)) instead of shifting them.
+    prepared["luma_fill"] = (1.0 - luma_total) * LUMA_BLACK
+    prepared["chroma_fill"] = np.repeat(
+        ((1.0 - chroma_total) * CHROMA_NEUTRAL)[..., np.newaxis], 2, axis=-1
+    )
+    prepared["clamp"] = saturation.needs_clamp(luma_total)
+    return prepared
+
+
+def split_planes(frame, input_format):
+    """Return (luma, interleaved UV) planes of a camera frame without copying NV12."""
+    if input_format == "nv12":
+        height = frame.shape[0] * 2 // 3
+        width = frame.shape[1]
+        return frame[:height], frame[height:].reshape(height // 2, width // 2, 2)
+    # YUYV: even bytes are luma, odd bytes alternate U / V per pixel pair
+    height, width = frame.shape[:2]
+    y_plane, uv_plane = cv2.split(frame)
+    return y_plane, uv_plane.reshape(height, width // 2, 2)
+
+
+def allocate_buffers(prepared, cameras):
+    """Allocate the output canvas and scratch buffers once, to be reused every frame."""
+    height, width = prepared["shape"]
+    nv12 = np.empty((height * 3 // 2, width), dtype=np.uint8)
+    scratch = {
+        "luma": np.empty((height, width), dtype=np.float32),
+        "chroma": np.empty((height // 2, width // 2, 2), dtype=np.float32),
+        "luma_term": np.empty((height, width), dtype=np.float32),
+        "chroma_term": np.empty((height // 2, width // 2, 2), dtype=np.float32),
+        "warped_y": np.empty((height, width), dtype=np.uint8),
+        "warped_uv": np.empty((height // 2, width // 2, 2), dtype=np.uint8),
+        "nv12": nv12,
+    }
+    if prepared["output_format"] == "nv12":
+        return nv12, scratch
+    # cvtColor needs a contiguous destination; a strided out (the BGR channels of a BGRA
+    # frame) is filled from it at the end
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    scratch["bgr"] = out
+    return out, scratch
+
+
+def composite(frames, prepared, cameras, out=None, scratch=None):
+    # Without caller buffers fall back to fresh per-frame allocations
+    if out is None or scratch is None:
+        out, scratch = allocate_buffers(prepared, cameras)
+
+    height, width = prepared["shape"]
+    luma = scratch["luma"]
+    chroma = scratch["chroma"]
+    np.copyto(luma, prepared["luma_fill"])
+    np.copyto(chroma, prepared["chroma_fill"])
+
+    for cam in cameras:
+        lut = prepared[cam]
+        y_plane, uv_plane = split_planes(frames[cam], prepared["input_format"])
+
+        # Border taps read video black, like the black border of the BGR compositors
+        warped_y = cv2.remap(
+            y_plane,
+            lut["map1"],
+            lut["map2"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped_y"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=LUMA_BLACK,
+        )
+        warped_uv = cv2.remap(
+            uv_plane,
+            lut["chroma_map1"],
+            lut["chroma_map2"],
+            cv2.INTER_LINEAR,
+            dst=scratch["warped_uv"],
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(CHROMA_NEUTRAL, CHROMA_NEUTRAL),
+        )
+        luma += np.multiply(warped_y, lut["weight"], out=scratch["luma_term"])
+        chroma += np.multiply(warped_uv, lut["chroma_weight"], out=scratch["chroma_term"])
+
+    nv12 = scratch["nv12"]
+    # Round (not truncate) so neutral chroma stays exactly 128
+    np.rint(luma, out=luma)
+    np.rint(chroma, out=chroma)
+    if prepared["clamp"]:
+        np.clip(luma, 0, 255, out=luma)
+        np.clip(chroma, 0, 255, out=chroma)
+    np.copyto(nv12[:height], luma, casting="unsafe")
+    np.copyto(nv12[height:].reshape(height // 2, width // 2, 2), chroma, casting="unsafe")
+
+    if prepared["output_format"] == "nv12":
+        if nv12 is not out:
+            np.copyto(out, nv12)
+        return out
+    cv2.cvtColor(nv12, cv2.COLOR_YUV2BGR_NV12, dst=scratch["bgr"])
+    if scratch["bgr"] is not out:
+        np.copyto(out, scratch["bgr"])
+    return out
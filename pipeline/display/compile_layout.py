@@ -0,0 +1,94 @@
+"""
+Module: compile_layout.py
+
+This module provides the layout compiler of the head-unit display.
+
+It reads the screen description (DISPLAY_WIDTH / DISPLAY_HEIGHT / DISPLAY_LAYOUT in config.py),
+the BEV LUTs written by stitching_bev.py and the fisheye intrinsics, and writes one fused
+display-resolution LUT per camera (plus the region partition and top-K table) to
+data/display/luts, ready for render_layout.py.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import layout, lut_pyramid, regions, source_crop, topk
+
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+bev_luts_dir = os.path.join(base_dir, "data/bev_2d/luts")
+luts_dir = os.path.join(base_dir, "data/display/luts")
+os.makedirs(luts_dir, exist_ok=True)
+
+cameras = config.CAMERAS
+display_size = (config.DISPLAY_WIDTH, config.DISPLAY_HEIGHT)
+
+if not os.path.exists(intrinsic_params_path):
+    print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+    sys.exit(1)
+
+with np.load(intrinsic_params_path) as data:
+    K = data["K"]
+    D = data["D"]
+
+# BEV panels sample the smallest LUT pyramid level at least as wide as the widest of them
+bev_widths = [panel["rect"][2] for panel in config.DISPLAY_LAYOUT if panel.get("view") == "bev"]
+bev_level = lut_pyramid.select_level(
+    lut_pyramid.available_levels(bev_luts_dir, config.BEV_WIDTH),
+    max(bev_widths, default=config.BEV_WIDTH),
+)
+bev_luts_dir = lut_pyramid.level_dir(bev_luts_dir, bev_level, config.BEV_WIDTH)
+
+print(f"Loading {bev_level} px BEV LUTs and camera resolutions...")
+bev_luts = {}
+frame_shapes = {}
+for cam in cameras:
+    lut_path = os.path.join(bev_luts_dir, f"lut_{cam}.npz")
+    img = cv2.imread(os.path.join(images_dir, f"{cam}.png"))
+    if not os.path.exists(lut_path) or img is None:
+        print(f"Error: Missing LUT or frame for {cam}. Run stitching_bev.py first.")
+        sys.exit(1)
+    with np.load(lut_path) as data:
+        bev_luts[cam] = {key: data[key] for key in data.files}
+    frame_shapes[cam] = img.shape[:2]
+
+print(f"Compiling {len(config.DISPLAY_LAYOUT)}-panel layout at {display_size[0]}x{display_size[1]}...")
+try:
+    display_luts = layout.compile_layout(
+        config.DISPLAY_LAYOUT, display_size, cameras, bev_luts, K, D, frame_shapes
+    )
+except ValueError as e:
+    print(f"Error: {e}")
+    sys.exit(1)
+
+for cam, lut in display_luts.items():
+    lut_path = os.path.join(luts_dir, f"lut_display_{cam}.npz")
+    np.savez_compressed(lut_path, **lut)
+    y0, y1, x0, x1 = lut["src_crop"]
+    print(
+        f"  Saved display LUT -> {lut_path} (source crop x {x0}:{x1}, y {y0}:{y1}, "
+        f"{source_crop.crop_fraction(lut['src_crop'], frame_shapes[cam]) * 100:.1f}% of the frame)"
+    )
+
+# Combined tables for the "regions" and "topk" compositors, as the stitching stage writes them
+weights = {cam: lut["weight"] for cam, lut in display_luts.items()}
+regions_path = os.path.join(luts_dir, "lut_display_regions.npz")
+np.savez_compressed(regions_path, **regions.partition_regions(weights, cameras))
+print(f"  Saved region partition -> {regions_path}")
+
+topk_path = os.path.join(luts_dir, "lut_display_topk.npz")
+np.savez_compressed(
+    topk_path, **topk.build_topk_lut(display_luts, cameras, k=config.TOPK_CAMERAS)
+)
+print(f"  Saved top-{config.TOPK_CAMERAS} camera LUT -> {topk_path}")
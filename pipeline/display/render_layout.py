@@ -0,0 +1,104 @@
+"""
+Module: render_layout.py
+
+This module provides the simulated real-time render loop of the full head-unit display.
+
+Every frame produces the entire screen (BEV panel, dewarped camera panel and borders) in one
+composite pass over the fused display LUTs written by compile_layout.py, with whichever
+compositor backend COMPOSITOR_MODE selects.
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import backends, reduced_input, source_crop, yuv
+
+luts_dir = os.path.join(base_dir, "data/display/luts")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+output_path = os.path.join(base_dir, "data/display/realtime_demo_display.png")
+
+cameras = config.CAMERAS
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir)
+# Backends consuming a combined table written by compile_layout.py: (file, prepare kwarg)
+combined_luts = {
+    "regions": ("lut_display_regions.npz", "partition"),
+    "topk": ("lut_display_topk.npz", "topk_lut"),
+}
+
+print("Loading fused display LUTs...")
+prepare_kwargs = {}
+if compositor_mode in combined_luts:
+    filename, kwarg = combined_luts[compositor_mode]
+    combined_path = os.path.join(luts_dir, filename)
+    if not os.path.exists(combined_path):
+        print(f"Error: Missing {combined_path}. Re-run compile_layout.py to generate it.")
+        sys.exit(1)
+    with np.load(combined_path) as data:
+        prepare_kwargs[kwarg] = {key: data[key] for key in data.files}
+
+luts = {}
+if compositor_mode != "topk":
+    for cam in cameras:
+        lut_path = os.path.join(luts_dir, f"lut_display_{cam}.npz")
+        if not os.path.exists(lut_path):
+            print(f"Error: Missing display LUT for {cam}. Run compile_layout.py first.")
+            sys.exit(1)
+        with np.load(lut_path) as data:
+            luts[cam] = {key: data[key] for key in data.files}
+
+luts, prepare_kwargs = reduced_input.rescale_luts(luts, prepare_kwargs, config.INPUT_SCALE)
+crops = source_crop.lut_crops(luts, prepare_kwargs, cameras)
+
+backend = backends.prepare_backend(compositor_mode, luts, cameras, **prepare_kwargs)
+
+
+def load_frames():
+    loaded = {}
+    for cam in cameras:
+        frame = reduced_input.read_frame(
+            os.path.join(images_dir, f"{cam}.png"), config.INPUT_SCALE
+        )
+        if crops is not None:
+            frame = source_crop.crop_frame(frame, crops[cam])
+        if compositor_mode == "yuv":
+            # Stand-in for a V4L2 camera delivering NV12 / YUYV
+            frame = yuv.from_bgr(frame, config.YUV_INPUT_FORMAT)
+        loaded[cam] = frame
+    return loaded
+
+
+frames = load_frames()
+
+NUM_FRAMES = 50
+print(f"\nStarting simulated Real-Time display loop ({compositor_mode} compositor)...")
+start_time = time.time()
+
+for i in range(NUM_FRAMES):
+    # The whole screen, every panel included, in a single pass
+    screen = backends.composite(backend, frames)
+
+end_time = time.time()
+fps = NUM_FRAMES / (end_time - start_time)
+backends.release(backend)
+
+print(
+    f"Composited {len(config.DISPLAY_LAYOUT)} panels into a "
+    f"{config.DISPLAY_WIDTH}x{config.DISPLAY_HEIGHT} screen per pass."
+)
+print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
+
+if screen.ndim == 2:
+    # NV12 screen (YUV_OUTPUT_FORMAT = "nv12"), converted only for the PNG dump
+    screen = cv2.cvtColor(screen, cv2.COLOR_YUV2BGR_NV12)
+cv2.imwrite(output_path, screen)
+print(f"Output saved to: {output_path}")
@@ -1,3 +1,4 @@
+import argparse
 import cv2
 import numpy as np
 import os
@@ -9,14 +10,47 @@ import sys
 FISHEYE_WIDTH = 1920.0
 FISHEYE_HEIGHT = 1536.0
 
+def normalize_uv(coords, size, input_scale):
+    # Camera textures uploaded at 1/input_scale (INPUT_SCALE in config.py): move the full-res
+    # pixel coordinate onto the reduced grid (pixel centres aligned), then normalize by its size
+    if input_scale == 1:
+        return (coords / size).astype(np.float32)
+    reduced = (coords + 0.5) / input_scale - 0.5
+    return (reduced / (size / input_scale)).astype(np.float32)
+
+def texture_size(crop):
+    # LUTs carrying a source crop [y0, y1, x0, x1] address only that box of the camera frame,
+    # which is all the renderer uploads; older LUTs address the full fisheye frame
+    if crop is None:
+        return FISHEYE_WIDTH, FISHEYE_HEIGHT
+    y0, y1, x0, x1 = (int(v) for v in crop)
+    return float(x1 - x0), float(y1 - y0)
+
 def main():
+    parser = argparse.ArgumentParser(description="Export bowl LUTs as GPU textures.")
+    parser.add_argument("--input-scale", type=int, choices=[1, 2, 4, 8], default=1,
+                        help="Camera textures are decoded at 1/N resolution")
+    parser.add_argument("--level", type=int, default=None,
+                        help="LUT pyramid level (output width) to export, default: the base LUTs")
+    args = parser.parse_args()
+
     print("Exporting assets for GPU renderer...")
     luts_dir = os.path.join("data", "bowl_3d", "luts")
+    level_dir = os.path.join(luts_dir, f"level_{args.level}")
+    if args.level is not None and os.path.isdir(level_dir):
+        # Same file names in every level of the pyramid written by stitching_bowl.py
+        luts_dir = level_dir
+    elif args.level is not None:
+        with np.load(os.path.join(luts_dir, "lut_bowl_alpha.npz")) as data:
+            if data["alpha"].shape[1] != args.level:
+                print(f"Error: No {args.level} px LUT pyramid level in {luts_dir}. Check LUT_PYRAMID_LEVELS.")
+                sys.exit(1)
     output_dir = os.path.join("data", "gpu_assets")
     os.makedirs(output_dir, exist_ok=True)
 
     cameras = ['Front', 'Back', 'Left', 'Right']
     weights = []
+    crops = {}
 
     for cam in cameras:
         npz_path = os.path.join(luts_dir, f"lut_bowl_Cam_{cam}.npz")
@@ -30,10 +64,12 @@ def main():
         map_x = data['map_x']
         map_y = data['map_y']
         weight = data['weight']
+        crops[cam] = data['src_crop'] if 'src_crop' in data.files else None
+        tex_width, tex_height = texture_size(crops[cam])
 
         # 1. Normalize Pixel Coordinates to UV (0.0 - 1.0)
-        uv_u = (map_x / FISHEYE_WIDTH).astype(np.float32)
-        uv_v = (map_y / FISHEYE_HEIGHT).astype(np.float32)
+        uv_u = normalize_uv(map_x, tex_width, args.input_scale)
+        uv_v = normalize_uv(map_y, tex_height, args.input_scale)
 
         # Build a 2-channel Float32 image (RG16F or RG32F)
         lut_texture = np.dstack((uv_u, uv_v))
@@ -56,10 +92,45 @@ def main():
     out_blend = os.path.join(output_dir, "blend_mask.bin")
     blend_mask.tofile(out_blend)
 
+    # 3. Top-K LUTs: one RGBA texture per slot (R,G = UV, B = weight, A = camera layer index)
+    # so the shader does K fetches for any number of cameras (svm_bowl_topk.frag)
+    topk_path = os.path.join(luts_dir, "lut_bowl_topk.npz")
+    topk_meta = []
+    if os.path.exists(topk_path):
+        print("Packing top-K camera-per-pixel LUTs...")
+        data = np.load(topk_path)
+        cam_ids = data['cam_ids']
+        # Array layers share one size: cropped frames sit top-left in a layer as large as the biggest crop
+        layer_sizes = [texture_size(crop) for crop in data['src_crops']] if 'src_crops' in data.files \
+            else [texture_size(None)]
+        layer_width = max(size[0] for size in layer_sizes)
+        layer_height = max(size[1] for size in layer_sizes)
+        for s in range(cam_ids.shape[0]):
+            slot_texture = np.dstack((
+                normalize_uv(data['map_x'][s], layer_width, args.input_scale),
+                normalize_uv(data['map_y'][s], layer_height, args.input_scale),
+                data['weight'][s].astype(np.float32),
+                # Empty slots (weight 0) keep layer 0 and contribute nothing
+                np.where(cam_ids[s] == 255, 0, cam_ids[s]).astype(np.float32),
+            ))
+            slot_texture.tofile(os.path.join(output_dir, f"lut_topk_{s}.bin"))
+        topk_meta = [
+            f"TOPK={cam_ids.shape[0]}\n",
+            f"TOPK_CAMERAS={','.join(str(cam) for cam in data['cameras'])}\n",
+        ]
+    else:
+        print(f"Skipping top-K assets ({topk_path} not found)")
+
     # Save meta info (like resolution) to help the C++/Python GPU renderer know the shape
     with open(os.path.join(output_dir, "meta.txt"), "w") as f:
         f.write(f"LUT_WIDTH={blend_mask.shape[1]}\n")
         f.write(f"LUT_HEIGHT={blend_mask.shape[0]}\n")
+        f.write(f"INPUT_SCALE={args.input_scale}\n")
+        # Full-resolution source crops, the renderer uploads only these boxes of each frame
+        for cam, crop in crops.items():
+            if crop is not None:
+                f.write(f"CROP_{cam}={','.join(str(int(v)) for v in crop)}\n")
+        f.writelines(topk_meta)
 
     print(f"Done! GPU binary assets saved to {output_dir}")
 
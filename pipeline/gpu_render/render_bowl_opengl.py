@@ -10,6 +10,17 @@ WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 WINDOW_TITLE = "Open-3D-Surround-View: GPU Renderer Preview"
 
+# Sample only the top-K cameras per pixel (svm_bowl_topk.frag + lut_topk_*.bin from export_gpu_assets.py)
+USE_TOPK_LUT = False
+
+# Decode flags for camera textures exported with export_gpu_assets.py --input-scale N
+REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
 def load_text(filename):
     with open(filename, 'r') as f:
         return f.read()
@@ -24,15 +35,16 @@ def compile_custom_shader(vert_path, frag_path):
     )
     return shader_program
 
-def create_texture_from_data(img_data, is_float=False):
+def create_texture_from_data(img_data, is_float=False, nearest=False):
     tex_id = glGenTextures(1)
     glBindTexture(GL_TEXTURE_2D, tex_id)
     
-    # Texture wrapping & filtering
+    # Texture wrapping & filtering (camera indices must not be interpolated, hence nearest)
+    tex_filter = GL_NEAREST if nearest else GL_LINEAR
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, tex_filter)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, tex_filter)
     
     height, width = img_data.shape[:2]
     ch = img_data.shape[2] if len(img_data.shape) == 3 else 1
@@ -54,13 +66,15 @@ def create_texture_from_data(img_data, is_float=False):
     
     # Ensure memory is contiguous C-style array before passing to C++ level OpenGL
     img_data = np.ascontiguousarray(img_data)
+    # Rows of cropped / reduced camera frames are not necessarily 4-byte aligned
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
     
     glTexImage2D(GL_TEXTURE_2D, 0, internal_format, width, height, 0, input_format, data_type, img_data)
     
     glBindTexture(GL_TEXTURE_2D, 0)
     return tex_id
 
-def load_binary_texture(filepath, shape, is_float=True):
+def load_binary_texture(filepath, shape, is_float=True, nearest=False):
     dtype = np.float32 if is_float else np.uint8
     data = np.fromfile(filepath, dtype=dtype)
     data = data.reshape(shape)
@@ -69,14 +83,73 @@ def load_binary_texture(filepath, shape, is_float=True):
     # conflicts with OpenGL origin (bottom-left)
     data = np.flipud(data)
     
-    return create_texture_from_data(data, is_float=is_float)
+    return create_texture_from_data(data, is_float=is_float, nearest=nearest)
+
+def load_meta(filepath):
+    meta = {}
+    with open(filepath, 'r') as f:
+        for line in f:
+            key, _, value = line.strip().partition('=')
+            if key:
+                meta[key] = value
+    return meta
+
+def load_crop(meta, cam, input_scale=1):
+    # Source box [y0, y1, x0, x1] the LUTs of cam read (export_gpu_assets.py), at the upload resolution
+    if f"CROP_{cam}" not in meta:
+        return None
+    y0, y1, x0, x1 = (int(v) for v in meta[f"CROP_{cam}"].split(','))
+    return y0 // input_scale, -(-y1 // input_scale), x0 // input_scale, -(-x1 // input_scale)
+
+def crop_image(img, crop):
+    if crop is None:
+        return img
+    y0, y1, x0, x1 = crop
+    return img[y0:y1, x0:x1]
+
+def create_camera_texture_array(filepaths, input_scale=1, crops=None):
+    # Stack all camera frames into one GL_TEXTURE_2D_ARRAY so the top-K shader can pick a layer per pixel
+    crops = crops or [None] * len(filepaths)
+    images = []
+    for filepath, crop in zip(filepaths, crops):
+        img = cv2.imread(filepath, REDUCED_READ_FLAGS[input_scale])
+        if img is None:
+            print(f"Warning: Could not load {filepath}")
+            img = np.full((512, 512, 3), (255, 0, 255), dtype=np.uint8)
+            crop = None
+        images.append(cv2.cvtColor(crop_image(img, crop), cv2.COLOR_BGR2RGB))
+
+    if crops[0] is not None:
+        # Cropped frames sit top-left in layers as large as the biggest crop (the UVs are exported that way)
+        height = max(img.shape[0] for img in images)
+        width = max(img.shape[1] for img in images)
+        data = np.zeros((len(images), height, width, 3), dtype=np.uint8)
+        for layer, img in zip(data, images):
+            layer[:img.shape[0], :img.shape[1]] = img
+    else:
+        # Layers must share one size; resize stragglers to the first camera's resolution
+        height, width = images[0].shape[:2]
+        images = [img if img.shape[:2] == (height, width) else cv2.resize(img, (width, height)) for img in images]
+        data = np.ascontiguousarray(np.stack(images))
 
-def load_camera_texture(filepath):
-    img = cv2.imread(filepath)
+    tex_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D_ARRAY, tex_id)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_RGB, width, height, len(images), 0, GL_RGB, GL_UNSIGNED_BYTE, data)
+    glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+    return tex_id
+
+def load_camera_texture(filepath, input_scale=1, crop=None):
+    img = cv2.imread(filepath, REDUCED_READ_FLAGS[input_scale])
     if img is None:
         print(f"Warning: Could not load {filepath}")
         return create_texture_from_data(np.full((512, 512, 3), (255, 0, 255), dtype=np.uint8))
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    # Upload only the source box the LUT samples (about a third of a fisheye frame)
+    img = cv2.cvtColor(crop_image(img, crop), cv2.COLOR_BGR2RGB)
     
     # Flip to align OpenCV image coordinates with OpenGL Texture coords
     # Wait, we'll NOT flip the raw images because the map_y from the mathematical LUT natively targets Top-Left!
@@ -163,7 +236,7 @@ def main():
     
     shader_program = compile_custom_shader(
         os.path.join(script_dir, "shaders", "svm_bowl.vert"),
-        os.path.join(script_dir, "shaders", "svm_bowl.frag")
+        os.path.join(script_dir, "shaders", "svm_bowl_topk.frag" if USE_TOPK_LUT else "svm_bowl.frag")
     )
 
     print("Loading 3D Bowl Geometry...")
@@ -200,31 +273,59 @@ def main():
     gpu_assets_dir = os.path.join(proj_root, "data", "gpu_assets")
     sample_dir = os.path.join(proj_root, "data", "sample")
 
-    lut_shape = (1000, 1000, 2)
-    tex_lut_front = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Front.bin"), lut_shape, True)
-    tex_lut_back  = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Back.bin"), lut_shape, True)
-    tex_lut_left  = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Left.bin"), lut_shape, True)
-    tex_lut_right = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Right.bin"), lut_shape, True)
+    meta = load_meta(os.path.join(gpu_assets_dir, "meta.txt"))
+    # The LUT UVs were normalized for camera textures at this reduced resolution
+    input_scale = int(meta.get("INPUT_SCALE", 1))
+
+    if USE_TOPK_LUT:
+        if meta.get("TOPK") != "2":
+            print("Error: svm_bowl_topk.frag expects 2 top-K slots. Re-run export_gpu_assets.py with TOPK_CAMERAS = 2.")
+            glfw.terminate()
+            return
+        lut_shape = (int(meta["LUT_HEIGHT"]), int(meta["LUT_WIDTH"]), 4)
+        # Layer order must follow the camera indices baked into the top-K LUT
+        topk_cameras = [cam.split('_')[-1] for cam in meta["TOPK_CAMERAS"].split(",")]
+        tex_cam_array = create_camera_texture_array(
+            [os.path.join(sample_dir, f"{cam.lower()}.jpg") for cam in topk_cameras],
+            input_scale,
+            [load_crop(meta, cam, input_scale) for cam in topk_cameras],
+        )
+        tex_lut_slots = [
+            load_binary_texture(os.path.join(gpu_assets_dir, f"lut_topk_{s}.bin"), lut_shape, True, nearest=True)
+            for s in range(2)
+        ]
+
+        glUseProgram(shader_program)
+        glUniform1i(glGetUniformLocation(shader_program, "cameraFrames"), 0)
+        glUniform1i(glGetUniformLocation(shader_program, "lutSlot0"), 1)
+        glUniform1i(glGetUniformLocation(shader_program, "lutSlot1"), 2)
+    else:
+        # Any LUT pyramid level can be exported, its size comes from meta.txt
+        lut_shape = (int(meta["LUT_HEIGHT"]), int(meta["LUT_WIDTH"]), 2)
+        tex_lut_front = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Front.bin"), lut_shape, True)
+        tex_lut_back  = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Back.bin"), lut_shape, True)
+        tex_lut_left  = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Left.bin"), lut_shape, True)
+        tex_lut_right = load_binary_texture(os.path.join(gpu_assets_dir, "lut_Right.bin"), lut_shape, True)
 
-    tex_blend_mask = load_binary_texture(os.path.join(gpu_assets_dir, "blend_mask.bin"), (1000, 1000, 4), True)
+        tex_blend_mask = load_binary_texture(os.path.join(gpu_assets_dir, "blend_mask.bin"), lut_shape[:2] + (4,), True)
 
-    tex_cam_front = load_camera_texture(os.path.join(sample_dir, "front.jpg"))
-    tex_cam_back  = load_camera_texture(os.path.join(sample_dir, "back.jpg"))
-    tex_cam_left  = load_camera_texture(os.path.join(sample_dir, "left.jpg"))
-    tex_cam_right = load_camera_texture(os.path.join(sample_dir, "right.jpg"))
+        tex_cam_front = load_camera_texture(os.path.join(sample_dir, "front.jpg"), input_scale, load_crop(meta, "Front", input_scale))
+        tex_cam_back  = load_camera_texture(os.path.join(sample_dir, "back.jpg"), input_scale, load_crop(meta, "Back", input_scale))
+        tex_cam_left  = load_camera_texture(os.path.join(sample_dir, "left.jpg"), input_scale, load_crop(meta, "Left", input_scale))
+        tex_cam_right = load_camera_texture(os.path.join(sample_dir, "right.jpg"), input_scale, load_crop(meta, "Right", input_scale))
 
-    glUseProgram(shader_program)
+        glUseProgram(shader_program)
     
-    # 9 Distinct Texture Units!
-    glUniform1i(glGetUniformLocation(shader_program, "textureFront"), 0)
-    glUniform1i(glGetUniformLocation(shader_program, "textureBack"), 1)
-    glUniform1i(glGetUniformLocation(shader_program, "textureLeft"), 2)
-    glUniform1i(glGetUniformLocation(shader_program, "textureRight"), 3)
-    glUniform1i(glGetUniformLocation(shader_program, "lutFront"), 4)
-    glUniform1i(glGetUniformLocation(shader_program, "lutBack"), 5)
-    glUniform1i(glGetUniformLocation(shader_program, "lutLeft"), 6)
-    glUniform1i(glGetUniformLocation(shader_program, "lutRight"), 7)
-    glUniform1i(glGetUniformLocation(shader_program, "blendMask"), 8)
+        # 9 Distinct Texture Units!
+        glUniform1i(glGetUniformLocation(shader_program, "textureFront"), 0)
+        glUniform1i(glGetUniformLocation(shader_program, "textureBack"), 1)
+        glUniform1i(glGetUniformLocation(shader_program, "textureLeft"), 2)
+        glUniform1i(glGetUniformLocation(shader_program, "textureRight"), 3)
+        glUniform1i(glGetUniformLocation(shader_program, "lutFront"), 4)
+        glUniform1i(glGetUniformLocation(shader_program, "lutBack"), 5)
+        glUniform1i(glGetUniformLocation(shader_program, "lutLeft"), 6)
+        glUniform1i(glGetUniformLocation(shader_program, "lutRight"), 7)
+        glUniform1i(glGetUniformLocation(shader_program, "blendMask"), 8)
 
     model_loc = glGetUniformLocation(shader_program, "model")
     view_loc = glGetUniformLocation(shader_program, "view")
@@ -239,17 +340,25 @@ def main():
     
     glUseProgram(shader_program)
 
-    # Bind 9 textures to their slots permanently for the loop
-    textures = [
-        (GL_TEXTURE0, tex_cam_front),    (GL_TEXTURE1, tex_cam_back),
-        (GL_TEXTURE2, tex_cam_left),     (GL_TEXTURE3, tex_cam_right),
-        (GL_TEXTURE4, tex_lut_front),    (GL_TEXTURE5, tex_lut_back),
-        (GL_TEXTURE6, tex_lut_left),     (GL_TEXTURE7, tex_lut_right),
-        (GL_TEXTURE8, tex_blend_mask)
-    ]
-    for tex_unit, tex_id in textures:
-        glActiveTexture(tex_unit)
-        glBindTexture(GL_TEXTURE_2D, tex_id)
+    if USE_TOPK_LUT:
+        # 3 texture units: the camera array plus one LUT per top-K slot
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, tex_cam_array)
+        for unit, tex_id in enumerate(tex_lut_slots, start=1):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            glBindTexture(GL_TEXTURE_2D, tex_id)
+    else:
+        # Bind 9 textures to their slots permanently for the loop
+        textures = [
+            (GL_TEXTURE0, tex_cam_front),    (GL_TEXTURE1, tex_cam_back),
+            (GL_TEXTURE2, tex_cam_left),     (GL_TEXTURE3, tex_cam_right),
+            (GL_TEXTURE4, tex_lut_front),    (GL_TEXTURE5, tex_lut_back),
+            (GL_TEXTURE6, tex_lut_left),     (GL_TEXTURE7, tex_lut_right),
+            (GL_TEXTURE8, tex_blend_mask)
+        ]
+        for tex_unit, tex_id in textures:
+            glActiveTexture(tex_unit)
+            glBindTexture(GL_TEXTURE_2D, tex_id)
 
     num_frames = 1000
     start_time = time.time()
@@ -0,0 +1,48 @@
+#version 330 core
+
+out vec4 FragColor;
+
+in vec2 TexCoord;
+in vec3 FragPos;
+in vec3 Normal;
+
+// All raw fisheye camera frames as layers of one texture array (layer = top-K camera index)
+uniform sampler2DArray cameraFrames;
+
+// Top-K LUT slots: RG = camera UV, B = blend weight, A = camera layer (NEAREST filtered)
+uniform sampler2D lutSlot0;
+uniform sampler2D lutSlot1;
+
+// Basic lighting (Virtual Sun/Dome light for reflections/shading)
+uniform vec3 viewPos; // Camera position
+
+vec4 sampleSlot(sampler2D lutSlot)
+{
+    vec4 slot = texture(lutSlot, TexCoord);
+    // Empty slots carry weight 0, skip the camera fetch entirely
+    if (slot.b == 0.0) return vec4(0.0);
+    return texture(cameraFrames, vec3(slot.rg, floor(slot.a + 0.5))) * slot.b;
+}
+
+void main()
+{
+    // K = 2 fetches per fragment regardless of how many cameras the vehicle has
+    vec4 baseColor = sampleSlot(lutSlot0) + sampleSlot(lutSlot1);
+
+    // Calculate basic lighting with the vertex normals
+    vec3 norm = normalize(Normal);
+    vec3 lightDir = normalize(vec3(0.0, 0.0, 10.0)); // Fake light from straight above
+
+    // Ambient light
+    float ambientStrength = 0.8;
+    vec3 ambient = ambientStrength * vec3(1.0);
+
+    // Diffuse light
+    float diff = max(dot(norm, lightDir), 0.0);
+    vec3 diffuse = diff * vec3(0.3);
+
+    // Combine lighting with the texture base color
+    vec3 finalRGB = (ambient + diffuse) * baseColor.rgb;
+
+    FragColor = vec4(finalRGB, baseColor.a);
+}
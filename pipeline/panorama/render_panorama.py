@@ -0,0 +1,103 @@
+"""
+Module: render_panorama.py
+
+This module provides the simulated real-time render loop of the 360° cylindrical panorama.
+
+A panorama frame is a single composite pass over the LUTs written by stitching_panorama.py,
+with whichever compositor backend COMPOSITOR_MODE selects; no 3D rendering is involved.
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import backends, reduced_input, source_crop, yuv
+
+luts_dir = os.path.join(base_dir, "data/panorama/luts")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+output_path = os.path.join(base_dir, "data/panorama/realtime_demo_panorama.png")
+
+cameras = config.CAMERAS
+compositor_mode = backends.resolve_mode(config.COMPOSITOR_MODE, luts_dir)
+# The sparse compositor reads the packed twin LUTs written next to the dense ones
+lut_suffix = "_sparse" if compositor_mode == "sparse" else ""
+# Backends consuming a combined table from the stitching stage: (file, prepare kwarg)
+combined_luts = {
+    "regions": ("lut_pano_regions.npz", "partition"),
+    "topk": ("lut_pano_topk.npz", "topk_lut"),
+}
+
+print("Loading pre-computed panorama LUTs...")
+prepare_kwargs = {}
+if compositor_mode in combined_luts:
+    filename, kwarg = combined_luts[compositor_mode]
+    combined_path = os.path.join(luts_dir, filename)
+    if not os.path.exists(combined_path):
+        print(f"Error: Missing {combined_path}. Re-run stitching_panorama.py to generate it.")
+        sys.exit(1)
+    with np.load(combined_path) as data:
+        prepare_kwargs[kwarg] = {key: data[key] for key in data.files}
+
+luts = {}
+if compositor_mode != "topk":
+    for cam in cameras:
+        lut_path = os.path.join(luts_dir, f"lut_pano_{cam}{lut_suffix}.npz")
+        if not os.path.exists(lut_path):
+            print(f"Error: Missing panorama LUT for {cam}. Run stitching_panorama.py first.")
+            sys.exit(1)
+        with np.load(lut_path) as data:
+            luts[cam] = {key: data[key] for key in data.files}
+
+luts, prepare_kwargs = reduced_input.rescale_luts(luts, prepare_kwargs, config.INPUT_SCALE)
+crops = source_crop.lut_crops(luts, prepare_kwargs, cameras)
+
+backend = backends.prepare_backend(compositor_mode, luts, cameras, **prepare_kwargs)
+
+
+def load_frames():
+    loaded = {}
+    for cam in cameras:
+        frame = reduced_input.read_frame(
+            os.path.join(images_dir, f"{cam}.png"), config.INPUT_SCALE
+        )
+        if crops is not None:
+            frame = source_crop.crop_frame(frame, crops[cam])
+        if compositor_mode == "yuv":
+            # Stand-in for a V4L2 camera delivering NV12 / YUYV
+            frame = yuv.from_bgr(frame, config.YUV_INPUT_FORMAT)
+        loaded[cam] = frame
+    return loaded
+
+
+frames = load_frames()
+
+NUM_FRAMES = 50
+print(f"\nStarting simulated Real-Time panorama loop ({compositor_mode} compositor)...")
+start_time = time.time()
+
+for i in range(NUM_FRAMES):
+    panorama = backends.composite(backend, frames)
+
+end_time = time.time()
+fps = NUM_FRAMES / (end_time - start_time)
+backends.release(backend)
+
+height, width = panorama.shape[:2]
+if panorama.ndim == 2:
+    # NV12 strip (YUV_OUTPUT_FORMAT = "nv12"), converted only for the PNG dump
+    panorama = cv2.cvtColor(panorama, cv2.COLOR_YUV2BGR_NV12)
+    height = height * 2 // 3
+print(f"Composited a {width}x{height} 360° panorama per pass.")
+print(f"Performance: {fps:.2f} Frames Per Second (FPS) in Python")
+
+cv2.imwrite(output_path, panorama)
+print(f"Output saved to: {output_path}")
@@ -0,0 +1,194 @@
+"""
+Module: stitching_panorama.py
+
+This module provides the 360° cylindrical panorama projection target.
+
+Every pixel of the strip is a point on a vertical cylinder of PANORAMA_RADIUS meters around
+the car centre. Points are projected into the fisheye cameras exactly like the BEV and bowl
+targets, blended with the same radial feathering, and saved in the same LUT formats (dense,
+sparse, region partition, top-K), so render_panorama.py produces a panorama frame with one
+composite pass of any compositor backend.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import config
+from pipeline.compositor import projection, regions, source_crop, sparse_lut, topk
+
+PANORAMA_WIDTH = config.PANORAMA_WIDTH
+PANORAMA_RADIUS = config.PANORAMA_RADIUS
+Z_RANGE = config.PANORAMA_Z_RANGE
+# Undistorted aspect ratio: as many pixels per meter vertically as around the circumference
+# (rounded to an even height for the 4:2:0 YUV compositor)
+PANORAMA_HEIGHT = 2 * int(
+    round(PANORAMA_WIDTH * (Z_RANGE[1] - Z_RANGE[0]) / (2 * np.pi * PANORAMA_RADIUS) / 2)
+)
+
+intrinsic_params_path = os.path.join(
+    base_dir, "data/calibration/intrinsic/params/intrinsic_params.npz"
+)
+extrinsic_dir = os.path.join(base_dir, "data/calibration/extrinsic/params")
+images_dir = os.path.join(base_dir, "data/calibration/extrinsic/images")
+
+output_dir = os.path.join(base_dir, "data/panorama")
+luts_dir = os.path.join(output_dir, "luts")
+os.makedirs(output_dir, exist_ok=True)
+os.makedirs(luts_dir, exist_ok=True)
+
+# Load intrinsics
+if not os.path.exists(intrinsic_params_path):
+    print(f"Error: Intrinsic parameters not found at {intrinsic_params_path}")
+    sys.exit(1)
+
+with np.load(intrinsic_params_path) as data:
+    K = data["K"]
+    D = data["D"]
+
+cameras = config.CAMERAS
+
+print(f"Initializing {PANORAMA_WIDTH}x{PANORAMA_HEIGHT} cylindrical mapping grid...")
+u, v = np.meshgrid(np.arange(PANORAMA_WIDTH), np.arange(PANORAMA_HEIGHT))
+
+# In automotive standard (X forward, Y left): the centre column looks forward, columns to its
+# left sweep counter-clockwise over the left side, both edges meet behind the car
+theta = np.pi - 2.0 * np.pi * (u + 0.5) / PANORAMA_WIDTH
+X = PANORAMA_RADIUS * np.cos(theta)
+Y = PANORAMA_RADIUS * np.sin(theta)
+# Row 0 is the top of the wall
+Z = Z_RANGE[1] - (v + 0.5) * (Z_RANGE[1] - Z_RANGE[0]) / PANORAMA_HEIGHT
+
+points = np.stack((X, Y, Z), axis=-1)
+
+pano_image_float = np.zeros((PANORAMA_HEIGHT, PANORAMA_WIDTH, 3), dtype=np.float32)
+blend_weights = np.zeros((PANORAMA_HEIGHT, PANORAMA_WIDTH), dtype=np.float32)
+
+camera_maps = {}  # Dictionary to store data for LUTs
+
+print("\nProcessing cameras for the 360° panorama:")
+for cam in cameras:
+    ext_path = os.path.join(extrinsic_dir, f"extrinsic_{cam}.npz")
+    img_path = os.path.join(images_dir, f"{cam}.png")
+
+    if not os.path.exists(ext_path) or not os.path.exists(img_path):
+        print(f"  [Skip] {cam} (Missing data files)")
+        continue
+
+    with np.load(ext_path) as edata:
+        rvec = edata["rvec"]
+        tvec = edata["tvec"]
+
+    img = cv2.imread(img_path)
+    print(f"  [Procesing] {cam}: Projecting the cylinder wall...")
+
+    # 1-2. Project the cylinder wall onto the camera's 2D image plane (with its depth, to cull
+    # points behind the lens)
+    map_x, map_y, z_cam = projection.project_grid(points, rvec, tvec, K, D)
+
+    # 3. Pull colors from original images based on mapping for the static preview
+    warped = cv2.remap(
+        img,
+        map_x,
+        map_y,
+        cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(0, 0, 0),
+    )
+
+    # 4. Generate Spatial Blend Weighting Mask (same feathering as the BEV and bowl targets)
+    weight = projection.feather_weight(map_x, map_y, z_cam, img.shape, config.MASK_RADIUS_SCALE)
+
+    # 5. Accumulate colors
+    for c in range(3):
+        pano_image_float[..., c] += warped[..., c].astype(np.float32) * weight
+    blend_weights += weight
+
+    # Store parameters for LUT generation
+    camera_maps[cam] = {
+        "map_x": map_x,
+        "map_y": map_y,
+        "weight": weight,
+        "frame_shape": img.shape[:2],
+    }
+
+print("\nFinalizing stitching overlap logic...")
+valid_pixels = blend_weights > 0
+for c in range(3):
+    pano_image_float[..., c][valid_pixels] /= blend_weights[valid_pixels]
+
+pano_image = np.clip(pano_image_float, 0, 255).astype(np.uint8)
+
+print("\nGenerating and saving optimized LUTs for Real-Time panorama rendering...")
+# Pre-divide the weights here so the real-time render loop avoids floating point division
+safe_blend_weights = np.maximum(blend_weights, 1e-6)
+
+norm_weights = {}
+cropped_maps = {}
+for cam, maps in camera_maps.items():
+    norm_weight = maps["weight"] / safe_blend_weights
+    norm_weight[maps["weight"] == 0] = 0.0
+
+    # Only the source box this camera's LUT actually reads is kept at render time;
+    # source coordinates are stored relative to it
+    src_crop = source_crop.footprint_crop(
+        maps["map_x"], maps["map_y"], norm_weight, maps["frame_shape"]
+    )
+    crop_x, crop_y = source_crop.offset_maps(maps["map_x"], maps["map_y"], src_crop)
+    cropped_maps[cam] = {"map_x": crop_x, "map_y": crop_y, "src_crop": src_crop}
+
+    lut_path = os.path.join(luts_dir, f"lut_pano_{cam}.npz")
+    np.savez_compressed(
+        lut_path, map_x=crop_x, map_y=crop_y, weight=norm_weight, src_crop=src_crop
+    )
+    print(f"  Saved panorama LUT -> {lut_path}")
+
+    # Sparse twin: only the pixels this camera actually contributes to
+    sparse_path = os.path.join(luts_dir, f"lut_pano_{cam}_sparse.npz")
+    np.savez_compressed(
+        sparse_path,
+        **sparse_lut.pack_sparse_lut(crop_x, crop_y, norm_weight),
+        src_crop=src_crop,
+    )
+    print(f"  Saved sparse panorama LUT -> {sparse_path}")
+    y0, y1, x0, x1 = src_crop
+    print(
+        f"  Source crop -> x {x0}:{x1}, y {y0}:{y1} "
+        f"({source_crop.crop_fraction(src_crop, maps['frame_shape']) * 100:.1f}% of the frame)"
+    )
+
+    norm_weights[cam] = norm_weight
+
+# Partition the strip into exclusive single-camera regions and overlap bands
+partition = regions.partition_regions(norm_weights, list(camera_maps))
+regions_path = os.path.join(luts_dir, "lut_pano_regions.npz")
+np.savez_compressed(regions_path, **partition)
+copy_px, scaled_px, blend_px = regions.region_shares(partition)
+print(
+    f"  Saved region partition -> {regions_path} (copy: {copy_px * 100:.1f}%, "
+    f"scaled copy: {scaled_px * 100:.1f}%, blend: {blend_px * 100:.1f}% of strip)"
+)
+
+# Top-K camera-per-pixel LUT: a single table whose per-frame cost does not grow with camera count
+topk_lut = topk.build_topk_lut(
+    {
+        cam: {**cropped_maps[cam], "weight": norm_weights[cam]}
+        for cam in camera_maps
+    },
+    list(camera_maps),
+    k=config.TOPK_CAMERAS,
+)
+topk_path = os.path.join(luts_dir, "lut_pano_topk.npz")
+np.savez_compressed(topk_path, **topk_lut)
+print(f"  Saved top-{config.TOPK_CAMERAS} camera LUT -> {topk_path}")
+
+output_path = os.path.join(output_dir, "panorama.png")
+cv2.imwrite(output_path, pano_image)
+print(f"\nSUCCESS: 360° panorama successfully rendered to {output_path}")
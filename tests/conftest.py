@@ -0,0 +1,38 @@
+"""
+Shared fixtures of the compositor regression tests (see scene.py for the synthetic rig).
+"""
+
+import os
+import sys
+
+import pytest
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+import scene
+
+
+@pytest.fixture
+def cameras():
+    return list(scene.CAMERAS)
+
+
+@pytest.fixture
+def luts():
+    return scene.make_luts()
+
+
+@pytest.fixture
+def frames():
+    return scene.make_frames()
+
+
+@pytest.fixture
+def reference(luts, frames, cameras):
+    """Output of the float32 reference compositor."""
+    from pipeline.compositor import backends
+
+    return backends.composite(backends.prepare_backend("float", luts, cameras), frames).copy()
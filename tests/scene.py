@@ -0,0 +1,69 @@
+"""
+Synthetic surround rig shared by the compositor regression tests.
+
+Four cameras whose feathered, pre-normalized blend weights overlap along the canvas diagonals,
+with smooth source maps strictly inside the frames, so every backend can be checked against the
+float reference without running the Blender capture and stitching stages first.
+"""
+
+import numpy as np
+
+CAMERAS = ["Cam_Front", "Cam_Left", "Cam_Back", "Cam_Right"]
+CANVAS_SHAPE = (60, 80)
+FRAME_SHAPE = (96, 128)
+
+
+def make_luts(cameras=CAMERAS, canvas_shape=CANVAS_SHAPE, frame_shape=FRAME_SHAPE, seed=0):
+    """Dense LUTs {camera: {map_x, map_y, weight}} of a synthetic surround rig."""
+    rng = np.random.default_rng(seed)
+    height, width = canvas_shape
+    v, u = np.meshgrid(
+        np.linspace(-1.0, 1.0, height), np.linspace(-1.0, 1.0, width), indexing="ij"
+    )
+    # Each camera owns the canvas sector towards one edge and feathers into its neighbours
+    # along the diagonals; the centre stays uncovered like the car footprint
+    facing = {0: (-v, u), 1: (-u, v), 2: (v, u), 3: (u, v)}
+    outside_car = np.maximum(np.abs(u), np.abs(v)) > 0.15
+    raw = {}
+    maps = {}
+    for c, cam in enumerate(cameras):
+        towards, across = facing[c % 4]
+        feather = np.clip(2.0 * (towards - np.abs(across)) + 0.5, 0.0, 1.0)
+        raw[cam] = (feather * outside_car).astype(np.float32)
+        angle = rng.uniform(-0.3, 0.3)
+        bend = rng.uniform(-0.1, 0.1)
+        x = np.cos(angle) * u - np.sin(angle) * v + bend * v**2
+        y = np.sin(angle) * u + np.cos(angle) * v + bend * u**2
+        # Keep every sample (and its bilinear neighbour) inside the frame
+        map_x = (x - x.min()) / np.ptp(x) * (frame_shape[1] - 2.5) + 0.5
+        map_y = (y - y.min()) / np.ptp(y) * (frame_shape[0] - 2.5) + 0.5
+        maps[cam] = (map_x.astype(np.float32), map_y.astype(np.float32))
+
+    total = sum(raw.values())
+    luts = {}
+    for cam in cameras:
+        weight = np.divide(raw[cam], total, out=np.zeros_like(total), where=total > 0)
+        luts[cam] = {"map_x": maps[cam][0], "map_y": maps[cam][1], "weight": weight}
+    return luts
+
+
+def make_frames(cameras=CAMERAS, frame_shape=FRAME_SHAPE, seed=1):
+    """Smooth BGR test frames with some texture, one per camera."""
+    rng = np.random.default_rng(seed)
+    height, width = frame_shape
+    y, x = np.mgrid[:height, :width].astype(np.float32)
+    frames = {}
+    for cam in cameras:
+        phase = rng.uniform(0.0, 2.0 * np.pi, 3)
+        frame = np.stack(
+            [128 + 100 * np.sin(x / (7 + 3 * k) + y / (11 + 2 * k) + phase[k]) for k in range(3)],
+            axis=-1,
+        )
+        frame += rng.normal(0.0, 8.0, frame.shape)
+        frames[cam] = np.clip(frame, 0, 255).astype(np.uint8)
+    return frames
+
+
+def max_error(output, reference):
+    """Largest per-pixel, per-channel deviation between two uint8 images."""
+    return int(np.abs(output.astype(np.int16) - reference.astype(np.int16)).max())
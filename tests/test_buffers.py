@@ -0,0 +1,28 @@
+import pytest
+
+import scene
+from scene import max_error
+from pipeline.compositor import backends, benchmark, yuv
+
+# Large enough that a per-frame uint8 canvas (900 KB) stands out from NumPy's ufunc buffers
+CANVAS_SHAPE = (480, 640)
+
+
+@pytest.mark.parametrize("name", list(backends.BACKENDS))
+def test_reused_buffers_allocate_nothing_per_frame(name, cameras):
+    luts = scene.make_luts(canvas_shape=CANVAS_SHAPE)
+    frames = scene.make_frames()
+    if name == "yuv":
+        frames = {cam: yuv.from_bgr(frame, "nv12") for cam, frame in frames.items()}
+
+    fresh = backends.prepare_backend(name, luts, cameras, reuse_buffers=False)
+    expected = backends.composite(fresh, frames).copy()
+    backends.release(fresh)
+
+    backend = backends.prepare_backend(name, luts, cameras)
+    peak, _ = benchmark.measure_allocations(lambda i: backends.composite(backend, frames))
+    output = backends.composite(backend, frames)
+    backends.release(backend)
+
+    assert max_error(output, expected) == 0
+    assert peak < 256 * 1024
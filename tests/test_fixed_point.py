@@ -0,0 +1,18 @@
+import numpy as np
+
+from scene import max_error
+from pipeline.compositor import backends, fixed_point
+
+
+def test_fixed_matches_float_within_one_lsb(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("fixed", luts, cameras)
+    assert max_error(backends.composite(backend, frames), reference) <= 1
+
+
+def test_quantized_weights_sum_to_one_on_covered_pixels(luts, cameras):
+    weights = {cam: luts[cam]["weight"] for cam in cameras}
+    quantized = fixed_point.quantize_weights(weights)
+    total = sum(weights.values())
+    q_total = sum(q.astype(np.int32) for q in quantized.values())
+    assert np.all(q_total[total > 0] == fixed_point.WEIGHT_ONE)
+    assert np.all(q_total[total == 0] == 0)
@@ -0,0 +1,12 @@
+import pytest
+
+from scene import max_error
+from pipeline.compositor import backends
+
+pytest.importorskip("numba")
+
+
+def test_numba_matches_float(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("numba", luts, cameras)
+    assert max_error(backends.composite(backend, frames), reference) == 0
+    backends.release(backend)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import scene
+from pipeline.compositor import backends, gain_comp, yuv
+
+GAINS = np.array([1.5, 0.8, 1.2, 1.0])
+BGR_BACKENDS = [name for name in backends.BACKENDS if name != "yuv"]
+
+
+def flat_frames(cameras, value):
+    return {cam: np.full(scene.FRAME_SHAPE + (3,), value, dtype=np.uint8) for cam in cameras}
+
+
+@pytest.mark.parametrize("name", BGR_BACKENDS)
+def test_gained_weights_saturate_instead_of_wrapping(name, luts, cameras):
+    gained, kwargs = gain_comp.scale_luts(luts, {}, cameras, GAINS)
+    total = sum(gained[cam]["weight"] for cam in cameras)
+    # Every map stays inside its frame, so each covered pixel reads exactly 200
+    expected = np.floor(np.minimum(200.0 * total, 255.0))
+
+    backend = backends.prepare_backend(name, gained, cameras, **kwargs)
+    output = backends.composite(backend, flat_frames(cameras, 200)).astype(np.float64)
+    backends.release(backend)
+
+    assert np.abs(output - expected[..., np.newaxis]).max() <= 2
+    assert output.max() == 255
+
+
+def test_yuv_gains_keep_grey_neutral(luts, cameras):
+    gained, _ = gain_comp.scale_luts(luts, {}, cameras, GAINS)
+    frames = {
+        cam: yuv.from_bgr(frame, "nv12") for cam, frame in flat_frames(cameras, 120).items()
+    }
+    backend = backends.prepare_backend("yuv", gained, cameras, output_format="nv12")
+    nv12 = backends.composite(backend, frames)
+
+    height = scene.CANVAS_SHAPE[0]
+    luma = nv12[:height].astype(np.float64)
+    total = sum(gained[cam]["weight"] for cam in cameras)
+    # Gains apply around video black: 16 + g * (Y - 16)
+    grey = frames[cameras[0]][0, 0]
+    expected = np.clip(yuv.LUMA_BLACK + total * (grey - yuv.LUMA_BLACK), 0, 255)
+    assert np.abs(luma - expected).max() <= 1
+    assert np.abs(nv12[height:].astype(np.int16) - yuv.CHROMA_NEUTRAL).max() <= 1
+
+
+def test_compensator_applies_gains_around_unit_mean(luts, frames, cameras):
+    maps = {cam: (luts[cam]["map_x"], luts[cam]["map_y"]) for cam in cameras}
+    weights = {cam: luts[cam]["weight"] for cam in cameras}
+    samples = gain_comp.overlap_samples(maps, weights, cameras, 256)
+    # The front camera is under-exposed
+    frames = dict(frames)
+    frames[cameras[0]] = (frames[cameras[0]] * 0.8).astype(np.uint8)
+
+    compensator = gain_comp.GainCompensator(
+        samples, cameras, None, lambda gains: gains, rate=10.0, smoothing=1.0
+    )
+    for step in range(3):
+        compensator.update(frames, step * 0.1)
+    compensator.close()
+
+    applied = compensator.applied
+    assert applied.mean() == pytest.approx(1.0)
+    assert applied[0] > 1.0 and applied[0] == applied.max()
+    assert compensator.stats["error_after"] < compensator.stats["error_before"]
@@ -0,0 +1,52 @@
+from scene import max_error
+from pipeline.compositor import backends
+
+TILE_SIZE = 10
+
+
+def float_render(luts, frames, cameras):
+    return backends.composite(backends.prepare_backend("float", luts, cameras), frames)
+
+
+def prepare(luts, cameras):
+    backend = backends.prepare_backend("incremental", luts, cameras, tile_size=TILE_SIZE)
+    return backend, backend["prepared"]
+
+
+def dirty_tiles(prepared, step):
+    before = prepared["dirty_tiles"]
+    step()
+    return prepared["dirty_tiles"] - before
+
+
+def test_changed_camera_recomposites_only_its_tiles(luts, frames, cameras, reference):
+    backend, prepared = prepare(luts, cameras)
+    assert max_error(backends.composite(backend, frames), reference) == 0
+    assert dirty_tiles(prepared, lambda: backends.composite(backend, frames)) == 0
+
+    # Every sample of the front camera moves by half the value range
+    changed = dict(frames)
+    changed[cameras[0]] = frames[cameras[0]] ^ 0x80
+    owned = sum(any(cam == cameras[0] for cam, *_ in tile[4]) for tile in prepared["tiles"])
+    output = []
+    count = dirty_tiles(prepared, lambda: output.append(backends.composite(backend, changed)))
+
+    assert 0 < owned < len(prepared["tiles"])
+    assert count == owned
+    assert max_error(output[0], float_render(luts, changed, cameras)) == 0
+
+
+def test_local_change_stays_local(luts, frames, cameras):
+    backend, prepared = prepare(luts, cameras)
+    backends.composite(backend, frames)
+
+    changed = dict(frames)
+    patch = frames[cameras[1]].copy()
+    patch[40:56, 56:72] = 255 - patch[40:56, 56:72]
+    changed[cameras[1]] = patch
+    output = []
+    count = dirty_tiles(prepared, lambda: output.append(backends.composite(backend, changed)))
+
+    owned = sum(any(cam == cameras[1] for cam, *_ in tile[4]) for tile in prepared["tiles"])
+    assert 0 < count < owned
+    assert max_error(output[0], float_render(luts, changed, cameras)) == 0
@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+
+from pipeline.compositor import backends, lut_pyramid, source_crop
+
+X_RANGE = (-5.0, 5.0)
+Y_RANGE = (-5.0, 5.0)
+FRAME_SHAPE = (96, 128)
+# Shared fisheye intrinsics: about 180 degrees across the frame height
+K = np.array([[30.0, 0.0, 64.0], [0.0, 30.0, 48.0], [0.0, 0.0, 1.0]])
+D = np.zeros((4, 1))
+# Camera position (X forward, Y left, Z up) and horizontal viewing direction
+RIG = {
+    "Cam_Front": ((2.0, 0.0, 1.0), (1.0, 0.0)),
+    "Cam_Left": ((0.0, 1.0, 1.0), (0.0, 1.0)),
+    "Cam_Back": ((-2.0, 0.0, 1.0), (-1.0, 0.0)),
+    "Cam_Right": ((0.0, -1.0, 1.0), (0.0, -1.0)),
+}
+
+
+def make_calibration(tilt=np.pi / 4):
+    """{camera: (rvec, tvec)} of a surround rig tilted towards the ground."""
+    calibration = {}
+    up = np.array([0.0, 0.0, 1.0])
+    for cam, (position, (dx, dy)) in RIG.items():
+        forward = np.array([dx * np.cos(tilt), dy * np.cos(tilt), -np.sin(tilt)])
+        right = np.cross(forward, up)
+        right /= np.linalg.norm(right)
+        rot = np.stack((right, np.cross(forward, right), forward))
+        rvec, _ = cv2.Rodrigues(rot)
+        calibration[cam] = (rvec, -rot @ np.array(position).reshape(3, 1))
+    return calibration
+
+
+def smooth_frames():
+    y, x = np.mgrid[: FRAME_SHAPE[0], : FRAME_SHAPE[1]].astype(np.float32)
+    frames = {}
+    for c, cam in enumerate(RIG):
+        frame = np.stack([128 + 90 * np.sin(x / (9 + c + 2 * k) + y / 13) for k in range(3)], -1)
+        frames[cam] = frame.astype(np.uint8)
+    return frames
+
+
+def level_luts(level, base_size):
+    X, Y = lut_pyramid.level_grid(level, base_size, X_RANGE, Y_RANGE)
+    points = np.stack((X, Y, np.zeros_like(X)), axis=-1)
+    shapes = {cam: FRAME_SHAPE for cam in RIG}
+    return lut_pyramid.build_level_luts(points, list(RIG), make_calibration(), K, D, shapes, 1.05)
+
+
+def render(luts, frames):
+    cameras = list(RIG)
+    crops = source_crop.lut_crops(luts, {}, cameras)
+    backend = backends.prepare_backend("float", luts, cameras)
+    return backends.composite(backend, source_crop.crop_frames(frames, crops)).copy()
+
+
+def test_base_level_reproduces_the_stitching_grid():
+    # The stitching scripts sample the base level at PIXELS_PER_METER = 100
+    X, Y = lut_pyramid.level_grid(1000, (1000, 1000), X_RANGE, Y_RANGE)
+    u, v = np.meshgrid(np.arange(1000), np.arange(1000))
+    np.testing.assert_array_equal(X, X_RANGE[1] - v / 100.0)
+    np.testing.assert_array_equal(Y, Y_RANGE[1] - u / 100.0)
+    assert lut_pyramid.level_dir("luts", 1000, 1000) == "luts"
+    assert lut_pyramid.select_level((250, 500, 1000, 2000), 1000) == 1000
+    assert lut_pyramid.select_level((250, 500, 1000, 2000), 600) == 1000
+    assert lut_pyramid.select_level((250, 500, 1000, 2000), 4000) == 2000
+
+
+def test_level_weights_stay_normalized():
+    luts = level_luts(100, (200, 200))
+    total = sum(lut["weight"] for lut in luts.values())
+    covered = total > 0
+    assert covered.mean() > 0.5
+    np.testing.assert_allclose(total[covered], 1.0, atol=1e-5)
+
+
+def test_smaller_level_matches_the_downscaled_base_level():
+    frames = smooth_frames()
+    luts = level_luts(100, (200, 200))
+    base = render(level_luts(200, (200, 200)), frames)
+    small = render(luts, frames)
+    # Both levels see the same ground, away from the coverage edges they render alike
+    covered = cv2.erode(
+        (sum(lut["weight"] for lut in luts.values()) > 0).astype(np.uint8), np.ones((5, 5))
+    ).astype(bool)
+    downscaled = cv2.resize(base, small.shape[1::-1], interpolation=cv2.INTER_AREA)
+    diff = np.abs(small.astype(np.int16) - downscaled.astype(np.int16))[covered]
+    assert diff.mean() <= 4
@@ -0,0 +1,37 @@
+import pytest
+
+import scene
+from scene import max_error
+from pipeline.compositor import backends, overlay
+
+# Canvas of the synthetic rig at 6 px/m: the car and 3 m of guidelines fit inside
+PIXELS_PER_METER = 6.0
+
+
+def guidelines(steer):
+    height, width = scene.CANVAS_SHAPE
+    return overlay.guideline_sprite(
+        steer, (width, height), PIXELS_PER_METER, 4.8, 1.9, 2.8, 1.0, 3.0
+    )
+
+
+def render(backend, frames, sprites):
+    bev = backends.composite(backend, frames)
+    return overlay.draw_sprites(backends.overlay_canvas(backend, bev), sprites).copy()
+
+
+@pytest.mark.parametrize("name", ["incremental", "async"])
+def test_persistent_canvas_backends_drop_last_frames_sprites(name, luts, frames, cameras):
+    reference = backends.prepare_backend("float", luts, cameras)
+    backend = backends.prepare_backend(name, luts, cameras)
+    assert backend["keeps_canvas"] and not reference["keeps_canvas"]
+
+    # The steering wheel turns: each frame shows only its own guidelines
+    for steer in (-30.0, 30.0):
+        sprites = [guidelines(steer)]
+        expected = render(reference, frames, sprites)
+        assert max_error(render(backend, frames, sprites), expected) == 0
+
+    clean = backends.composite(reference, frames)
+    assert max_error(render(backend, frames, []), clean) == 0
+    backends.release(backend)
@@ -0,0 +1,44 @@
+import numpy as np
+
+from scene import max_error
+from pipeline.compositor import backends, per_camera
+
+
+def float_render(luts, frames, cameras):
+    return backends.composite(backends.prepare_backend("float", luts, cameras), frames)
+
+
+def test_one_camera_update_matches_float(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("async", luts, cameras)
+    assert max_error(backends.composite(backend, frames), reference) == 0
+
+    # Only the left camera delivers a new frame
+    changed = dict(frames)
+    changed[cameras[1]] = 255 - frames[cameras[1]]
+    output = backends.composite(backend, {cameras[1]: changed[cameras[1]]})
+    assert max_error(output, float_render(luts, changed, cameras)) == 0
+
+
+def test_stale_camera_pixels_are_kept(luts, frames, cameras):
+    backend = backends.prepare_backend("async", luts, cameras)
+    prepared = backend["prepared"]
+    canvas = backend["composite_kwargs"]["out"]
+    scratch = backend["composite_kwargs"]["scratch"]
+    for cam in cameras:
+        per_camera.update(prepared, cam, frames[cam], canvas, timestamp=0.0, scratch=scratch)
+    before = canvas.copy()
+
+    fresh = cameras[0]
+    per_camera.update(
+        prepared, fresh, 255 - frames[fresh], canvas, timestamp=0.1, scratch=scratch
+    )
+
+    # Pixels the fresh camera does not cover still show the stale cameras' last frames
+    untouched = luts[fresh]["weight"] == 0
+    assert np.array_equal(canvas[untouched], before[untouched])
+    assert not np.array_equal(canvas[~untouched], before[~untouched])
+
+    ages = per_camera.staleness(prepared, now=0.2)
+    assert np.isclose(ages[fresh], 0.1)
+    assert all(np.isclose(ages[cam], 0.2) for cam in cameras[1:])
+    assert prepared["updates"][fresh] == 2
@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+from pipeline.compositor import backends, reduced_input
+
+
+def test_half_resolution_input_stays_close_to_full_resolution(luts, frames, cameras, reference):
+    scaled, kwargs = reduced_input.rescale_luts(luts, {}, 2)
+    small = {
+        cam: cv2.resize(
+            frame, (frame.shape[1] // 2, frame.shape[0] // 2), interpolation=cv2.INTER_AREA
+        )
+        for cam, frame in frames.items()
+    }
+    backend = backends.prepare_backend("float", scaled, cameras, **kwargs)
+    output = backends.composite(backend, small)
+
+    valid = sum(luts[cam]["weight"] for cam in cameras) > 0
+    report = reduced_input.quality_report(reference, output, valid)
+    assert report["psnr"] >= 30.0
+    assert np.all(output[~valid] == 0)
+
+
+def test_rescale_keeps_pixel_centres_and_crop_bounds(luts, cameras):
+    # Pixel centres of a 2x2 block land on the centre of the reduced pixel
+    np.testing.assert_allclose(reduced_input.rescale_coords(np.array([0.0, 1.0]), 2), [-0.25, 0.25])
+
+    lut = dict(luts[cameras[0]], src_crop=np.array([16, 80, 32, 127], dtype=np.int32))
+    rescaled = reduced_input.rescale_lut(lut, 4)
+    np.testing.assert_array_equal(rescaled["src_crop"], [4, 20, 8, 32])
+    assert reduced_input.rescale_lut(lut, 1) is lut
@@ -0,0 +1,40 @@
+import numpy as np
+
+from scene import max_error
+from pipeline.compositor import backends, regions
+
+
+def test_regions_matches_float(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("regions", luts, cameras)
+    assert max_error(backends.composite(backend, frames), reference) == 0
+
+
+def test_partition_copies_only_full_weight_pixels(luts, cameras):
+    weights = {cam: luts[cam]["weight"] for cam in cameras}
+    partition = regions.partition_regions(weights, cameras)
+    copied = partition["group_copy"][partition["labels"]]
+
+    peak = np.max([weights[cam] for cam in cameras], axis=0)
+    assert copied.any() and (~copied & (peak > 0)).any()
+    assert np.all(peak[copied] == 1.0)
+    assert np.all(partition["labels"][peak == 0] == 0)
+
+
+def test_corrected_weights_keep_lone_cameras_out_of_the_blend(luts, frames, cameras):
+    # Vignetting correction style gain: 1 at the canvas centre, brighter towards the edges
+    height, width = luts[cameras[0]]["weight"].shape
+    v, u = np.mgrid[:height, :width]
+    gain = 1.0 + 0.5 * ((u / width - 0.5) ** 2 + (v / height - 0.5) ** 2)
+    corrected = {cam: dict(lut, weight=lut["weight"] * gain) for cam, lut in luts.items()}
+
+    expected = backends.composite(backends.prepare_backend("float", corrected, cameras), frames)
+    backend = backends.prepare_backend("regions", corrected, cameras)
+    assert max_error(backends.composite(backend, frames), expected) == 0
+
+    partition = regions.partition_regions(
+        {cam: corrected[cam]["weight"] for cam in cameras}, cameras
+    )
+    copy_px, scaled_px, blend_px = regions.region_shares(partition)
+    assert copy_px == 0 and scaled_px > blend_px
+    blended = sum(index.size for index, _ in backend["prepared"]["blend"])
+    assert blended == round(blend_px * height * width)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from pipeline.compositor import roi_view
+
+# A single camera 1 m above the ground looking straight down (camera Z = world -Z)
+K = np.array([[40.0, 0.0, 64.0], [0.0, 40.0, 48.0], [0.0, 0.0, 1.0]])
+D = np.zeros((4, 1))
+RVEC = np.array([[np.pi], [0.0], [0.0]])
+FRAME_SHAPES = {"Cam_Down": (96, 128)}
+RECT = (-0.5, 0.5, -0.5, 0.5)
+
+
+def make_views(tvec, released):
+    return roi_view.RoiViews(
+        ["Cam_Down"], {"Cam_Down": (RVEC, tvec)}, K, D, FRAME_SHAPES, release=released.append
+    )
+
+
+def absolute_maps(luts):
+    lut = luts["Cam_Down"]
+    y0, _, x0, _ = lut["src_crop"]
+    return np.stack((lut["map_x"] + x0, lut["map_y"] + y0))
+
+
+def test_recalibrate_rebuilds_and_releases_stale_views():
+    released = []
+    views = make_views(np.array([[0.0], [0.0], [1.0]]), released)
+    before = views.get(RECT, 20)
+    digest = views.digest
+    assert views.get(RECT, 20) is before
+
+    # The camera slid 10 cm along the world X axis
+    views.recalibrate({"Cam_Down": (RVEC, np.array([[0.1], [0.0], [1.0]]))})
+    after = views.get(RECT, 20)
+
+    assert views.digest != digest
+    assert released == [before]
+    assert not np.allclose(absolute_maps(after), absolute_maps(before))
+    views.close()
@@ -0,0 +1,54 @@
+import numpy as np
+
+import scene
+from scene import max_error
+from pipeline.compositor import backends, source_crop
+
+
+def windowed_luts(luts):
+    """Squeeze every camera's maps into an off-centre window of its frame."""
+    windowed = {}
+    for cam, lut in luts.items():
+        windowed[cam] = dict(lut, map_x=lut["map_x"] * 0.4 + 41.3, map_y=lut["map_y"] * 0.5 + 20.7)
+    return windowed
+
+
+def cropped_luts(luts, cameras):
+    cropped = {}
+    for cam in cameras:
+        lut = luts[cam]
+        crop = source_crop.footprint_crop(
+            lut["map_x"], lut["map_y"], lut["weight"], scene.FRAME_SHAPE
+        )
+        map_x, map_y = source_crop.offset_maps(lut["map_x"], lut["map_y"], crop)
+        cropped[cam] = dict(lut, map_x=map_x, map_y=map_y, src_crop=crop)
+    return cropped
+
+
+def test_cropped_frames_match_full_frames(luts, frames, cameras):
+    luts = windowed_luts(luts)
+    expected = backends.composite(backends.prepare_backend("float", luts, cameras), frames)
+
+    cropped = cropped_luts(luts, cameras)
+    crops = source_crop.lut_crops(cropped, {}, cameras)
+    assert all(source_crop.crop_fraction(crops[cam], scene.FRAME_SHAPE) < 0.5 for cam in cameras)
+    for name in ("float", "fixed", "sparse"):
+        backend = backends.prepare_backend(name, cropped, cameras)
+        output = backends.composite(backend, source_crop.crop_frames(frames, crops))
+        reference = backends.composite(backends.prepare_backend(name, luts, cameras), frames)
+        assert max_error(output, reference) == 0
+        assert max_error(output, expected) <= 1
+        backends.release(backend)
+
+
+def test_crop_is_aligned_and_holds_every_bilinear_tap(luts, cameras):
+    lut = windowed_luts(luts)[cameras[0]]
+    y0, y1, x0, x1 = source_crop.footprint_crop(
+        lut["map_x"], lut["map_y"], lut["weight"], scene.FRAME_SHAPE
+    )
+    assert y0 % source_crop.CROP_ALIGN == 0 and x0 % source_crop.CROP_ALIGN == 0
+    covered = lut["weight"] > 0
+    assert np.floor(lut["map_x"][covered]).min() >= x0
+    assert np.floor(lut["map_x"][covered]).max() + 1 < x1
+    assert np.floor(lut["map_y"][covered]).min() >= y0
+    assert np.floor(lut["map_y"][covered]).max() + 1 < y1
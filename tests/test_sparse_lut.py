@@ -0,0 +1,27 @@
+from scene import max_error
+from pipeline.compositor import backends, sparse_lut
+
+
+def test_sparse_matches_float_from_dense_and_packed_luts(luts, frames, cameras, reference):
+    packed = {
+        cam: sparse_lut.pack_sparse_lut(lut["map_x"], lut["map_y"], lut["weight"])
+        for cam, lut in luts.items()
+    }
+    for tables in (luts, packed):
+        backend = backends.prepare_backend("sparse", tables, cameras)
+        assert max_error(backends.composite(backend, frames), reference) == 0
+        backends.release(backend)
+
+
+def test_sparse_clears_caller_canvas_outside_the_box(luts, frames, cameras):
+    # Only the front camera: its box leaves the back half of the canvas uncovered
+    front = cameras[:1]
+    prepared = sparse_lut.prepare_luts(luts, front)
+    out, scratch = sparse_lut.allocate_buffers(prepared, front)
+    out.fill(77)
+    output = sparse_lut.composite(frames, prepared, front, out=out, scratch=scratch)
+
+    expected = backends.composite(backends.prepare_backend("float", luts, front), frames)
+    y0, y1, x0, x1 = prepared["bbox"]
+    assert (y1 - y0) * (x1 - x0) < output.shape[0] * output.shape[1]
+    assert max_error(output, expected) == 0
@@ -0,0 +1,38 @@
+import numpy as np
+
+from scene import max_error
+from pipeline.compositor import backends, topk
+
+
+def test_topk_matches_float_with_all_cameras(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("topk", luts, cameras, k=len(cameras))
+    assert max_error(backends.composite(backend, frames), reference) <= 1
+
+
+def test_topk_lut_keeps_pixel_totals(luts, cameras):
+    table = topk.build_topk_lut(luts, cameras, k=2)
+    total = sum(luts[cam]["weight"] for cam in cameras)
+    np.testing.assert_allclose(table["weight"].sum(axis=0), total, atol=1e-5)
+
+
+def test_topk_band_edges_read_black_like_float():
+    # Taps half a row outside each camera's frame must read the constant border, not the
+    # neighbouring band of the atlas
+    cameras = ["a", "b"]
+    frames = {
+        "a": np.full((10, 12, 3), 100, dtype=np.uint8),
+        "b": np.full((8, 12, 3), 200, dtype=np.uint8),
+    }
+    rows = np.array([-0.5, 0.0, 6.5, 7.5, 8.5, 9.5], dtype=np.float32)
+    map_y = np.repeat(rows[:, np.newaxis], 6, axis=1)
+    luts = {
+        cam: {
+            "map_x": np.full(map_y.shape, 3.0, dtype=np.float32),
+            "map_y": map_y,
+            "weight": np.full(map_y.shape, 0.5, dtype=np.float32),
+        }
+        for cam in cameras
+    }
+    reference = backends.composite(backends.prepare_backend("float", luts, cameras), frames)
+    output = backends.composite(backends.prepare_backend("topk", luts, cameras, k=2), frames)
+    assert max_error(output, reference) <= 1
@@ -0,0 +1,30 @@
+import numpy as np
+
+from pipeline.compositor import vignetting
+
+# Lens darkening to exp(-0.5) ~ 61% at the calibrated edge radius
+PROFILE = {
+    "coeffs": np.array([-0.5, 0.0, 0.0]),
+    "center": np.array([64.0, 48.0]),
+    "radius": 48.0,
+    "r_max": 1.0,
+}
+
+
+def test_correction_is_one_at_the_optical_centre_and_brightens_outwards():
+    map_x = np.array([64.0, 64.0 + 24.0, 64.0 + 48.0, 64.0 + 96.0], dtype=np.float32)
+    map_y = np.full_like(map_x, 48.0)
+    gain = vignetting.correction(map_x, map_y, PROFILE, max_gain=2.0)
+
+    assert gain[0] == 1.0
+    np.testing.assert_allclose(gain[1:3], np.exp([0.5 * 0.25, 0.5]), rtol=1e-6)
+    # Constant past r_max
+    assert gain[3] == gain[2]
+
+
+def test_correction_is_capped_at_max_gain():
+    gain = vignetting.correction(
+        np.array([64.0 + 48.0], dtype=np.float32), np.array([48.0], dtype=np.float32),
+        PROFILE, max_gain=1.5,
+    )
+    assert gain[0] == np.float32(1.5)
@@ -0,0 +1,45 @@
+import numpy as np
+
+import scene
+from pipeline.compositor import backends, yuv
+
+
+def nv12_frames(frames):
+    return {cam: yuv.from_bgr(frame, "nv12") for cam, frame in frames.items()}
+
+
+def covered(luts, cameras):
+    return sum(luts[cam]["weight"] for cam in cameras) > 0
+
+
+def test_yuv_luma_matches_float(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("yuv", luts, cameras, output_format="nv12")
+    nv12 = backends.composite(backend, nv12_frames(frames))
+
+    # Luma is remapped at full resolution, so only rounding separates it from the reference
+    height = scene.CANVAS_SHAPE[0]
+    luma = nv12[:height].astype(np.int16)
+    expected = yuv.from_bgr(reference, "nv12")[:height].astype(np.int16)
+    mask = covered(luts, cameras)
+    assert np.abs(luma - expected)[mask].max() <= 2
+
+
+def test_yuv_bgr_output_close_to_float(luts, frames, cameras, reference):
+    backend = backends.prepare_backend("yuv", luts, cameras, output_format="bgr")
+    output = backends.composite(backend, nv12_frames(frames))
+
+    # Noisy frames lose detail to 4:2:0 chroma, so only the mean error is tight
+    diff = np.abs(output.astype(np.int16) - reference.astype(np.int16))
+    mask = covered(luts, cameras)
+    assert diff[mask].mean() <= 8
+    assert np.all(output[~mask] == 0)
+
+
+def test_yuv_fills_uncovered_pixels_with_video_black(luts, frames, cameras):
+    backend = backends.prepare_backend("yuv", luts, cameras, output_format="nv12")
+    nv12 = backends.composite(backend, nv12_frames(frames))
+
+    height = scene.CANVAS_SHAPE[0]
+    uncovered = yuv.nv12_mask(~covered(luts, cameras))
+    assert np.all(nv12[:height][uncovered[:height]] == yuv.LUMA_BLACK)
+    assert np.all(nv12[height:][uncovered[height:]] == yuv.CHROMA_NEUTRAL)